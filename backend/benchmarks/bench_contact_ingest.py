@@ -0,0 +1,138 @@
+"""Contact ingestion: per-request ``insert_one`` vs. the write-behind writer.
+
+Drives ``--messages`` submissions from ``--concurrency`` concurrent clients
+through both paths and reports acknowledgement latency percentiles plus
+throughput (acknowledged, and durable = until the last row is written).
+
+By default the database is the in-process stand-in with a simulated network
+round trip (``--rtt-ms``) and a bounded connection pool (``--pool-size``), like
+Motor's; pass ``--mongo-url`` to measure a real server.
+
+    python backend/benchmarks/bench_contact_ingest.py --messages 20000 --concurrency 200
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from contact_writer import ContactWriter  # noqa: E402
+from memory_db import MemoryDatabase  # noqa: E402
+
+
+class SimulatedLatencyCollection:
+    """Memory collection whose writes hold a pooled connection for one round
+    trip plus a per-row cost."""
+
+    def __init__(self, collection, rtt: float, per_row: float, pool_size: int):
+        self.collection = collection
+        self.rtt = rtt
+        self.per_row = per_row
+        self.pool = asyncio.Semaphore(pool_size)
+
+    async def insert_one(self, doc):
+        async with self.pool:
+            await asyncio.sleep(self.rtt + self.per_row)
+        return await self.collection.insert_one(doc)
+
+    async def insert_many(self, docs, ordered=True):
+        async with self.pool:
+            await asyncio.sleep(self.rtt + self.per_row * len(docs))
+        return await self.collection.insert_many(docs, ordered=ordered)
+
+
+def make_message(n):
+    return {
+        "id": str(uuid.uuid4()),
+        "name": f"Sender {n}",
+        "email": f"sender{n}@example.com",
+        "subject": "Benchmark",
+        "message": "Hello from the ingestion benchmark",
+        "timestamp": datetime.utcnow(),
+    }
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def drive(submit, messages, concurrency):
+    latencies = []
+    counter = iter(range(messages))
+
+    async def client():
+        for n in counter:
+            doc = make_message(n)
+            started = time.perf_counter()
+            await submit(doc)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
+
+
+def report(name, latencies, acked, durable):
+    count = len(latencies)
+    print(
+        f"{name:<14} ack p50 {percentile(latencies, 50) * 1000:7.3f} ms  "
+        f"p99 {percentile(latencies, 99) * 1000:7.3f} ms  "
+        f"mean {statistics.fmean(latencies) * 1000:7.3f} ms  "
+        f"ack {count / acked:9.0f} msg/s  durable {count / durable:9.0f} msg/s"
+    )
+
+
+async def main(args):
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        db = AsyncIOMotorClient(args.mongo_url)[args.db_name]
+        direct_collection = db.bench_contact_direct
+        batched_collection = db.bench_contact_batched
+        await direct_collection.drop()
+        await batched_collection.drop()
+    else:
+        db = MemoryDatabase()
+        rtt, per_row = args.rtt_ms / 1000, args.per_row_us / 1e6
+        direct_collection = SimulatedLatencyCollection(db.direct, rtt, per_row, args.pool_size)
+        batched_collection = SimulatedLatencyCollection(db.batched, rtt, per_row, args.pool_size)
+
+    latencies, elapsed = await drive(direct_collection.insert_one, args.messages, args.concurrency)
+    report("insert_one", latencies, elapsed, elapsed)
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        writer = ContactWriter(
+            batched_collection,
+            spill_path=Path(spill_dir) / "spill.jsonl",
+            max_batch=args.batch_size,
+            flush_interval=args.flush_interval_ms / 1000,
+            max_queue=args.queue_size,
+        )
+        await writer.start()
+        started = time.perf_counter()
+        latencies, acked = await drive(writer.submit, args.messages, args.concurrency)
+        await writer.flush()
+        durable = time.perf_counter() - started
+        await writer.stop()
+    report("write-behind", latencies, acked, durable)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--rtt-ms", type=float, default=1.0, help="simulated round trip per write")
+    parser.add_argument("--per-row-us", type=float, default=20.0, help="simulated cost per written row")
+    parser.add_argument("--pool-size", type=int, default=10, help="simulated connection pool size")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--flush-interval-ms", type=float, default=50.0)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--mongo-url", help="benchmark against a real MongoDB instead")
+    parser.add_argument("--db-name", default="portfolio_bench")
+    asyncio.run(main(parser.parse_args()))
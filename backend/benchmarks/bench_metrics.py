@@ -0,0 +1,82 @@
+"""Per-request cost of the metrics middleware and MongoDB command listener.
+
+Calls a minimal ASGI app directly, with and without ``MetricsMiddleware``, so
+the difference is the middleware alone, and feeds synthetic events to
+``CommandMetrics``. Compare the results with the budget in ``metrics.py``.
+
+    python backend/benchmarks/bench_metrics.py [--iterations 200000]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from starlette.routing import Route, Router  # noqa: E402
+
+import metrics  # noqa: E402
+
+REQUEST_BUDGET_US = 10.0
+COMMAND_BUDGET_US = 2.0
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def make_scope(app, routed: bool):
+    route = app.router.routes[0]
+    scope = {"type": "http", "method": "GET", "path": "/api/portfolio/skills", "app": app}
+    if routed:
+        scope["route"] = route
+    return scope
+
+
+async def per_request_us(app, scope_factory, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await app(scope_factory(), receive, send)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+async def main(iterations: int) -> None:
+    app = SimpleNamespace(router=Router([Route("/api/portfolio/skills", endpoint)]))
+    wrapped = metrics.MetricsMiddleware(endpoint, metrics.HttpMetrics(metrics.Registry()))
+    baseline = await per_request_us(endpoint, lambda: make_scope(app, True), iterations)
+    results = {
+        "routed request": await per_request_us(wrapped, lambda: make_scope(app, True), iterations)
+        - baseline,
+        "answered before routing (304)": await per_request_us(
+            wrapped, lambda: make_scope(app, False), iterations
+        ) - baseline,
+    }
+    for name, overhead in results.items():
+        verdict = "ok" if overhead <= REQUEST_BUDGET_US else "OVER BUDGET"
+        print(f"middleware, {name:<30} {overhead:6.2f} us/request  (budget {REQUEST_BUDGET_US} us) {verdict}")
+
+    listener = metrics.CommandMetrics(metrics.Registry())
+    event = SimpleNamespace(command_name="find", duration_micros=850)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        listener.succeeded(event)
+    command_us = (time.perf_counter() - started) / iterations * 1e6
+    verdict = "ok" if command_us <= COMMAND_BUDGET_US else "OVER BUDGET"
+    print(f"command listener{'':<29} {command_us:6.2f} us/command  (budget {COMMAND_BUDGET_US} us) {verdict}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200000)
+    asyncio.run(main(parser.parse_args().iterations))
@@ -0,0 +1,104 @@
+"""Latency of contact message search as the collection grows.
+
+Seeds ``--messages`` synthetic messages, creates the declared indexes (the
+``message_text`` text index among them), then times first pages and deep
+pages for rare, common and phrase queries, highlighting included. It runs
+against the in-memory stand-in by default. Set ``MONGO_URL`` to measure a
+real server; the benchmark uses its own database, dropped afterwards.
+
+    python backend/benchmarks/bench_search.py [--messages 200000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import indexes  # noqa: E402
+import text_search  # noqa: E402
+from memory_db import MemoryDatabase  # noqa: E402
+
+WORDS = (
+    "project website design budget timeline invoice payment portfolio react python backend frontend "
+    "meeting schedule proposal contract freelance hiring interview feedback bug deploy hosting domain "
+    "email newsletter logo brand mobile app api database migration performance security review"
+).split()
+QUERIES = {
+    "rare word": "zeppelin",
+    "common word": "project",
+    "two words": "invoice payment",
+    "phrase": '"website design"',
+}
+
+
+def make_message(n: int, rng: random.Random) -> dict:
+    words = rng.choices(WORDS, k=rng.randint(15, 60))
+    if n % 5000 == 0:
+        words.append("zeppelin")
+    return {
+        "id": f"bench-{n:07d}",
+        "name": f"Sender {n}",
+        "email": f"sender{n}@example.com",
+        "subject": " ".join(rng.choices(WORDS, k=4)),
+        "message": " ".join(words),
+        "timestamp": datetime(2024, 1, 1) + timedelta(seconds=n),
+    }
+
+
+async def seed(db, count: int) -> float:
+    rng = random.Random(7)
+    started = time.perf_counter()
+    await indexes.registry.ensure(db)
+    for start in range(0, count, 5000):
+        await db.contact_messages.insert_many(
+            [make_message(n, rng) for n in range(start, min(start + 5000, count))], ordered=False
+        )
+    return time.perf_counter() - started
+
+
+async def time_query(db, q: str, offset: int, repeat: int) -> float:
+    query = text_search.parse(q)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        messages = await text_search.search(db.contact_messages, q, offset, 21)
+        [text_search.hit(msg, query) for msg in messages[:20]]
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+async def main(count: int, repeat: int) -> None:
+    url = os.environ.get("MONGO_URL", "memory://")
+    client = None
+    if url.startswith("memory://"):
+        db = MemoryDatabase("bench_search")
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(url)
+        db = client["bench_search"]
+    try:
+        seconds = await seed(db, count)
+        print(f"seeded {count} messages into {url.split('@')[-1]} in {seconds:.1f}s")
+        for name, q in QUERIES.items():
+            first = await time_query(db, q, 0, repeat)
+            deep = await time_query(db, q, text_search.MAX_OFFSET - 20, repeat)
+            print(f"{name:<12} {q!r:<20} first page {first:8.2f} ms   offset {text_search.MAX_OFFSET - 20}: {deep:8.2f} ms")
+    finally:
+        if client is not None:
+            await client.drop_database("bench_search")
+            client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.repeat))
@@ -0,0 +1,124 @@
+"""Per-endpoint serialization cost, before and after the fast paths.
+
+"before" replays what FastAPI does for a handler that returns models:
+construct the models, validate them against the route's ``response_model``
+(``fastapi.routing.serialize_response``), then render with the stock
+``JSONResponse``. "after" is what the handlers do now: cached bytes for
+portfolio content, and ``fast_json.trusted_response`` for contact data.
+
+    python backend/benchmarks/bench_serialization.py [--iterations 2000] [--serializer json]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "memory://")
+os.environ.setdefault("DB_NAME", "portfolio_bench")
+
+from fastapi.routing import APIRoute, serialize_response  # noqa: E402
+from starlette.responses import JSONResponse, Response  # noqa: E402
+
+import fast_json  # noqa: E402
+import server  # noqa: E402
+
+
+def response_field(path, method="GET"):
+    for route in server.app.routes:
+        if isinstance(route, APIRoute) and route.path == path and method in route.methods:
+            return route.response_field
+    raise LookupError(path)
+
+
+async def before(path, build, method="GET"):
+    field = response_field(path, method)
+    content = await serialize_response(field=field, response_content=build())
+    return JSONResponse(content).body
+
+
+def contact_rows(count):
+    base = datetime(2025, 1, 1)
+    return [
+        {
+            "id": f"msg-{n}", "name": f"Sender {n}", "email": f"sender{n}@example.com",
+            "subject": f"Subject {n}", "message": "Hello there, " * 20, "timestamp": base + timedelta(minutes=n),
+        }
+        for n in range(count)
+    ]
+
+
+async def measure(fn, iterations):
+    for _ in range(min(iterations, 100)):
+        await fn()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+async def main(args):
+    if args.serializer:
+        fast_json.use(args.serializer)
+    await server.content_store.seed()
+    await server.content_cache.warm()
+    cache = server.content_cache
+    rows = contact_rows(100)
+    create = server.ContactMessageCreate(
+        name="Ada", email="ada@example.com", subject="Hello", message="Benchmark message"
+    )
+
+    async def cached(name):
+        entry = await cache.fetch(name)
+        return Response(entry.body, media_type="application/json", headers={"ETag": entry.etag})
+
+    async def aggregated():
+        entry = await cache.aggregate()
+        return Response(entry.body, media_type="application/json", headers={"ETag": entry.etag})
+
+    async def portfolio_before():
+        return {name: await before(path, build) for name, path, build in content}
+
+    content = [
+        ("personal_info", "/api/portfolio/personal-info", server.default_personal_info),
+        ("about", "/api/portfolio/about", server.default_about_info),
+        ("skills", "/api/portfolio/skills", server.default_skills),
+        ("experience", "/api/portfolio/experience", server.default_experience),
+        ("projects", "/api/portfolio/projects", server.default_projects),
+    ]
+    cases = [
+        (path, lambda path=path, build=build: before(path, build), lambda name=name: cached(name))
+        for name, path, build in content
+    ]
+    cases.append(("/api/portfolio (vs. 5 requests)", portfolio_before, aggregated))
+    cases.append((
+        "POST /api/portfolio/contact",
+        lambda: before(
+            "/api/portfolio/contact", lambda: server.ContactMessage(**create.model_dump()), method="POST"
+        ),
+        lambda: asyncio.sleep(0, fast_json.trusted_response(server.ContactMessage.model_construct(**create.model_dump()))),
+    ))
+    cases.append((
+        "/api/portfolio/contact/messages (100 rows)",
+        lambda: before(
+            "/api/portfolio/contact/messages", lambda: [server.ContactMessage(**row) for row in rows]
+        ),
+        lambda: asyncio.sleep(0, fast_json.trusted_response(rows)),
+    ))
+
+    print(f"serializer: {fast_json.serializer_name}, {args.iterations} iterations")
+    print(f"{'endpoint':<45}{'before us':>12}{'after us':>12}{'speedup':>10}")
+    for name, slow, fast in cases:
+        slow_us = await measure(slow, args.iterations)
+        fast_us = await measure(fast, args.iterations)
+        print(f"{name:<45}{slow_us:>12.1f}{fast_us:>12.1f}{slow_us / fast_us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--serializer", help="fast_json serializer to use (json, orjson)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,145 @@
+"""Cold start time of the API: import, startup and first requests.
+
+Every run is a fresh interpreter that:
+
+1. imports ``server`` (``import_ms``),
+2. runs the app's lifespan startup (``startup_ms``): building the client,
+   warming the pool, ensuring indexes, seeding and pre-encoding content,
+3. sends its first request (``first_request_ms``), then a second one to the
+   same endpoint (``warm_request_ms``),
+4. shuts down (``shutdown_ms``).
+
+``ready_ms`` is the sum of the first three steps, roughly how long a new
+worker takes before it serves a response. ``process_ms`` is the wall time
+of the whole run, interpreter start and exit included, as the parent sees
+it. Results are medians over ``--runs``.
+
+The database is the in-process stand-in unless ``MONGO_URL`` is set. Save
+and compare results the same way as the load test:
+
+    python backend/benchmarks/bench_startup.py --output before.json
+    python backend/benchmarks/bench_startup.py --compare before.json --threshold 20
+
+``--compare`` exits with status 1 when a timing rose by more than
+``--threshold`` percent and by more than ``--min-delta-ms``, which keeps
+noise on timings of a few milliseconds from failing the comparison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+METRICS = ("import_ms", "startup_ms", "first_request_ms", "warm_request_ms", "shutdown_ms", "ready_ms", "process_ms")
+
+
+async def _serve_first_requests(app, path: str) -> Dict[str, float]:
+    import httpx
+
+    timings = {}
+    started = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        timings["startup_ms"] = (time.perf_counter() - started) * 1000
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in ("first_request_ms", "warm_request_ms"):
+                started = time.perf_counter()
+                response = await client.get(path)
+                timings[name] = (time.perf_counter() - started) * 1000
+                response.raise_for_status()
+        started = time.perf_counter()
+    timings["shutdown_ms"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def child(path: str) -> Dict[str, float]:
+    """One cold start, measured in this (fresh) process."""
+    sys.path.insert(0, str(BACKEND_DIR))
+    started = time.perf_counter()
+    import server
+
+    timings = {"import_ms": (time.perf_counter() - started) * 1000}
+    timings.update(asyncio.run(_serve_first_requests(server.app, path)))
+    timings["ready_ms"] = timings["import_ms"] + timings["startup_ms"] + timings["first_request_ms"]
+    return timings
+
+
+def run_once(path: str) -> Dict[str, float]:
+    env = dict(os.environ)
+    env.setdefault("MONGO_URL", "memory://")
+    env.setdefault("DB_NAME", "portfolio_startup_bench")
+    env.setdefault("CONTACT_SPILL_PATH", str(Path(tempfile.mkdtemp()) / "contact_spill.jsonl"))
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", "--path", path],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["process_ms"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def measure(runs: int, path: str) -> Dict[str, Any]:
+    samples = [run_once(path) for _ in range(runs)]
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "mongo_url": os.environ.get("MONGO_URL", "memory://").split("@")[-1],
+            "runs": runs,
+            "path": path,
+        },
+        "results": {
+            metric: round(statistics.median(sample[metric] for sample in samples), 2) for metric in METRICS
+        },
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float,
+            min_delta_ms: float) -> List[str]:
+    """Print the change per timing; returns the regressions."""
+    regressions = []
+    for metric, after in current["results"].items():
+        before = baseline.get("results", {}).get(metric)
+        if not before:
+            continue
+        change = (after - before) / before * 100
+        print(f"{metric:<18} {before:9.1f} ms -> {after:9.1f} ms  {change:+7.1f}%")
+        if change > threshold and after - before > min_delta_ms:
+            regressions.append(f"{metric}: {before:.1f} ms -> {after:.1f} ms ({change:+.1f}%)")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="cold starts to take the median of")
+    parser.add_argument("--path", default="/api/portfolio", help="endpoint of the first requests")
+    parser.add_argument("--output", type=Path, help="write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=20.0,
+                        help="regression threshold for --compare, in percent")
+    parser.add_argument("--min-delta-ms", type=float, default=25.0,
+                        help="smallest increase --compare counts as a regression")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.path)))
+        sys.exit(0)
+    report = measure(args.runs, args.path)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text()), report, args.threshold, args.min_delta_ms)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
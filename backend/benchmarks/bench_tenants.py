@@ -0,0 +1,158 @@
+"""Hit rate and memory of the tenant cache at 10k tenants.
+
+Seeds ``--tenants`` portfolios of varying size into ``tenant_content``, then
+replays ``--requests`` lookups drawn from a Zipf distribution (exponent
+``--zipf``) over the tenants, a few popular portfolios and a long tail,
+against a fresh ``TenantCache`` for each ``--max-mb`` budget. It reports:
+
+* the hit rate, evictions and entries kept,
+* the bytes the cache accounts for, and the memory it actually retains,
+  per entry as well. Retained memory is measured with ``tracemalloc`` while
+  a fresh cache loads the tenants the replay ended with;
+* median and p99 lookup latency for hits and for misses, where a miss
+  loads, validates, encodes and compresses a whole portfolio.
+
+It runs against the in-memory stand-in by default. Set ``MONGO_URL`` to
+measure a real server; the benchmark uses its own database, dropped
+afterwards.
+
+    python backend/benchmarks/bench_tenants.py [--tenants 10000] [--requests 200000] [--max-mb 16 64 256]
+"""
+import argparse
+import asyncio
+import gc
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from itertools import accumulate
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "memory://")
+os.environ.setdefault("DB_NAME", "bench_tenants")
+os.environ.setdefault("METRICS_ENABLED", "0")
+
+import indexes  # noqa: E402
+import server  # noqa: E402
+import tenants  # noqa: E402
+from memory_db import MemoryDatabase  # noqa: E402
+
+
+def tenant_docs(n: int, rng: random.Random) -> list:
+    """Section documents of tenant ``n``: the default portfolio, renamed and resized."""
+    slug = f"tenant-{n:05d}"
+    docs = []
+    for name, spec in server.content_store.specs.items():
+        default = spec.default()
+        if spec.many:
+            items = [item.dict() for item in default] * rng.randint(1, 4)
+            for i, item in enumerate(items):
+                item["id"] = f"{slug}-{name}-{i}"
+            content = items
+        else:
+            content = default.dict()
+            content["id"] = f"{slug}-{name}"
+            if name == "personal_info":
+                content["name"] = f"Person {n}"
+        docs.append({"tenant": slug, "section": name, "content": content})
+    return docs
+
+
+async def seed(db, count: int) -> float:
+    rng = random.Random(7)
+    started = time.perf_counter()
+    await indexes.registry.ensure(db)
+    for start in range(0, count, 1000):
+        docs = [doc for n in range(start, min(start + 1000, count)) for doc in tenant_docs(n, rng)]
+        await db[tenants.COLLECTION].insert_many(docs, ordered=False)
+    return time.perf_counter() - started
+
+
+def percentile(samples: list, q: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))] * 1000
+
+
+async def replay(store, count: int, requests: int, exponent: float, max_mb: float) -> dict:
+    rng = random.Random(11)
+    slugs = [f"tenant-{n:05d}" for n in range(count)]
+    rng.shuffle(slugs)
+    weights = list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+    stream = rng.choices(slugs, cum_weights=weights, k=requests)
+
+    cache = tenants.TenantCache(store.load, max_bytes=int(max_mb * 1024 * 1024), max_entries=count)
+    hits, misses = [], []
+    for slug in stream:
+        known = slug in cache
+        started = time.perf_counter()
+        await cache.get(slug)
+        (hits if known else misses).append(time.perf_counter() - started)
+    stats = cache.stats()
+
+    # Tracing every allocation slows lookups several times over, so memory
+    # is measured on a second cache filled with the same tenants
+    kept = list(cache._entries)
+    del cache
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    filled = tenants.TenantCache(store.load, max_bytes=int(max_mb * 1024 * 1024), max_entries=count)
+    for slug in kept:
+        await filled.get(slug)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    stats.update(
+        retained=retained,
+        hit_ms=(statistics.median(hits) * 1000 if hits else 0.0, percentile(hits, 0.99)),
+        miss_ms=(statistics.median(misses) * 1000 if misses else 0.0, percentile(misses, 0.99)),
+    )
+    return stats
+
+
+async def main(count: int, requests: int, exponent: float, budgets: list) -> None:
+    url = os.environ["MONGO_URL"]
+    client = None
+    if url.startswith("memory://"):
+        db = MemoryDatabase("bench_tenants")
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(url)
+        db = client["bench_tenants"]
+    try:
+        seconds = await seed(db, count)
+        print(f"seeded {count} tenants into {url.split('@')[-1]} in {seconds:.1f}s; "
+              f"{requests} requests, zipf {exponent}")
+        store = tenants.TenantStore(db, server.content_store.specs)
+        for max_mb in budgets:
+            stats = await replay(store, count, requests, exponent, max_mb)
+            entries = max(stats["entries"], 1)
+            print(
+                f"{max_mb:6g} MB  hit rate {stats['hit_rate']:6.1%}  evictions {stats['evictions']:7d}  "
+                f"entries {stats['entries']:6d}  accounted {stats['bytes'] / 2 ** 20:6.1f} MB "
+                f"({stats['bytes'] / entries / 1024:5.1f} KB/entry)  retained {stats['retained'] / 2 ** 20:6.1f} MB "
+                f"({stats['retained'] / entries / 1024:5.1f} KB/entry)  "
+                f"hit {stats['hit_ms'][0]:.4f}/{stats['hit_ms'][1]:.4f} ms  "
+                f"miss {stats['miss_ms'][0]:.2f}/{stats['miss_ms'][1]:.2f} ms (p50/p99)"
+            )
+    finally:
+        if client is not None:
+            await client.drop_database("bench_tenants")
+            client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tenants", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--zipf", type=float, default=1.0, help="exponent of the popularity distribution")
+    parser.add_argument("--max-mb", type=float, nargs="+", default=[16, 64, 256],
+                        help="cache budgets to replay the requests against")
+    args = parser.parse_args()
+    asyncio.run(main(args.tenants, args.requests, args.zipf, args.max_mb))
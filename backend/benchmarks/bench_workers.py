@@ -0,0 +1,141 @@
+"""Read throughput of ``serve.py`` as the number of workers grows.
+
+For each ``--workers`` count, starts ``serve.py`` on a free local port,
+waits until it is ready, then drives the read endpoints in ``PATHS`` for
+``--duration`` seconds from ``--clients`` load generator processes. Each
+process holds ``--connections`` keep-alive connections. It reports requests
+per second, and the scaling efficiency relative to the first run: rps /
+(first run's rps per worker * workers).
+
+The load generators run on the same host and compete with the workers for
+cores. Give the server the cores it is meant to use (``taskset``), or read
+the numbers as a lower bound. Scaling flattens out at the number of
+usable cores.
+
+    python backend/benchmarks/bench_workers.py [--workers 1 2 4] [--duration 10] [--clients 2]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+PATHS = ("/api/portfolio", "/api/portfolio/projects", "/api/portfolio/personal-info")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        MONGO_URL=os.environ.get("MONGO_URL", "memory://"),
+        DB_NAME=os.environ.get("DB_NAME", "bench_workers"),
+        METRICS_ENABLED="0",
+        CONTACT_SPILL_PATH=str(Path(tempfile.mkdtemp()) / "contact_spill.jsonl"),
+    )
+    command = [sys.executable, str(BACKEND_DIR / "serve.py"), "--host", "127.0.0.1",
+               "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(command, env=env)
+
+
+def wait_ready(server: subprocess.Popen, port: int, workers: int, timeout: float = 60.0) -> None:
+    """Until every worker answers; connections land on whichever worker accepts first."""
+    deadline = time.monotonic() + timeout
+    ready = 0
+    while ready < workers * 4:
+        if server.poll() is not None:
+            raise RuntimeError(f"serve.py exited with {server.returncode}")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"server on port {port} not ready after {timeout}s")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health/ready", timeout=1) as response:
+                ready += response.status == 200
+        except OSError:
+            ready = 0
+            time.sleep(0.2)
+
+
+async def _connection(port: int, deadline: float, counts: list) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    requests = [f"GET {path} HTTP/1.1\r\nHost: bench\r\n\r\n".encode() for path in PATHS]
+    n = 0
+    try:
+        while time.monotonic() < deadline:
+            writer.write(requests[n % len(requests)])
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line[:15].lower() == b"content-length:":
+                    length = int(line[15:])
+            await reader.readexactly(length)
+            counts[head[9:10] == b"2"] += 1
+            n += 1
+    finally:
+        writer.close()
+
+
+def _generate(port: int, connections: int, duration: float, results) -> None:
+    async def run():
+        counts = [0, 0]  # errors, successes
+        deadline = time.monotonic() + duration
+        await asyncio.gather(*(_connection(port, deadline, counts) for _ in range(connections)))
+        return counts
+
+    results.put(asyncio.run(run()))
+
+
+def drive(port: int, clients: int, connections: int, duration: float) -> dict:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [context.Process(target=_generate, args=(port, connections, duration, results))
+                 for _ in range(clients)]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    ok = sum(count[1] for count in totals)
+    return {"requests": ok, "errors": sum(count[0] for count in totals), "rps": ok / elapsed}
+
+
+def main(args) -> None:
+    print(f"{os.cpu_count()} cores, {len(os.sched_getaffinity(0))} usable; "
+          f"{args.clients} client processes x {args.connections} connections, {args.duration:g}s per run")
+    baseline = None
+    for workers in args.workers:
+        port = free_port()
+        server = start_server(workers, port)
+        try:
+            wait_ready(server, port, workers)
+            drive(port, args.clients, args.connections, min(args.duration, 2.0))  # warm up
+            result = drive(port, args.clients, args.connections, args.duration)
+        finally:
+            server.terminate()
+            server.wait(30)
+        if baseline is None:
+            baseline = result["rps"] / workers
+        efficiency = result["rps"] / (baseline * workers)
+        print(f"{workers:3d} worker(s)  {result['rps']:9.0f} req/s  "
+              f"efficiency {efficiency:6.1%}  errors {result['errors']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--clients", type=int, default=2, help="load generator processes")
+    parser.add_argument("--connections", type=int, default=16, help="connections per load generator")
+    main(parser.parse_args())
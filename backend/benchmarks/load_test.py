@@ -0,0 +1,317 @@
+"""Load test of the API, run against the app in this process.
+
+Every endpoint in ``ENDPOINTS`` is driven by ``--concurrency`` concurrent
+clients for ``--requests`` requests. This happens through one or both
+transports:
+
+* ``asgi``: httpx's ASGITransport calls ``app`` directly. This measures the
+  application alone.
+* ``uvicorn``: a real uvicorn server on a local port, in a background thread.
+  This adds HTTP parsing and the socket round trip. The client shares the
+  interpreter (and its GIL) with the server, so treat these numbers as
+  relative: compare them across runs, not with external load generators.
+
+Throughput and latency percentiles come from the timed run. Allocations come
+from a separate, shorter sequential run under tracemalloc (``--alloc-requests``),
+so tracing does not distort the timings. They are reported as the average
+peak of traced memory per request.
+
+The database is the in-process stand-in (``MONGO_URL=memory://``) unless
+``MONGO_URL`` is set, so the suite runs offline. Results can be saved as JSON
+and compared with an earlier run:
+
+    python backend/benchmarks/load_test.py --output before.json
+    python backend/benchmarks/load_test.py --compare before.json --threshold 10
+
+``--compare`` exits with status 1 when any endpoint's throughput fell, or its
+p95 latency rose, by more than ``--threshold`` percent.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "memory://")
+os.environ.setdefault("DB_NAME", "portfolio_load_test")
+os.environ.setdefault("CONTACT_SPILL_PATH", str(Path(tempfile.mkdtemp()) / "contact_spill.jsonl"))
+# Every request comes from one client with the same message, which the
+# contact rate limit and de-duplication would stop
+os.environ.setdefault("CONTACT_RATE_PER_MINUTE", "0")
+os.environ.setdefault("CONTACT_RATE_PER_HOUR", "0")
+os.environ.setdefault("CONTACT_DEDUPE_MODE", "off")
+# The contact listing is an admin endpoint
+os.environ.setdefault("ADMIN_TOKEN", "load-test")
+
+import httpx  # noqa: E402
+
+MODES = ("asgi", "uvicorn")
+
+
+class Endpoint(NamedTuple):
+    name: str
+    method: str
+    path: str
+    json: Optional[Dict[str, Any]] = None
+
+
+CONTACT = {
+    "name": "Load Test",
+    "email": "load@example.com",
+    "subject": "Benchmark",
+    "message": "Measuring the contact form under load.",
+}
+
+# Order matters: the contact submissions give the listing rows to page over.
+ENDPOINTS = [
+    Endpoint("root", "GET", "/api/"),
+    Endpoint("portfolio", "GET", "/api/portfolio"),
+    Endpoint("personal_info", "GET", "/api/portfolio/personal-info"),
+    Endpoint("about", "GET", "/api/portfolio/about"),
+    Endpoint("skills", "GET", "/api/portfolio/skills"),
+    Endpoint("experience", "GET", "/api/portfolio/experience"),
+    Endpoint("projects", "GET", "/api/portfolio/projects"),
+    Endpoint("contact_submit", "POST", "/api/portfolio/contact", CONTACT),
+    Endpoint("contact_messages", "GET", "/api/portfolio/contact/messages?limit=100"),
+]
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * fraction // 1))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def send(client: httpx.AsyncClient, endpoint: Endpoint) -> httpx.Response:
+    return await client.request(endpoint.method, endpoint.path, json=endpoint.json)
+
+
+async def drive(client: httpx.AsyncClient, endpoint: Endpoint, requests: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await send(client, endpoint)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            if response.status_code >= 400:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def allocations(client: httpx.AsyncClient, endpoint: Endpoint, requests: int) -> Dict[str, Any]:
+    """Average traced-memory peak per request, measured sequentially."""
+    if requests <= 0:
+        return {}
+    tracemalloc.start()
+    try:
+        peaks = []
+        for _ in range(requests):
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            await send(client, endpoint)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return {"alloc_peak_kib": round(sum(peaks) / len(peaks) / 1024, 1)}
+
+
+async def run_endpoints(client: httpx.AsyncClient, endpoints: Sequence[Endpoint], args) -> Dict[str, Any]:
+    results = {}
+    for endpoint in endpoints:
+        for _ in range(args.warmup):
+            await send(client, endpoint)
+        result = await drive(client, endpoint, args.requests, args.concurrency)
+        result.update(await allocations(client, endpoint, args.alloc_requests))
+        results[endpoint.name] = result
+        print(f"  {endpoint.name:<18} {format_result(result)}", file=sys.stderr)
+    return results
+
+
+def admin_headers() -> Dict[str, str]:
+    return {"Authorization": f"Bearer {os.environ['ADMIN_TOKEN']}"}
+
+
+async def run_asgi(app, endpoints: Sequence[Endpoint], args) -> Dict[str, Any]:
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", headers=admin_headers()) as client:
+            return await run_endpoints(client, endpoints, args)
+
+
+class UvicornThread:
+    """uvicorn serving ``app`` on a free local port from a background thread."""
+
+    def __init__(self, app):
+        import uvicorn
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(("127.0.0.1", 0))
+        self.port = self.socket.getsockname()[1]
+        config = uvicorn.Config(app, log_level="warning", access_log=False, lifespan="on")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, kwargs={"sockets": [self.socket]}, daemon=True)
+
+    def __enter__(self) -> str:
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("uvicorn failed to start")
+            time.sleep(0.01)
+        return f"http://127.0.0.1:{self.port}"
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+        self.socket.close()
+
+
+async def run_uvicorn(app, endpoints: Sequence[Endpoint], args) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    with UvicornThread(app) as base_url:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30, headers=admin_headers()) as client:
+            return await run_endpoints(client, endpoints, args)
+
+
+RUNNERS = {"asgi": run_asgi, "uvicorn": run_uvicorn}
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    line = (
+        f"{result['rps']:>9.1f} req/s  p50 {result['p50_ms']:>7.2f} ms  "
+        f"p95 {result['p95_ms']:>7.2f} ms  p99 {result['p99_ms']:>7.2f} ms"
+    )
+    if "alloc_peak_kib" in result:
+        line += f"  alloc {result['alloc_peak_kib']:>7.1f} KiB"
+    if result["errors"]:
+        line += f"  errors {result['errors']}"
+    return line
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """Print the change per endpoint; returns the regressions beyond ``threshold`` percent."""
+    regressions = []
+    for mode, results in current["results"].items():
+        for name, result in results.items():
+            before = baseline.get("results", {}).get(mode, {}).get(name)
+            if not before:
+                continue
+            rps = _change(before["rps"], result["rps"])
+            p95 = _change(before["p95_ms"], result["p95_ms"])
+            print(f"{mode:<8} {name:<18} rps {rps:+7.1f}%  p95 {p95:+7.1f}%")
+            if rps < -threshold:
+                regressions.append(f"{mode} {name}: throughput {rps:+.1f}%")
+            if p95 > threshold:
+                regressions.append(f"{mode} {name}: p95 latency {p95:+.1f}%")
+    return regressions
+
+
+def _change(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+
+async def main(args) -> Dict[str, Any]:
+    from server import app
+
+    # Per-request client logging would dominate the measurement
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    selected = set(args.endpoints or [endpoint.name for endpoint in ENDPOINTS])
+    unknown = selected.difference(endpoint.name for endpoint in ENDPOINTS)
+    if unknown:
+        raise SystemExit(f"Unknown endpoint(s): {', '.join(sorted(unknown))}")
+    endpoints = [endpoint for endpoint in ENDPOINTS if endpoint.name in selected]
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "mongo_url": os.environ["MONGO_URL"].split("@")[-1],
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": {},
+    }
+    for mode in args.modes:
+        print(f"{mode}:", file=sys.stderr)
+        report["results"][mode] = await RUNNERS[mode](app, endpoints, args)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the API in-process")
+    parser.add_argument("--mode", dest="modes", action="append", choices=MODES,
+                        help="transport(s) to test (default: both)")
+    parser.add_argument("--endpoint", dest="endpoints", action="append",
+                        help="endpoint name(s) to test (default: all)")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=50, help="untimed requests per endpoint")
+    parser.add_argument("--alloc-requests", type=int, default=50,
+                        help="sequential requests traced for allocations (0 disables)")
+    parser.add_argument("--output", type=Path, help="write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="regression threshold for --compare, in percent")
+    args = parser.parse_args()
+    args.modes = args.modes or list(MODES)
+
+    report = asyncio.run(main(args))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text()), report, args.threshold)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
@@ -0,0 +1,242 @@
+"""Cache invalidation across worker processes.
+
+Every worker keeps its own in-process caches (``ContentCache``,
+``TenantCache``). A write handled by one worker has to reach the caches of
+the others. ``publish(kind, key)`` applies an invalidation in this process,
+then broadcasts it. Every other worker applies what it receives through the
+handlers ``subscribe``d for that kind. Handlers may be sync or async.
+
+Transports, picked by ``CACHE_BUS``:
+
+* ``local``: this process only. This is the default for a single process.
+* ``unix``: Unix datagram sockets, one per worker, in the shared directory
+  ``CACHE_BUS_DIR``. Every message goes to every other socket. This suits
+  workers on one host, and ``serve.py`` sets it up.
+* ``mongo``: messages are documents in ``cache_invalidations``, which a TTL
+  index trims. Workers read them through a change stream, or poll every
+  ``CACHE_BUS_POLL_INTERVAL`` seconds when change streams are unavailable.
+  This suits workers on several hosts.
+
+Delivery is best effort. A worker that misses a message serves the old
+content until the cache TTLs run out, as it would without a bus.
+"""
+import asyncio
+import inspect
+import json
+import logging
+import os
+import secrets
+import socket
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "cache_invalidations"
+# IllegalOperation / "$changeStream is only supported on replica sets"
+CHANGE_STREAMS_UNSUPPORTED = {20, 40573}
+MAX_MESSAGE = 65536
+
+
+class Bus:
+    """In-process bus; subclasses add a transport in ``_broadcast``."""
+
+    def __init__(self, registry=None):
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+        self._handlers: Dict[str, List[Callable[[Optional[str]], Any]]] = {}
+        self._tasks: Set[asyncio.Future] = set()
+        self._metric = None
+        if registry is not None:
+            self._metric = registry.counter(
+                "cache_invalidations_total", "Cache invalidations by direction", ("direction",),
+            )
+
+    def subscribe(self, kind: str, handler: Callable[[Optional[str]], Any]) -> None:
+        self._handlers.setdefault(kind, []).append(handler)
+
+    async def publish(self, kind: str, key: Optional[str] = None) -> None:
+        """Invalidate ``key`` of ``kind`` (None: all of it) here and in every other worker."""
+        await self._apply(kind, key)
+        message = {"kind": kind, "key": key, "origin": self.origin}
+        try:
+            await self._broadcast(message)
+        except Exception:
+            logger.exception("Broadcasting cache invalidation %s/%s failed", kind, key)
+            return
+        if self._metric is not None:
+            self._metric.inc("sent")
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def _broadcast(self, message: Dict[str, Any]) -> None:
+        pass
+
+    def _receive(self, message: Dict[str, Any]) -> None:
+        if message.get("origin") == self.origin or message.get("kind") not in self._handlers:
+            return
+        if self._metric is not None:
+            self._metric.inc("received")
+        task = asyncio.ensure_future(self._apply(message["kind"], message.get("key")))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _apply(self, kind: str, key: Optional[str]) -> None:
+        for handler in self._handlers.get(kind, ()):
+            try:
+                result = handler(key)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("Applying cache invalidation %s/%s failed", kind, key)
+
+
+class UnixSocketBus(Bus):
+    """Workers on one host, each bound to ``<directory>/<name>.sock``."""
+
+    def __init__(self, directory: Path, name: Optional[str] = None, registry=None):
+        super().__init__(registry)
+        self.directory = Path(directory)
+        self.path = self.directory / f"{name or os.getpid()}.sock"
+        self._sock: Optional[socket.socket] = None
+
+    async def start(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Left over by an earlier process with the same pid
+        self.path.unlink(missing_ok=True)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(str(self.path))
+        sock.setblocking(False)
+        self._sock = sock
+        asyncio.get_running_loop().add_reader(sock.fileno(), self._readable)
+
+    async def stop(self) -> None:
+        await super().stop()
+        if self._sock is not None:
+            asyncio.get_running_loop().remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
+            self.path.unlink(missing_ok=True)
+
+    def _readable(self) -> None:
+        while True:
+            try:
+                data = self._sock.recv(MAX_MESSAGE)
+            except BlockingIOError:
+                return
+            try:
+                self._receive(json.loads(data))
+            except ValueError:
+                logger.warning("Ignoring malformed cache invalidation on %s", self.path)
+
+    async def _broadcast(self, message: Dict[str, Any]) -> None:
+        if self._sock is None:
+            return
+        data = json.dumps(message).encode()
+        for peer in self.directory.glob("*.sock"):
+            if peer == self.path:
+                continue
+            try:
+                self._sock.sendto(data, str(peer))
+            except (ConnectionRefusedError, FileNotFoundError):
+                # The worker behind it is gone
+                peer.unlink(missing_ok=True)
+            except BlockingIOError:
+                logger.warning("Cache invalidation dropped: %s is not reading", peer.name)
+
+
+class MongoBus(Bus):
+    """Workers anywhere, sharing ``collection``."""
+
+    def __init__(self, db, poll_interval: float = 1.0, registry=None):
+        super().__init__(registry)
+        self.db = db
+        self.poll_interval = poll_interval
+        self._task: Optional[asyncio.Task] = None
+        self._last_id: Optional[ObjectId] = None
+
+    @property
+    def collection(self):
+        return self.db[COLLECTION]
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._last_id = ObjectId()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        await super().stop()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _broadcast(self, message: Dict[str, Any]) -> None:
+        await self.collection.insert_one(dict(message, at=datetime.now(timezone.utc)))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._watch()
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info("Change streams unavailable (%s); polling cache invalidations every %ss",
+                                e, self.poll_interval)
+                    await self._poll()
+                    return
+                logger.warning("Cache invalidation stream failed (%s); retrying", e)
+            except PyMongoError as e:
+                logger.warning("Cache invalidation stream interrupted (%s); retrying", e)
+            await asyncio.sleep(self.poll_interval)
+            # Catch up on anything published while the stream was down
+            await self._catch_up()
+
+    async def _watch(self) -> None:
+        pipeline = [{"$match": {"ns.coll": COLLECTION, "operationType": "insert"}}]
+        async with self.db.watch(pipeline) as stream:
+            async for change in stream:
+                self._handle(change["fullDocument"])
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await self._catch_up()
+
+    async def _catch_up(self) -> None:
+        try:
+            docs = await self.collection.find({"_id": {"$gt": self._last_id}}).sort("_id", 1).to_list(None)
+        except PyMongoError as e:
+            logger.warning("Reading cache invalidations failed (%s)", e)
+            return
+        for doc in docs:
+            self._handle(doc)
+
+    def _handle(self, doc: Dict[str, Any]) -> None:
+        self._last_id = max(self._last_id, doc["_id"])
+        self._receive(doc)
+
+
+def from_env(db, registry=None) -> Bus:
+    """The bus ``CACHE_BUS`` selects (default: ``unix`` when ``CACHE_BUS_DIR`` is set)."""
+    directory = os.environ.get("CACHE_BUS_DIR")
+    kind = os.environ.get("CACHE_BUS") or ("unix" if directory else "local")
+    if kind == "unix":
+        if not directory:
+            raise ValueError("CACHE_BUS=unix needs CACHE_BUS_DIR")
+        return UnixSocketBus(Path(directory), registry=registry)
+    if kind == "mongo":
+        return MongoBus(db, float(os.environ.get("CACHE_BUS_POLL_INTERVAL", "1")), registry=registry)
+    if kind == "local":
+        return Bus(registry)
+    raise ValueError(f"Unknown CACHE_BUS '{kind}' (expected local, unix or mongo)")
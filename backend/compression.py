@@ -0,0 +1,175 @@
+"""Content codings for response bodies.
+
+gzip comes from the standard library. brotli is used when the ``brotli``
+package is installed; without it, ``available()`` simply leaves ``br``
+out. Output is deterministic: gzip headers carry no timestamp, so equal
+bodies compress to equal bytes.
+
+Cacheable responses are compressed once per content version, at maximum
+level, by ``variants`` (see ``content_cache.CachedResponse``). Only dynamic
+endpoints, whose bodies differ per request, are compressed on the fly by
+``GzipStreamMiddleware``, at a cheaper level and chunk by chunk.
+"""
+import gzip
+import zlib
+from functools import lru_cache
+from typing import Callable, Collection, Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+STREAM_GZIP_LEVEL = 5
+
+# Bodies smaller than this are not worth a Content-Encoding
+MIN_SIZE = 512
+
+# Coding -> file extension of a pre-compressed copy
+EXTENSIONS = {"br": ".br", "gzip": ".gz"}
+
+
+def gzip_compress(body: bytes, level: int = GZIP_LEVEL) -> bytes:
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def brotli_compress(body: bytes, quality: int = BROTLI_QUALITY) -> bytes:
+    if brotli is None:
+        raise RuntimeError("brotli is not installed")
+    return brotli.compress(body, quality=quality)
+
+
+def available() -> Dict[str, Callable[[bytes], bytes]]:
+    """Coding name -> compressor, most effective first."""
+    codings: Dict[str, Callable[[bytes], bytes]] = {}
+    if brotli is not None:
+        codings["br"] = brotli_compress
+    codings["gzip"] = gzip_compress
+    return codings
+
+
+def variants(body: bytes, min_size: int = MIN_SIZE) -> Dict[str, bytes]:
+    """Coding -> compressed ``body``, leaving out copies that are not smaller."""
+    if len(body) < min_size:
+        return {}
+    compressed = {}
+    for coding, compress in available().items():
+        data = compress(body)
+        if len(data) < len(body):
+            compressed[coding] = data
+    return compressed
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding: Optional[str], offered: Tuple[str, ...]) -> Optional[str]:
+    """The coding of ``offered`` the client prefers, ``None`` for identity.
+
+    ``offered`` is in server preference order, which breaks ties between
+    equal q-values. Clients send a handful of distinct headers, hence the
+    cache.
+    """
+    if not accept_encoding or not offered:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    if "x-gzip" in weights:
+        weights.setdefault("gzip", weights["x-gzip"])
+    best, best_q = None, 0.0
+    for coding in offered:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _header(headers, name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class GzipStreamMiddleware:
+    """Gzip the responses of ``paths`` on the fly, for clients that accept it.
+
+    Meant for dynamic endpoints only. A single-message body is compressed
+    in one go and keeps a ``Content-Length``. A streamed body is compressed
+    chunk by chunk and flushed after each one, so the client receives rows
+    as the handler produces them. Bodies below ``minimum_size`` and
+    responses that already carry a ``Content-Encoding`` pass through.
+    """
+
+    def __init__(self, app, paths: Collection[str], minimum_size: int = MIN_SIZE,
+                 level: int = STREAM_GZIP_LEVEL):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        accepted = negotiate(_header(scope["headers"], b"accept-encoding"), ("gzip",)) is not None
+        await self.app(scope, receive, _GzipResponder(send, accepted, self.minimum_size, self.level).send)
+
+
+class _GzipResponder:
+    def __init__(self, send, accepted: bool, minimum_size: int, level: int):
+        self._send = send
+        self.accepted = accepted
+        self.minimum_size = minimum_size
+        self.level = level
+        self.start = None
+        self.compressor = None
+
+    async def send(self, message) -> None:
+        kind = message["type"]
+        if kind == "http.response.start":
+            # Held back until the first body chunk shows whether to compress
+            self.start = message
+            return
+        if kind != "http.response.body":
+            await self._send(message)
+            return
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self.start is None:
+            if self.compressor is not None:
+                data = self.compressor.compress(body)
+                data += self.compressor.flush(zlib.Z_SYNC_FLUSH if more else zlib.Z_FINISH)
+                message = {"type": kind, "body": data, "more_body": more}
+            await self._send(message)
+            return
+        start, self.start = self.start, None
+        headers = [(name, value) for name, value in start["headers"] if name != b"vary"]
+        vary = _header(start["headers"], b"vary")
+        headers.append((b"vary", (f"{vary}, Accept-Encoding" if vary else "Accept-Encoding").encode("latin-1")))
+        if (not self.accepted or _header(headers, b"content-encoding") is not None
+                or (not more and len(body) < self.minimum_size)):
+            await self._send({**start, "headers": headers})
+            await self._send(message)
+            return
+        headers = [(name, value) for name, value in headers if name != b"content-length"]
+        headers.append((b"content-encoding", b"gzip"))
+        if more:
+            self.compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            data = self.compressor.compress(body) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            data = gzip_compress(body, self.level)
+            headers.append((b"content-length", str(len(data)).encode("latin-1")))
+        await self._send({**start, "headers": headers})
+        await self._send({"type": kind, "body": data, "more_body": more})
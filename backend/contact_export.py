@@ -0,0 +1,65 @@
+"""Streaming export of contact messages as NDJSON or CSV.
+
+Rows are pulled from a MongoDB cursor ``batch_size`` at a time and each batch
+is encoded into one chunk of the response body, so memory use depends on the
+batch size, not on the number of exported messages.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List
+
+FIELDS = ["id", "name", "email", "subject", "message", "timestamp"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Leading characters that make spreadsheet applications evaluate a cell
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _csv_cell(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def encode_ndjson(rows: List[Dict[str, Any]]) -> bytes:
+    return "".join(
+        json.dumps(row, ensure_ascii=False, separators=(",", ":"), default=_json_default) + "\n"
+        for row in rows
+    ).encode("utf-8")
+
+
+def encode_csv(rows: List[Dict[str, Any]], header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(FIELDS)
+    writer.writerows([_csv_cell(row.get(field)) for field in FIELDS] for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+async def export_rows(cursor, format: str, batch_size: int) -> AsyncIterator[bytes]:
+    """Yield the encoded body of an export, one chunk per cursor batch."""
+    if format == "csv":
+        yield encode_csv([], header=True)
+    batch: List[Dict[str, Any]] = []
+    async for row in cursor:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield encode_csv(batch) if format == "csv" else encode_ndjson(batch)
+            batch = []
+    if batch:
+        yield encode_csv(batch) if format == "csv" else encode_ndjson(batch)
@@ -0,0 +1,241 @@
+"""Contact volume rollups behind ``GET /api/portfolio/contact/stats``.
+
+Stats are read from bucket documents in ``contact_stats``, one per hour
+and one per day, instead of from ``contact_messages``:
+
+    {"_id": "hour:2024-05-01T12:00:00", "unit": "hour", "start": datetime(2024, 5, 1, 12),
+     "count": 3, "domains": {"example%2Ecom": 2, ...}, "keywords": {"invoice": 1, ...}}
+
+``Rollups.record`` adds stored messages to their buckets with one ``$inc``
+upsert per bucket touched. ``ContactWriter`` calls it after every batch it
+writes, so the rollups keep up with the collection with no periodic job. A
+stats request reads only the buckets of its range. Its cost depends on the
+range and on how many distinct domains and keywords it holds, not on the
+number of messages.
+
+Field names cannot hold dots, so sender domains are percent-escaped.
+Keywords are the first few distinct words of the subject that are not stop
+words.
+
+Messages older than the rollups are counted by ``backfill`` instead, once
+per database. The first server to start with the rollups fixes a cutoff,
+its start time, in the ``meta:backfill`` document. ``record`` counts the
+messages at or after the cutoff, and ``backfill`` the ones before it, so no
+message is counted by both however the two interleave. A message from
+before the cutoff that is only stored once the backfill has finished (a
+late spill replay) is counted by ``record``.
+
+The backfill reads the earlier messages in timestamp order and ``$set``s
+each bucket's totals, under ``backfill``, once it has passed the bucket.
+Running it again gives the same result, so a backfill that died halfway is
+simply run again: its claim is taken over once ``claimed_at`` is older than
+``timeout``, or at once by the same ``owner`` (a restarted worker).
+
+Archiving and retention do not change the rollups.
+"""
+import logging
+import re
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pagination
+from text_search import STOP_WORDS
+
+logger = logging.getLogger(__name__)
+
+UNITS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+# Longest range a request may cover, in buckets
+MAX_BUCKETS = {"hour": 24 * 31, "day": 366 * 2}
+KEYWORDS_PER_MESSAGE = 5
+BACKFILL = "meta:backfill"
+BACKFILL_BATCH = 500
+# A claim not renewed for this long belongs to a backfill that died
+BACKFILL_TIMEOUT = 600.0
+
+_KEYWORD = re.compile(r"[^\W\d_]{3,}")
+
+
+def bucket_start(timestamp: datetime, unit: str) -> datetime:
+    if unit == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def sender_domain(email: str) -> str:
+    return email.rpartition("@")[2].lower()
+
+
+def keywords(subject: str) -> List[str]:
+    words = []
+    for match in _KEYWORD.finditer(subject):
+        word = match.group().casefold()
+        if word not in STOP_WORDS and word not in words:
+            words.append(word)
+            if len(words) == KEYWORDS_PER_MESSAGE:
+                break
+    return words
+
+
+def _escape(key: str) -> str:
+    return key.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def _unescape(key: str) -> str:
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+
+def _top(counts: Counter, top: int, label: str) -> List[Dict[str, Any]]:
+    return [{label: key, "count": count} for key, count in counts.most_common(top)]
+
+
+def _fields(message: Dict[str, Any]) -> List[str]:
+    fields = ["count", f"domains.{_escape(sender_domain(message['email']))}"]
+    return fields + [f"keywords.{word}" for word in keywords(message["subject"])]
+
+
+def _totals(counts: Counter) -> Dict[str, Any]:
+    """``$set`` value of a bucket's backfill totals, from ``_fields`` counts."""
+    totals: Dict[str, Any] = {"count": counts["count"], "domains": {}, "keywords": {}}
+    for field, value in counts.items():
+        group, _, key = field.partition(".")
+        if key:
+            totals[group][key] = value
+    return totals
+
+
+class Rollups:
+    def __init__(self, collection):
+        self.collection = collection
+        # The cutoff, if this is the first server with the rollups (naive
+        # UTC, like stored timestamps)
+        self._started = datetime.utcnow()
+        self._cutoff: Optional[datetime] = None
+        self._backfilled = False
+
+    async def prepare(self) -> datetime:
+        """Fix the backfill cutoff, if no server did yet, and return it.
+
+        Call it at startup, before the contact writer stores anything;
+        ``record`` calls it when startup could not reach the database.
+        """
+        if self._cutoff is None:
+            await self.collection.update_one(
+                {"_id": BACKFILL}, {"$setOnInsert": {"cutoff": self._started}}, upsert=True,
+            )
+            meta = await self.collection.find_one({"_id": BACKFILL})
+            self._cutoff = meta["cutoff"]
+            self._backfilled = "finished_at" in meta
+        return self._cutoff
+
+    async def record(self, messages: Iterable[Dict[str, Any]]) -> None:
+        """Add stored messages to the hour and day buckets of their timestamps."""
+        cutoff = await self.prepare()
+        messages = list(messages)
+        if not self._backfilled and any(message["timestamp"] < cutoff for message in messages):
+            meta = await self.collection.find_one({"_id": BACKFILL}, {"finished_at": 1})
+            self._backfilled = meta is not None and "finished_at" in meta
+        increments: Dict[Tuple[str, datetime], Counter] = {}
+        for message in messages:
+            if message["timestamp"] < cutoff and not self._backfilled:
+                # The backfill counts it
+                continue
+            fields = _fields(message)
+            for unit in UNITS:
+                start = bucket_start(message["timestamp"], unit)
+                increments.setdefault((unit, start), Counter()).update(fields)
+        for (unit, start), inc in increments.items():
+            await self.collection.update_one(
+                {"_id": f"{unit}:{start.isoformat()}"},
+                {"$inc": dict(inc), "$setOnInsert": {"unit": unit, "start": start}},
+                upsert=True,
+            )
+
+    async def backfill(self, messages, owner: str = "", timeout: float = BACKFILL_TIMEOUT) -> int:
+        """Count the messages older than the cutoff, unless another server is
+        doing it or has done it.
+
+        Returns the number of messages counted (0 when it was not this
+        server's to do).
+        """
+        cutoff = await self.prepare()
+        now = datetime.now(timezone.utc)
+        claim = await self.collection.update_one(
+            {"_id": BACKFILL, "finished_at": {"$exists": False}, "$or": [
+                {"claimed_at": {"$exists": False}},
+                {"claimed_at": {"$lt": now - timedelta(seconds=timeout)}},
+                {"owner": owner},
+            ]},
+            {"$set": {"claimed_at": now, "owner": owner}},
+        )
+        if not claim.modified_count:
+            return 0
+        recorded = 0
+        current: Dict[str, Tuple[Optional[datetime], Counter]] = {unit: (None, Counter()) for unit in UNITS}
+        cursor = messages.find(
+            {"timestamp": {"$lt": cutoff}}, {"_id": 0, "timestamp": 1, "email": 1, "subject": 1},
+        ).sort(pagination.ASCENDING).batch_size(BACKFILL_BATCH)
+        async for message in cursor:
+            fields = _fields(message)
+            for unit in UNITS:
+                start = bucket_start(message["timestamp"], unit)
+                if start != current[unit][0]:
+                    # Messages come in timestamp order: the previous bucket is complete
+                    await self._set_backfill(unit, *current[unit])
+                    current[unit] = (start, Counter())
+                current[unit][1].update(fields)
+            recorded += 1
+            if recorded % BACKFILL_BATCH == 0:
+                await self.collection.update_one(
+                    {"_id": BACKFILL}, {"$set": {"claimed_at": datetime.now(timezone.utc)}},
+                )
+        for unit in UNITS:
+            await self._set_backfill(unit, *current[unit])
+        await self.collection.update_one(
+            {"_id": BACKFILL}, {"$set": {"finished_at": datetime.now(timezone.utc), "messages": recorded}},
+        )
+        self._backfilled = True
+        if recorded:
+            logger.info("Added %d earlier contact message(s) to the stats rollups", recorded)
+        return recorded
+
+    async def _set_backfill(self, unit: str, start: Optional[datetime], counts: Counter) -> None:
+        if start is None:
+            return
+        await self.collection.update_one(
+            {"_id": f"{unit}:{start.isoformat()}"},
+            {"$set": {"backfill": _totals(counts)}, "$setOnInsert": {"unit": unit, "start": start}},
+            upsert=True,
+        )
+
+    async def stats(self, unit: str, start: datetime, end: datetime, top: int = 10) -> Dict[str, Any]:
+        """Counts per ``unit`` bucket in [start, end), plus the top domains and keywords."""
+        step = UNITS[unit]
+        start = bucket_start(start, unit)
+        if (end - start) / step > MAX_BUCKETS[unit]:
+            raise ValueError(f"At most {MAX_BUCKETS[unit]} {unit}s per request")
+        docs = await self.collection.find(
+            {"unit": unit, "start": {"$gte": start, "$lt": end}}, {"_id": 0},
+        ).to_list(None)
+        counts: Dict[datetime, int] = {}
+        domains: Counter = Counter()
+        words: Counter = Counter()
+        for doc in docs:
+            for part in (doc, doc.get("backfill", {})):
+                counts[doc["start"]] = counts.get(doc["start"], 0) + part.get("count", 0)
+                domains.update({_unescape(key): value for key, value in part.get("domains", {}).items()})
+                words.update(part.get("keywords", {}))
+        series = []
+        bucket = start
+        while bucket < end:
+            series.append({"start": bucket, "count": counts.get(bucket, 0)})
+            bucket += step
+        return {
+            "granularity": unit,
+            "start": start,
+            "end": end,
+            "total": sum(counts.values()),
+            "series": series,
+            "top_domains": _top(domains, top, "domain"),
+            "top_keywords": _top(words, top, "keyword"),
+        }
@@ -0,0 +1,249 @@
+"""Write-behind ingestion of contact messages.
+
+``submit`` only enqueues; a single background task drains the queue and
+writes batches with ``insert_many`` once ``max_batch`` messages are waiting or
+``flush_interval`` seconds have passed since the first one arrived. The queue
+is bounded, so a flood turns into fast ``ContactQueueFull`` rejections rather
+than unbounded memory growth.
+
+Batches that cannot be written (database outage, or anything still queued at
+shutdown when the database is gone) are appended to a JSON-lines spill file
+and fsynced. The spill file is replayed on start-up and after the next
+successful write.
+
+Rows that were stored are handed to ``on_stored`` (the stats rollups, see
+``contact_stats.py``); a failure there never affects the write.
+
+Each worker of a multi-process server spills to its own file
+(``worker_spill_path``); ``adopt_spills`` hands the files no running worker
+will replay to worker 0.
+"""
+import asyncio
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from bson import json_util
+from pymongo.errors import BulkWriteError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+
+class ContactQueueFull(Exception):
+    """The ingestion queue stayed full for longer than the enqueue timeout."""
+
+
+def worker_spill_path(path: Path, index: Optional[int]) -> Path:
+    """Spill file of worker ``index``; None is a single-process server."""
+    return path if index is None else path.with_name(f"{path.stem}.{index}{path.suffix}")
+
+
+def adopt_spills(path: Path, workers: int) -> int:
+    """Append the spill files no worker below ``workers`` owns to worker 0's file.
+
+    These are the single-process file and, after scaling down, the files of
+    workers that are gone, ``.replay`` leftovers included. Call it before
+    the workers start. Returns the number of files adopted.
+    """
+    target = worker_spill_path(path, 0)
+    pattern = re.compile(rf"{re.escape(path.stem)}\.(\d+){re.escape(path.suffix)}(\.replay)?")
+    orphans = [path, path.with_suffix(path.suffix + ".replay")]
+    if path.parent.exists():
+        for candidate in sorted(path.parent.iterdir()):
+            match = pattern.fullmatch(candidate.name)
+            if match and int(match.group(1)) >= workers:
+                orphans.append(candidate)
+    adopted = 0
+    for orphan in orphans:
+        if not orphan.exists():
+            continue
+        with open(target, "ab") as out, open(orphan, "rb") as spill:
+            out.write(spill.read())
+            out.flush()
+            os.fsync(out.fileno())
+        os.remove(orphan)
+        adopted += 1
+    if adopted:
+        logger.info("Moved %d orphaned contact spill file(s) into %s", adopted, target)
+    return adopted
+
+
+class ContactWriter:
+    def __init__(
+        self,
+        collection,
+        spill_path: Path,
+        max_batch: int = 100,
+        flush_interval: float = 0.05,
+        max_queue: int = 10000,
+        enqueue_timeout: float = 0.5,
+        on_stored: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+    ):
+        self.collection = collection
+        self.on_stored = on_stored
+        self.spill_path = Path(spill_path)
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.enqueue_timeout = enqueue_timeout
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        # Batch being gathered or written; survives cancellation of the task
+        self._inflight: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize() + len(self._inflight)
+
+    async def submit(self, doc: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(doc)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self.queue.put(doc), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                raise ContactQueueFull() from None
+
+    async def start(self) -> None:
+        await self.replay_spill()
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        """Stop the writer and flush (or spill) everything still queued."""
+        if self._task is not None:
+            # Before Python 3.12, wait_for() drops a cancellation that races
+            # with its result, so cancel until the task has really stopped
+            while not self._task.done():
+                self._task.cancel()
+                await asyncio.wait({self._task}, timeout=0.1)
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Rows of an interrupted insert_many may already be stored; the
+        # unique index on ``id`` turns those into ignored duplicates.
+        inflight, self._inflight = self._inflight, []
+        await self._write_batch(inflight)
+        await self.flush()
+        # A fresh queue is not bound to this event loop, so the writer can be
+        # started again on another one
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+
+    async def flush(self) -> None:
+        """Wait until every message accepted so far is written (or spilled)."""
+        if self._task is not None and not self._task.done():
+            await self.queue.join()
+            return
+        while not self.queue.empty():
+            await self._write_batch(self._take(self.max_batch))
+
+    async def replay_spill(self) -> int:
+        replay_path = self.spill_path.with_suffix(self.spill_path.suffix + ".replay")
+        if self.spill_path.exists():
+            if replay_path.exists():
+                # Left over from an interrupted replay; replay both
+                with open(replay_path, "ab") as out, open(self.spill_path, "rb") as spill:
+                    out.write(spill.read())
+                os.remove(self.spill_path)
+            else:
+                os.replace(self.spill_path, replay_path)
+        if not replay_path.exists():
+            return 0
+        with open(replay_path, encoding="utf-8") as spill:
+            docs = [json_util.loads(line) for line in spill if line.strip()]
+        replayed = 0
+        for start in range(0, len(docs), self.max_batch):
+            replayed += await self._write(docs[start:start + self.max_batch])
+        os.remove(replay_path)
+        if docs:
+            logger.info("Replayed %d of %d spilled contact message(s)", replayed, len(docs))
+        return replayed
+
+    def _take(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = self._inflight
+            batch.append(await self.queue.get())
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                batch.extend(self._take(self.max_batch - len(batch)))
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.max_batch or remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            stored = await self._write_batch(batch)
+            self._inflight = []
+            if stored == len(batch) and self.spill_path.exists():
+                await self.replay_spill()
+
+    async def _write_batch(self, batch: List[Dict[str, Any]]) -> int:
+        """``_write`` for messages taken off the queue."""
+        stored = await self._write(batch)
+        # Not reached when cancelled mid-write; stop() rewrites the batch
+        for _ in batch:
+            self.queue.task_done()
+        return stored
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> int:
+        """Insert a batch; spill whatever could not be written. Returns rows stored."""
+        if not batch:
+            return 0
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+            await self._stored(batch)
+            return len(batch)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            failed = {error["index"] for error in errors if error.get("code") != DUPLICATE_KEY}
+            self._spill([batch[index] for index in sorted(failed)])
+            # Duplicates were stored, and reported, by an earlier write
+            skipped = {error["index"] for error in errors}
+            await self._stored([doc for index, doc in enumerate(batch) if index not in skipped])
+            return len(batch) - len(failed)
+        except PyMongoError as e:
+            logger.warning(
+                "Writing %d contact message(s) failed (%s); spilling to %s",
+                len(batch), e, self.spill_path,
+            )
+            self._spill(batch)
+            return 0
+        except Exception:
+            logger.exception("Writing %d contact message(s) failed; spilling", len(batch))
+            self._spill(batch)
+            return 0
+
+    async def _stored(self, docs: List[Dict[str, Any]]) -> None:
+        if self.on_stored is None or not docs:
+            return
+        try:
+            await self.on_stored(docs)
+        except Exception:
+            logger.exception("Handling %d stored contact message(s) failed", len(docs))
+
+    def _spill(self, docs: List[Dict[str, Any]]) -> None:
+        if not docs:
+            return
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as spill:
+            for doc in docs:
+                spill.write(json_util.dumps(doc) + "\n")
+            spill.flush()
+            os.fsync(spill.fileno())
@@ -0,0 +1,272 @@
+"""Read-through cache of pre-serialized portfolio responses.
+
+Each portfolio section is produced by a registered loader (sync or async).
+The loader runs once (at startup, after an invalidation, or when the entry's
+TTL lapses), its result is JSON-encoded, and the encoded bytes are served as-is
+on every subsequent request, so the hot path does no database access, model
+construction, validation or encoding.
+
+An expired entry keeps being served while a single background refresh
+replaces it; only a section that was never loaded makes a reader wait.
+
+``swap`` replaces every section at once with a complete content version,
+so readers never mix sections of two versions.
+"""
+import asyncio
+import hashlib
+import inspect
+import logging
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import Response
+
+import compression
+import fast_json
+
+logger = logging.getLogger(__name__)
+
+# Namespace for deterministic content ids, so ids survive rebuilds and restarts.
+CONTENT_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "portfolio-content")
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def stable_id(section: str, key: str) -> str:
+    """Deterministic id for a content item, derived from its section and key."""
+    return str(uuid.uuid5(CONTENT_NAMESPACE, f"{section}:{key}"))
+
+
+def encode_json(value: Any) -> bytes:
+    """Encode a value the way FastAPI would, with the selected serializer."""
+    return fast_json.dumps(jsonable_encoder(value))
+
+
+def resolve_sections(available: Sequence[str], names: Optional[Sequence[str]] = None) -> Tuple[str, ...]:
+    """Canonical (``available``-ordered) tuple of section names.
+
+    Names may use either ``snake_case`` or the ``kebab-case`` of the
+    routes; ``None`` selects every section.
+    """
+    if names is None:
+        return tuple(available)
+    wanted = {name.strip().replace("-", "_") for name in names if name.strip()}
+    unknown = wanted.difference(available)
+    if unknown:
+        raise KeyError(f"Unknown content section(s): {', '.join(sorted(unknown))}")
+    return tuple(name for name in available if name in wanted)
+
+
+class CachedResponse:
+    """Encoded body of one section, ready to be written to the socket.
+
+    The ETag is a hash of the encoded bytes, computed once per content
+    version. Content ids are deterministic (see ``stable_id``), so identical
+    content always hashes to the same tag.
+
+    ``variants`` holds the compressed copies of the body (coding -> bytes
+    and ETag), also computed once per content version. Each copy is its
+    own representation, so it gets its own tag: ``"<hash>-gzip"``.
+    """
+
+    __slots__ = ("section", "body", "etag", "expires_at", "variants", "codings")
+
+    def __init__(self, section: str, body: bytes, expires_at: float = float("inf")):
+        self.section = section
+        # Exact-size copy: orjson returns bytes with spare capacity, which a
+        # long-lived cache entry would keep
+        self.body = bytes(memoryview(body))
+        self.etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+        self.expires_at = expires_at
+        self.variants: Dict[str, Tuple[bytes, str]] = {
+            coding: (data, '%s-%s"' % (self.etag[:-1], coding))
+            for coding, data in compression.variants(body).items()
+        }
+        self.codings = tuple(self.variants)
+
+    def select(self, accept_encoding: Optional[str]) -> Tuple[Optional[str], bytes, str]:
+        """(coding, body, ETag) of the variant to send; coding ``None`` is identity."""
+        coding = compression.negotiate(accept_encoding, self.codings)
+        if coding is None:
+            return None, self.body, self.etag
+        body, etag = self.variants[coding]
+        return coding, body, etag
+
+    def headers(self, coding: Optional[str], etag: str) -> Dict[str, str]:
+        headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+        if coding is not None:
+            headers["Content-Encoding"] = coding
+        return headers
+
+    def to_response(self, accept_encoding: Optional[str] = None) -> Response:
+        coding, body, etag = self.select(accept_encoding)
+        return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=self.headers(coding, etag))
+
+    @property
+    def size(self) -> int:
+        """Bytes held: the body plus its compressed variants."""
+        return len(self.body) + sum(len(body) for body, _ in self.variants.values())
+
+
+def splice(key: Sequence[str], entries: Sequence[CachedResponse]) -> CachedResponse:
+    """One JSON object keyed by section name, built from encoded bodies."""
+    parts = [b'"%s":%s' % (name.encode(), part.body) for name, part in zip(key, entries)]
+    return CachedResponse("+".join(key), b"{" + b",".join(parts) + b"}")
+
+
+class ContentCache:
+    """Registry of section loaders plus their encoded output.
+
+    ``ttl`` (seconds) bounds how long an entry is served without being
+    reloaded; ``None`` keeps entries until they are invalidated.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        # Content version last swapped in (None: sections loaded one by one)
+        self.version: Optional[int] = None
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._entries: Dict[str, CachedResponse] = {}
+        self._aggregates: Dict[Tuple[str, ...], CachedResponse] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._swaps = 0
+
+    def section(self, name: str):
+        """Decorator registering the loader for a section."""
+        def decorator(loader: Callable[[], Any]) -> Callable[[], Any]:
+            self.register(name, loader)
+            return loader
+        return decorator
+
+    def register(self, name: str, loader: Callable[[], Any]) -> None:
+        if name in self._loaders:
+            raise ValueError(f"Section '{name}' is already registered")
+        self._loaders[name] = loader
+
+    @property
+    def sections(self) -> Iterable[str]:
+        return self._loaders.keys()
+
+    async def warm(self) -> None:
+        """Load every registered section that is not cached yet."""
+        await asyncio.gather(*(self.fetch(name) for name in self._loaders))
+        await self.aggregate()
+
+    def get(self, name: str) -> CachedResponse:
+        """Currently cached entry, without loading or TTL checks."""
+        try:
+            return self._entries[name]
+        except KeyError:
+            if name not in self._loaders:
+                raise KeyError(f"Unknown content section '{name}'") from None
+            raise LookupError(f"Content section '{name}' is not loaded") from None
+
+    async def fetch(self, name: str) -> CachedResponse:
+        entry = self._entries.get(name)
+        if entry is None:
+            return await self.refresh(name)
+        if entry.expires_at <= time.monotonic() and name not in self._pending:
+            asyncio.ensure_future(self._refresh_quietly(name))
+        return entry
+
+    async def refresh(self, name: str) -> CachedResponse:
+        """Reload a section now; concurrent callers share a single load."""
+        pending = self._pending.get(name)
+        if pending is None:
+            pending = self._pending[name] = asyncio.ensure_future(self._load(name))
+            pending.add_done_callback(lambda _: self._pending.pop(name, None))
+        return await asyncio.shield(pending)
+
+    async def response(self, name: str, accept_encoding: Optional[str] = None) -> Response:
+        return (await self.fetch(name)).to_response(accept_encoding)
+
+    def resolve(self, names: Optional[Sequence[str]] = None) -> Tuple[str, ...]:
+        """Canonical (registration-ordered) tuple of section names."""
+        return resolve_sections(tuple(self._loaders), names)
+
+    async def aggregate(self, names: Optional[Sequence[str]] = None) -> CachedResponse:
+        """One JSON object keyed by section name, spliced from cached bodies."""
+        key = self.resolve(names)
+        while True:
+            swaps = self._swaps
+            entries = [await self.fetch(name) for name in key]
+            if swaps == self._swaps:
+                break
+            # A version was swapped in while sections were loading
+        entry = self._aggregates.get(key)
+        if entry is None:
+            entry = self._aggregates[key] = splice(key, entries)
+        return entry
+
+    def swap(self, version: int, values: Dict[str, Any]) -> None:
+        """Replace every section with the values of content ``version``.
+
+        All of it is encoded before the switch, which is a single step with
+        no await in between: readers get the previous version or this one.
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        entries = {}
+        for name in self._loaders:
+            entry = CachedResponse(name, encode_json(values[name]), expires_at)
+            previous = self._entries.get(name)
+            if previous is not None and previous.etag == entry.etag:
+                previous.expires_at = expires_at
+                entry = previous
+            entries[name] = entry
+        key = tuple(self._loaders)
+        aggregates = {key: splice(key, [entries[name] for name in key])}
+        self._entries, self._aggregates = entries, aggregates
+        self.version = version
+        self._swaps += 1
+
+    def preload(self, values: Dict[str, Any]) -> None:
+        """Cache ``values`` for the sections that are not loaded yet."""
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        for name, value in values.items():
+            if name in self._loaders and name not in self._entries:
+                self._entries[name] = CachedResponse(name, encode_json(value), expires_at)
+                self._drop_aggregates(name)
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Drop one section (or all of them); it is reloaded on next access."""
+        if name is None:
+            self._entries.clear()
+            self._aggregates.clear()
+        else:
+            self._entries.pop(name, None)
+            self._drop_aggregates(name)
+
+    def _drop_aggregates(self, name: str) -> None:
+        for key in [key for key in self._aggregates if name in key]:
+            del self._aggregates[key]
+
+    async def _load(self, name: str) -> CachedResponse:
+        try:
+            loader = self._loaders[name]
+        except KeyError:
+            raise KeyError(f"Unknown content section '{name}'") from None
+        swaps = self._swaps
+        value = loader()
+        if inspect.isawaitable(value):
+            value = await value
+        if swaps != self._swaps and name in self._entries:
+            # A whole version was swapped in meanwhile; this load may be older
+            return self._entries[name]
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        entry = CachedResponse(name, encode_json(value), expires_at)
+        previous = self._entries.get(name)
+        if previous is not None and previous.etag == entry.etag:
+            # Unchanged content: keep the old entry (and its aggregates)
+            previous.expires_at = expires_at
+            return previous
+        self._entries[name] = entry
+        self._drop_aggregates(name)
+        return entry
+
+    async def _refresh_quietly(self, name: str) -> None:
+        try:
+            await self.refresh(name)
+        except Exception:
+            logger.exception("Refreshing content section '%s' failed; serving stale copy", name)
@@ -0,0 +1,201 @@
+"""MongoDB-backed portfolio content.
+
+Every portfolio section lives in its own collection (single-document sections
+such as ``personal_info`` hold one document, list sections hold one document
+per item ordered by an ``order`` field). Sections are read through the
+in-process ``ContentCache``, so requests never touch the database; the cache
+is kept current by a MongoDB change stream on the content collections, and
+falls back to polling when change streams are unavailable (standalone
+servers). The cache TTL is the last line of defence against missed events.
+
+Once content has been published through the admin API (see
+``content_versions.py``), the latest version is the published content and
+the section collections are no longer read. A new version is swapped into
+the cache whole, never section by section.
+"""
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Type
+
+from pydantic import BaseModel
+from pymongo.errors import OperationFailure, PyMongoError
+
+import content_versions
+from content_cache import ContentCache
+
+logger = logging.getLogger(__name__)
+
+# IllegalOperation / "$changeStream is only supported on replica sets"
+CHANGE_STREAMS_UNSUPPORTED = {20, 40573}
+
+
+class SectionSpec(NamedTuple):
+    collection: str
+    model: Type[BaseModel]
+    many: bool
+    default: Callable[[], Any]
+
+
+class ContentStore:
+    def __init__(self, db, cache: ContentCache, poll_interval: float = 30.0):
+        self.db = db
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.specs: Dict[str, SectionSpec] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def section(self, name: str, collection: str, model: Type[BaseModel], many: bool = False):
+        """Decorator registering a section; the function returns its seed content."""
+        def decorator(default: Callable[[], Any]) -> Callable[[], Any]:
+            self.specs[name] = SectionSpec(collection, model, many, default)
+            self.cache.register(name, lambda: self.load(name))
+            return default
+        return decorator
+
+    def section_for(self, collection: str) -> Optional[str]:
+        for name, spec in self.specs.items():
+            if spec.collection == collection:
+                return name
+        return None
+
+    async def load(self, name: str):
+        version = await content_versions.latest(self.db)
+        if version is None:
+            return await self.load_collection(name)
+        if version["version"] != self.cache.version:
+            # Newer than what the cache holds: swap in every section of it at
+            # once rather than this one alone
+            self.cache.swap(version["version"], await self.load_version(version))
+        if name not in version["sections"]:
+            return await self.load_collection(name)
+        return self.validate(name, version["sections"][name])
+
+    async def load_version(self, version: Dict[str, Any]) -> Dict[str, Any]:
+        """Section name -> value of a ``content_versions`` document."""
+        values = {}
+        for name in self.specs:
+            if name in version["sections"]:
+                values[name] = self.validate(name, version["sections"][name])
+            else:
+                # Registered after the version was published
+                values[name] = await self.load_collection(name)
+        return values
+
+    def validate(self, name: str, content: Any):
+        """Model(s) of section ``name`` from stored or submitted content."""
+        spec = self.specs[name]
+        if spec.many:
+            if not isinstance(content, list):
+                raise ValueError(f"'{name}' is a list of items")
+            return [item if isinstance(item, spec.model) else spec.model(**item) for item in content]
+        if not isinstance(content, (dict, spec.model)):
+            raise ValueError(f"'{name}' is a single document")
+        return content if isinstance(content, spec.model) else spec.model(**content)
+
+    def dump(self, name: str, value: Any):
+        """Storable form of a value ``validate`` returned."""
+        return [item.dict() for item in value] if self.specs[name].many else value.dict()
+
+    async def load_collection(self, name: str):
+        """Content of section ``name`` in its own collection."""
+        spec = self.specs[name]
+        collection = self.db[spec.collection]
+        if spec.many:
+            docs = await collection.find({}, {"_id": 0}).sort("order", 1).to_list(None)
+            return [spec.model(**doc) for doc in docs]
+        doc = await collection.find_one({}, {"_id": 0})
+        return spec.model(**doc) if doc is not None else spec.default()
+
+    async def seed(self) -> None:
+        """Insert the default content into every empty section collection.
+
+        Upserts are keyed on the (deterministic) item ids, so workers seeding
+        concurrently cannot create duplicates.
+        """
+        await asyncio.gather(*(self._seed_section(spec) for spec in self.specs.values()))
+
+    async def _seed_section(self, spec) -> None:
+        collection = self.db[spec.collection]
+        if await collection.count_documents({}):
+            return
+        default = spec.default()
+        items: List[BaseModel] = default if spec.many else [default]
+        for order, item in enumerate(items):
+            doc = item.dict()
+            if spec.many:
+                doc["order"] = order
+            await collection.update_one({"id": doc["id"]}, {"$setOnInsert": doc}, upsert=True)
+        logger.info("Seeded %d %s document(s)", len(items), spec.collection)
+
+    def use_defaults(self) -> None:
+        """Serve the seed content of every section that could not be loaded."""
+        self.cache.preload({name: spec.default() for name, spec in self.specs.items()})
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh_all(self) -> None:
+        try:
+            version = await content_versions.latest(self.db)
+            if version is not None:
+                if version["version"] != self.cache.version:
+                    self.cache.swap(version["version"], await self.load_version(version))
+                return
+        except Exception:
+            logger.exception("Reloading the published content version failed")
+            return
+        for name in self.specs:
+            try:
+                await self.cache.refresh(name)
+            except Exception:
+                logger.exception("Reloading content section '%s' failed", name)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._watch()
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info(
+                        "Change streams unavailable (%s); polling content every %ss",
+                        e, self.poll_interval,
+                    )
+                    await self._poll()
+                    return
+                logger.warning("Content change stream failed (%s); retrying", e)
+            except PyMongoError as e:
+                logger.warning("Content change stream interrupted (%s); retrying", e)
+            await asyncio.sleep(self.poll_interval)
+            # Catch up on anything written while the stream was down
+            await self.refresh_all()
+
+    async def _watch(self) -> None:
+        collections = [spec.collection for spec in self.specs.values()] + [content_versions.COLLECTION]
+        pipeline = [{"$match": {"ns.coll": {"$in": collections}}}]
+        async with self.db.watch(pipeline) as stream:
+            async for change in stream:
+                if change["ns"]["coll"] == content_versions.COLLECTION:
+                    await self.refresh_all()
+                    continue
+                name = self.section_for(change["ns"]["coll"])
+                if name is None:
+                    continue
+                try:
+                    await self.cache.refresh(name)
+                except Exception:
+                    logger.exception("Reloading content section '%s' failed", name)
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await self.refresh_all()
@@ -0,0 +1,235 @@
+"""Draft editing and versioned publishing of the portfolio content.
+
+Edits go to drafts in ``content_drafts``, one document per section. A
+section without a draft reads as its published content:
+
+    {"section": "projects", "content": [...], "revision": 3, "base_version": 7, "updated_at": ...}
+
+``publish`` takes a snapshot of every section, drafts included, and
+inserts it into ``content_versions`` as a new immutable document numbered
+one past the latest. That single insert is the publish. Versions are never
+updated, and the latest one is the published content:
+
+    {"version": 8, "sections": {"personal_info": {...}, "projects": [...], ...},
+     "published_at": ..., "note": "...", "rolled_back_from": null}
+
+Each worker encodes a new version whole and then swaps it into its
+``ContentCache`` in one step (``ContentCache.swap``). Readers therefore see
+either the old version or the new one, never a mix of sections from both,
+and never wait on a lock. ``rollback(n)`` publishes the content of version
+``n`` again as a new version, so history only grows.
+
+Until the first publish, the content comes from the section collections
+(see ``content_store.py``).
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from content_cache import resolve_sections
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "content_versions"
+DRAFTS = "content_drafts"
+# Attempts at a draft edit or publish that races with another writer
+MAX_ATTEMPTS = 5
+
+
+async def latest(db) -> Optional[Dict[str, Any]]:
+    """The published version document, or None before the first publish."""
+    return await db[COLLECTION].find_one({}, {"_id": 0}, sort=[("version", -1)])
+
+
+class VersionConflict(Exception):
+    """Concurrent writers kept invalidating an edit or publish."""
+
+
+class VersionStore:
+    """Drafts, publishes and rollbacks of the sections of ``store``
+    (a ``ContentStore``). Publishes go out on ``bus`` (a ``cache_bus.Bus``),
+    so every worker swaps the new version in."""
+
+    def __init__(self, db, store, bus=None):
+        self.db = db
+        self.store = store
+        self.bus = bus
+
+    @property
+    def versions(self):
+        return self.db[COLLECTION]
+
+    @property
+    def drafts(self):
+        return self.db[DRAFTS]
+
+    def section_name(self, name: str) -> str:
+        """Canonical section name; the kebab-case of the routes works too."""
+        return resolve_sections(tuple(self.store.specs), [name])[0]
+
+    async def draft(self, section: str) -> Any:
+        """Draft value of ``section``: its draft, or else its published content."""
+        doc = await self.drafts.find_one({"section": section})
+        if doc is not None:
+            return self.store.validate(section, doc["content"])
+        return await self._published(section, await latest(self.db))
+
+    async def drafted(self) -> List[Dict[str, Any]]:
+        """Sections with a draft, and the version each draft started from."""
+        return await self.drafts.find(
+            {}, {"_id": 0, "section": 1, "revision": 1, "base_version": 1, "updated_at": 1}
+        ).sort("section", 1).to_list(None)
+
+    async def put(self, section: str, content: Any) -> Any:
+        """Replace the draft of a whole section (every item, for list sections)."""
+        value = self.store.validate(section, content)
+        return await self._edit(section, lambda _: value)
+
+    async def add_item(self, section: str, item: Dict[str, Any]):
+        """Append an item to the draft of a list section."""
+        spec = self._list_spec(section)
+        new = spec.model(**item)
+
+        def change(items):
+            if any(existing.id == new.id for existing in items):
+                raise ValueError(f"Item '{new.id}' already exists in '{section}'")
+            return items + [new]
+
+        await self._edit(section, change)
+        return new
+
+    async def update_item(self, section: str, item_id: str, item: Dict[str, Any]):
+        """Replace one item of the draft of a list section."""
+        spec = self._list_spec(section)
+        new = spec.model(**dict(item, id=item_id))
+        await self._edit(section, lambda items: [new if existing.id == item_id else existing
+                                                 for existing in self._find(items, section, item_id)])
+        return new
+
+    async def delete_item(self, section: str, item_id: str) -> None:
+        self._list_spec(section)
+        await self._edit(section, lambda items: [existing for existing in self._find(items, section, item_id)
+                                                 if existing.id != item_id])
+
+    async def discard(self, section: Optional[str] = None) -> int:
+        """Drop the draft of ``section`` (None: every draft)."""
+        result = await self.drafts.delete_many({} if section is None else {"section": section})
+        return result.deleted_count
+
+    async def publish(self, note: Optional[str] = None) -> Dict[str, Any]:
+        """Publish every section, drafts included, as a new version."""
+        for _ in range(MAX_ATTEMPTS):
+            current = await latest(self.db)
+            drafts = await self.drafts.find({}, {"_id": 0}).to_list(None)
+            by_section = {doc["section"]: doc for doc in drafts}
+            sections = {}
+            for name in self.store.specs:
+                if name in by_section:
+                    value = self.store.validate(name, by_section[name]["content"])
+                else:
+                    value = await self._published(name, current)
+                sections[name] = self.store.dump(name, value)
+            doc = await self._insert(current, sections, note)
+            if doc is None:
+                continue
+            # Only drafts left untouched since they were read; later edits stay drafts
+            for draft in drafts:
+                await self.drafts.delete_one({"section": draft["section"], "revision": draft["revision"]})
+            await self._published_version(doc)
+            return self._summary(doc)
+        raise VersionConflict("Other publishes kept getting in first; try again")
+
+    async def rollback(self, version: int, note: Optional[str] = None) -> Dict[str, Any]:
+        """Publish the content of ``version`` again, as a new version. Drafts are kept."""
+        source = await self.version(version)
+        for _ in range(MAX_ATTEMPTS):
+            doc = await self._insert(await latest(self.db), source["sections"], note, rolled_back_from=version)
+            if doc is not None:
+                await self._published_version(doc)
+                return self._summary(doc)
+        raise VersionConflict("Other publishes kept getting in first; try again")
+
+    async def history(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Published versions, newest first, without their content."""
+        return await self.versions.find({}, {"_id": 0, "sections": 0}).sort("version", -1).limit(limit).to_list(limit)
+
+    async def version(self, version: int) -> Dict[str, Any]:
+        doc = await self.versions.find_one({"version": version}, {"_id": 0})
+        if doc is None:
+            raise KeyError(f"Unknown content version {version}")
+        return doc
+
+    async def _insert(self, current, sections, note, rolled_back_from=None) -> Optional[Dict[str, Any]]:
+        doc = {
+            "version": (current["version"] if current else 0) + 1,
+            "sections": sections,
+            "published_at": datetime.now(timezone.utc),
+            "note": note,
+            "rolled_back_from": rolled_back_from,
+        }
+        try:
+            await self.versions.insert_one(doc)
+        except DuplicateKeyError:
+            # Another publish took this number; start over from the new latest
+            return None
+        doc.pop("_id", None)
+        return doc
+
+    async def _published_version(self, doc: Dict[str, Any]) -> None:
+        logger.info("Published content version %d", doc["version"])
+        if self.bus is not None:
+            await self.bus.publish("content", None)
+
+    async def _published(self, section: str, current: Optional[Dict[str, Any]]) -> Any:
+        if current is not None and section in current["sections"]:
+            return self.store.validate(section, current["sections"][section])
+        return await self.store.load_collection(section)
+
+    async def _edit(self, section: str, change: Callable[[Any], Any]) -> Any:
+        """Apply ``change`` to the draft of ``section``, creating it from the
+        published content on first edit. Compare-and-set on ``revision``, so
+        concurrent edits are retried rather than lost."""
+        now = datetime.now(timezone.utc)
+        for _ in range(MAX_ATTEMPTS):
+            doc = await self.drafts.find_one({"section": section})
+            if doc is None:
+                current = await latest(self.db)
+                value = change(await self._published(section, current))
+                try:
+                    await self.drafts.insert_one({
+                        "section": section,
+                        "content": self.store.dump(section, value),
+                        "revision": 1,
+                        "base_version": current["version"] if current else None,
+                        "updated_at": now,
+                    })
+                except DuplicateKeyError:
+                    continue
+                return value
+            value = change(self.store.validate(section, doc["content"]))
+            result = await self.drafts.update_one(
+                {"section": section, "revision": doc["revision"]},
+                {"$set": {"content": self.store.dump(section, value), "revision": doc["revision"] + 1,
+                          "updated_at": now}},
+            )
+            if result.matched_count:
+                return value
+        raise VersionConflict(f"Concurrent edits of '{section}' kept conflicting; try again")
+
+    def _list_spec(self, section: str):
+        spec = self.store.specs[section]
+        if not spec.many:
+            raise ValueError(f"'{section}' is a single document, not a list; replace it whole")
+        return spec
+
+    @staticmethod
+    def _find(items, section: str, item_id: str):
+        if not any(item.id == item_id for item in items):
+            raise KeyError(f"No item '{item_id}' in '{section}'")
+        return items
+
+    @staticmethod
+    def _summary(doc: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in doc.items() if key != "sections"}
@@ -0,0 +1,258 @@
+"""Duplicate and near-duplicate detection for contact submissions.
+
+A message's subject and body are normalized: Unicode NFKC, case folding,
+with URLs, e-mail addresses and digit runs replaced by placeholders, and
+punctuation and whitespace collapsed. Two fingerprints come out of that
+text:
+
+* ``exact``: a hash of the normalized text. Short messages (fewer than
+  ``MIN_TOKENS`` words) also hash the sender's address. Otherwise two
+  different people writing "Hello!" would collide.
+* ``signature``: a MinHash of the word 3-shingles (``PERMUTATIONS`` values,
+  one hash XORed with per-permutation masks). The fraction of equal values
+  estimates the Jaccard similarity of two messages. At ``min_similarity``
+  or above, a message is a near-duplicate, for example the same spam with
+  another greeting or name. Short messages get no signature.
+
+Lookups go to a bounded in-memory ``FingerprintIndex`` first, which absorbs
+a flood hitting one worker without any I/O. On a miss they go to the
+``contact_fingerprints`` collection, which every worker shares.
+
+Near-duplicate candidates come from locality-sensitive hashing. The
+signature is cut into ``BANDS`` bands of ``ROWS`` values, and every band
+is hashed into a key. Messages that share any band key are compared.
+With 8 bands of 4 rows, a pair at similarity 0.8 shares a band 98.5% of
+the time, and a pair at 0.3 only 6% of the time. Unrelated messages
+practically never do.
+
+Fingerprints expire after ``ttl`` seconds: through a TTL index in
+MongoDB, and lazily in memory. A check costs about 0.2 ms of CPU plus,
+on an in-memory miss, two MongoDB round trips.
+"""
+import hashlib
+import logging
+import random
+import re
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+MIN_TOKENS = 8
+SHINGLE = 3
+BANDS = 8
+ROWS = 4
+PERMUTATIONS = BANDS * ROWS
+_MASKS = [random.Random(0x5EED).getrandbits(32) for _ in range(PERMUTATIONS)]
+
+_URL = re.compile(r"(?:https?://|www\.)\S+")
+_EMAIL = re.compile(r"\S+@\S+\.\S+")
+_DIGITS = re.compile(r"\d+")
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+class Fingerprint(NamedTuple):
+    exact: str
+    signature: Optional[Tuple[int, ...]]  # None for short messages
+
+    @property
+    def bands(self) -> List[int]:
+        """LSH band keys (positive, so they fit MongoDB's signed 64-bit ints)."""
+        if self.signature is None:
+            return []
+        return [
+            int.from_bytes(_digest(f"{band}:{self.signature[band * ROWS:(band + 1) * ROWS]}", 7), "big")
+            for band in range(BANDS)
+        ]
+
+
+class Duplicate(NamedTuple):
+    message_id: str  # id of the first message with this fingerprint
+    similarity: float  # estimated Jaccard similarity (1.0 for exact)
+
+
+def normalize(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _URL.sub(" url ", text)
+    text = _EMAIL.sub(" email ", text)
+    text = _DIGITS.sub(" 0 ", text)
+    return _NON_WORD.sub(" ", text).split()
+
+
+def _digest(value: str, size: int) -> bytes:
+    return hashlib.blake2b(value.encode(), digest_size=size).digest()
+
+
+def minhash(tokens: List[str]) -> Tuple[int, ...]:
+    hashes = {
+        int.from_bytes(_digest(" ".join(tokens[i:i + SHINGLE]), 4), "big")
+        for i in range(max(len(tokens) - SHINGLE + 1, 1))
+    }
+    return tuple(min([value ^ mask for value in hashes]) for mask in _MASKS)
+
+
+def fingerprint(subject: str, message: str, email: str = "") -> Fingerprint:
+    tokens = normalize(subject) + ["|"] + normalize(message)
+    short = len(tokens) - 1 < MIN_TOKENS
+    key = " ".join(tokens)
+    if short:
+        key = f"{email.casefold()}\n{key}"
+    exact = hashlib.sha256(key.encode()).hexdigest()[:32]
+    return Fingerprint(exact, None if short else minhash(tokens))
+
+
+def similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class _Entry(NamedTuple):
+    signature: Optional[Tuple[int, ...]]
+    message_id: str
+    expires_at: datetime
+
+
+class FingerprintIndex:
+    """Bounded LRU of recent fingerprints, with band buckets for near matches."""
+
+    def __init__(self, max_entries: int = 50000, min_similarity: float = 0.7):
+        self.max_entries = max_entries
+        self.min_similarity = min_similarity
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bands: Dict[int, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, fp: Fingerprint, now: datetime) -> Optional[Duplicate]:
+        entry = self._live(fp.exact, now)
+        if entry is not None:
+            self._entries.move_to_end(fp.exact)
+            return Duplicate(entry.message_id, 1.0)
+        best = None
+        for band in fp.bands:
+            for exact in list(self._bands.get(band, ())):
+                entry = self._live(exact, now)
+                if entry is None:
+                    continue
+                score = similarity(fp.signature, entry.signature)
+                if score >= self.min_similarity and (best is None or score > best.similarity):
+                    best = Duplicate(entry.message_id, score)
+        return best
+
+    def add(self, fp: Fingerprint, message_id: str, expires_at: datetime) -> None:
+        self._remove(fp.exact)
+        self._entries[fp.exact] = _Entry(fp.signature, message_id, expires_at)
+        for band in fp.bands:
+            self._bands.setdefault(band, set()).add(fp.exact)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def discard(self, fp: Fingerprint, message_id: str) -> None:
+        """Forget ``fp`` if it was recorded for ``message_id``."""
+        entry = self._entries.get(fp.exact)
+        if entry is not None and entry.message_id == message_id:
+            self._remove(fp.exact)
+
+    def _live(self, exact: str, now: datetime) -> Optional[_Entry]:
+        entry = self._entries.get(exact)
+        if entry is not None and entry.expires_at <= now:
+            self._remove(exact)
+            return None
+        return entry
+
+    def _remove(self, exact: str) -> None:
+        entry = self._entries.pop(exact, None)
+        if entry is None:
+            return
+        for band in Fingerprint(exact, entry.signature).bands:
+            bucket = self._bands.get(band)
+            if bucket is not None:
+                bucket.discard(exact)
+                if not bucket:
+                    del self._bands[band]
+
+
+class Deduplicator:
+    """Checks submissions against recent fingerprints and records new ones.
+
+    ``collection`` (optional) is the shared fingerprint collection. Errors
+    from it are logged, and the message is then treated as new. A lost
+    duplicate check is cheaper than a lost message.
+    """
+
+    def __init__(self, collection=None, ttl: float = 7 * 24 * 3600, max_entries: int = 50000,
+                 min_similarity: float = 0.7, candidates: int = 20):
+        self.collection = collection
+        self.ttl = timedelta(seconds=ttl)
+        self.index = FingerprintIndex(max_entries, min_similarity)
+        self.min_similarity = min_similarity
+        self.candidates = candidates
+
+    async def check(self, fp: Fingerprint, message_id: str, now: datetime) -> Optional[Duplicate]:
+        """The earlier message ``fp`` duplicates, or None after recording it as new."""
+        duplicate = self.index.lookup(fp, now)
+        if duplicate is not None:
+            return duplicate
+        expires_at = now + self.ttl
+        if self.collection is not None:
+            try:
+                duplicate = await self._check_shared(fp, message_id, now, expires_at)
+            except PyMongoError as e:
+                logger.warning("Fingerprint lookup failed (%s); treating message as new", e)
+        if duplicate is not None:
+            self.index.add(fp, duplicate.message_id, expires_at)
+            return duplicate
+        self.index.add(fp, message_id, expires_at)
+        return None
+
+    async def release(self, fp: Fingerprint, message_id: str) -> None:
+        """Undo the record ``check`` made for ``message_id``.
+
+        For a message that was checked but could not be stored: its retry
+        must not be taken for a duplicate of it.
+        """
+        self.index.discard(fp, message_id)
+        if self.collection is not None:
+            try:
+                await self.collection.delete_one({"_id": fp.exact, "message_id": message_id})
+            except PyMongoError as e:
+                logger.warning("Releasing fingerprint of %s failed: %s", message_id, e)
+
+    async def _check_shared(self, fp: Fingerprint, message_id: str, now: datetime,
+                            expires_at: datetime) -> Optional[Duplicate]:
+        if fp.signature is not None:
+            near = await self._near(fp, now)
+            if near is not None:
+                return near
+        # Upsert keyed on the exact hash: decides races between workers
+        doc = {
+            "signature": list(fp.signature) if fp.signature is not None else None,
+            "bands": fp.bands,
+            "message_id": message_id,
+            "first_seen": now,
+        }
+        result = await self.collection.update_one(
+            {"_id": fp.exact},
+            {"$setOnInsert": doc, "$set": {"last_seen": now, "expires_at": expires_at}},
+            upsert=True,
+        )
+        if result.upserted_id is not None:
+            return None
+        existing = await self.collection.find_one({"_id": fp.exact}, {"message_id": 1})
+        return Duplicate(existing["message_id"] if existing else message_id, 1.0)
+
+    async def _near(self, fp: Fingerprint, now: datetime) -> Optional[Duplicate]:
+        cursor = self.collection.find(
+            {"bands": {"$in": fp.bands}, "expires_at": {"$gt": now}},
+            {"signature": 1, "message_id": 1},
+        ).limit(self.candidates)
+        best = None
+        for doc in await cursor.to_list(self.candidates):
+            score = similarity(fp.signature, doc["signature"])
+            if score >= self.min_similarity and (best is None or score > best.similarity):
+                best = Duplicate(doc["message_id"], score)
+        return best
@@ -0,0 +1,95 @@
+"""Pluggable JSON serializer and the app's default response class.
+
+``orjson`` is used when it is installed, otherwise the standard library
+encoder with FastAPI-compatible settings. ``JSON_SERIALIZER=json`` forces the
+standard library; other serializers can be added with ``register``.
+
+``trusted_response`` is the fast path for data the server built or validated
+itself (cached content, rows it wrote, models it just constructed): the value
+is encoded directly, skipping ``response_model`` re-validation and
+``jsonable_encoder``.
+"""
+import json
+import os
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Callable, Dict, Mapping, Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse, Response
+
+import profiling
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Types neither encoder handles natively."""
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(value: Any) -> bytes:
+    return json.dumps(
+        value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"), default=_default
+    ).encode("utf-8")
+
+
+def _orjson_dumps(value: Any) -> bytes:
+    return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+_serializers: Dict[str, Callable[[Any], bytes]] = {"json": _stdlib_dumps}
+if orjson is not None:
+    _serializers["orjson"] = _orjson_dumps
+
+dumps: Callable[[Any], bytes] = _stdlib_dumps
+serializer_name = "json"
+
+
+def register(name: str, dumps_fn: Callable[[Any], bytes]) -> None:
+    _serializers[name] = dumps_fn
+
+
+def use(name: Optional[str] = None) -> str:
+    """Select the serializer by name (default: orjson when available)."""
+    global dumps, serializer_name
+    if name is None:
+        name = "orjson" if "orjson" in _serializers else "json"
+    try:
+        dumps = _serializers[name]
+    except KeyError:
+        raise ValueError(f"Unknown JSON serializer '{name}' (available: {', '.join(_serializers)})") from None
+    serializer_name = name
+    return name
+
+
+use(os.environ.get("JSON_SERIALIZER") or None)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the selected serializer."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def trusted_response(
+    value: Any, status_code: int = 200, headers: Optional[Mapping[str, str]] = None
+) -> Response:
+    with profiling.stage("serialization"):
+        content = dumps(value)
+    return Response(content=content, status_code=status_code, headers=headers, media_type="application/json")
@@ -0,0 +1,141 @@
+"""HTTP validators and caching headers for pre-serialized routes.
+
+Routes whose body comes from the content cache are registered in a
+``CachedRoutes`` table together with their ``Cache-Control`` policy. Handlers
+use the table to build their response, and ``ConditionalGetMiddleware`` uses
+the same table to answer a matching ``If-None-Match`` with ``304 Not Modified``
+before routing, validation or the handler ever run.
+
+Both negotiate ``Accept-Encoding`` against the entry's pre-compressed
+variants, so a 304 is only sent for the ETag of the variant the client
+would have received.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from content_cache import CachedResponse
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    max_age: int = 60
+    stale_while_revalidate: int = 0
+    public: bool = True
+    header: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        directives = ["public" if self.public else "private", f"max-age={self.max_age}"]
+        if self.stale_while_revalidate:
+            directives.append(f"stale-while-revalidate={self.stale_while_revalidate}")
+        object.__setattr__(self, "header", ", ".join(directives))
+
+    @classmethod
+    def from_env(cls, prefix: str = "CACHE") -> "CachePolicy":
+        """Policy from ``<prefix>_MAX_AGE`` / ``<prefix>_STALE_WHILE_REVALIDATE``."""
+        return cls(
+            max_age=int(os.environ.get(f"{prefix}_MAX_AGE", cls.max_age)),
+            stale_while_revalidate=int(
+                os.environ.get(f"{prefix}_STALE_WHILE_REVALIDATE", cls.stale_while_revalidate)
+            ),
+        )
+
+
+class CachedRoute(NamedTuple):
+    lookup: Callable[[str], Awaitable[CachedResponse]]  # query string -> cached entry
+    policy: CachePolicy
+
+
+class CachedRoutes:
+    """Path -> (cached entry lookup, Cache-Control policy)."""
+
+    def __init__(self, default_policy: Optional[CachePolicy] = None):
+        self.default_policy = default_policy or CachePolicy()
+        self._routes: Dict[str, CachedRoute] = {}
+
+    def add(
+        self,
+        path: str,
+        lookup: Callable[[str], Awaitable[CachedResponse]],
+        policy: Optional[CachePolicy] = None,
+    ) -> None:
+        self._routes[path] = CachedRoute(lookup, policy or self.default_policy)
+
+    def set_policy(self, path: str, policy: CachePolicy) -> None:
+        self._routes[path] = self._routes[path]._replace(policy=policy)
+
+    @property
+    def paths(self) -> List[str]:
+        return list(self._routes)
+
+    def match(self, path: str) -> Optional[CachedRoute]:
+        return self._routes.get(path)
+
+    async def respond(self, request: Request) -> Response:
+        route = self._routes[request.url.path]
+        entry = await route.lookup(request.scope["query_string"].decode("latin-1"))
+        coding, body, etag = entry.select(request.headers.get("accept-encoding"))
+        headers = entry.headers(coding, etag)
+        headers["Cache-Control"] = route.policy.header
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an ``If-None-Match`` header against an ETag."""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class ConditionalGetMiddleware:
+    """Answer conditional GETs for cached routes with 304, skipping the app."""
+
+    def __init__(self, app, routes: CachedRoutes):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        route = self.routes.match(scope["path"])
+        if_none_match = accept_encoding = None
+        if route is not None:
+            for name, value in scope["headers"]:
+                if name == b"if-none-match":
+                    if_none_match = value.decode("latin-1")
+                elif name == b"accept-encoding":
+                    accept_encoding = value.decode("latin-1")
+        if if_none_match is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            entry = await route.lookup(scope["query_string"].decode("latin-1"))
+        except KeyError:
+            # Invalid query; let the handler produce the proper error response
+            await self.app(scope, receive, send)
+            return
+        _, _, etag = entry.select(accept_encoding)
+        if not etag_matches(if_none_match, etag):
+            await self.app(scope, receive, send)
+            return
+        await send({
+            "type": "http.response.start",
+            "status": 304,
+            "headers": [
+                (b"etag", etag.encode("latin-1")),
+                (b"cache-control", route.policy.header.encode("latin-1")),
+                (b"vary", b"Accept-Encoding"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b""})
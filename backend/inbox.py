@@ -0,0 +1,159 @@
+"""Live admin inbox: accepted contact messages as Server-Sent Events.
+
+``Broadcaster.publish`` encodes each accepted message once as an SSE frame
+and fans the same bytes out to every subscriber. The event id is the
+message's keyset cursor (see ``pagination.py``).
+
+Every subscriber has a buffer of ``max_buffer`` events. A subscriber whose
+buffer is full is dropped rather than slowing the publisher down or
+growing without bound. Its stream ends, and the client reconnects, as
+``EventSource`` does by itself, with ``Last-Event-ID``.
+
+A reconnecting client is resumed from its ``Last-Event-ID`` in two steps:
+
+1. the stored messages newer than that cursor, read in ascending order
+   through the ``(timestamp, id)`` index;
+2. the last ``history`` published events, which also cover messages still
+   queued in the contact writer.
+
+Events are de-duplicated by message id. The subscription is taken before
+the replay starts, so nothing published meanwhile is lost.
+
+The broadcaster is per process. With several workers, a stream receives
+live only the messages its own worker accepted. It gets the others from
+the database when it resumes.
+"""
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Deque, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import fast_json
+import pagination
+
+logger = logging.getLogger(__name__)
+
+RETRY_MS = 3000
+REPLAY_BATCH = 200
+
+
+class Event(NamedTuple):
+    id: str
+    key: Tuple[datetime, str]
+    frame: bytes
+
+
+def encode(message: Dict[str, Any]) -> Event:
+    """SSE frame of a contact message document."""
+    message = {field: value for field, value in message.items() if field != "_id"}
+    cursor = pagination.cursor_for(message)
+    frame = b"id: %s\ndata: %s\n\n" % (cursor.encode(), fast_json.dumps(message))
+    return Event(message["id"], (message["timestamp"], message["id"]), frame)
+
+
+class Subscription:
+    def __init__(self, max_buffer: int):
+        self.max_buffer = max_buffer
+        self.buffer: Deque[Event] = deque()
+        self.dropped = False
+        self._wakeup = asyncio.Event()
+
+    def push(self, event: Event) -> bool:
+        """Queue ``event``; False (and dropped) when the buffer is full."""
+        if len(self.buffer) >= self.max_buffer:
+            self.dropped = True
+            self.buffer.clear()
+        else:
+            self.buffer.append(event)
+        self._wakeup.set()
+        return not self.dropped
+
+    async def next(self, timeout: float) -> Optional[Event]:
+        """Next event; None after ``timeout`` idle seconds, or once dropped."""
+        if not self.buffer and not self.dropped:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if self.dropped:
+            return None
+        return self.buffer.popleft()
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Broadcaster:
+    def __init__(self, max_buffer: int = 256, history: int = 1000, max_subscribers: int = 100, registry=None):
+        self.max_buffer = max_buffer
+        self.max_subscribers = max_subscribers
+        self.subscribers: Set[Subscription] = set()
+        self._history: Deque[Event] = deque(maxlen=history)
+        self._dropped = self._published = None
+        if registry is not None:
+            registry.gauge("inbox_subscribers", "Open admin inbox streams", function=lambda: len(self.subscribers))
+            self._published = registry.counter("inbox_events_total", "Contact messages pushed to the admin inbox")
+            self._dropped = registry.counter(
+                "inbox_dropped_subscribers_total", "Admin inbox streams dropped for falling behind",
+            )
+
+    def subscribe(self) -> Subscription:
+        if len(self.subscribers) >= self.max_subscribers:
+            raise TooManySubscribers()
+        subscription = Subscription(self.max_buffer)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscribers.discard(subscription)
+
+    def publish(self, message: Dict[str, Any]) -> None:
+        event = encode(message)
+        self._history.append(event)
+        if self._published is not None:
+            self._published.inc()
+        for subscription in list(self.subscribers):
+            if not subscription.push(event):
+                self.unsubscribe(subscription)
+                if self._dropped is not None:
+                    self._dropped.inc()
+                logger.info("Dropped an admin inbox stream that fell %d events behind", self.max_buffer)
+
+    def recent(self, after: Tuple[datetime, str]) -> List[Event]:
+        """Published events newer than the keyset ``after``, oldest first."""
+        return sorted((event for event in self._history if event.key > after), key=lambda event: event.key)
+
+
+async def stream(
+    broadcaster: Broadcaster, collection, last_event_id: Optional[str], heartbeat: float = 15.0,
+) -> AsyncIterator[bytes]:
+    """SSE body: the replay after ``last_event_id`` (already validated), then live events."""
+    subscription = broadcaster.subscribe()
+    try:
+        yield b"retry: %d\n\n" % RETRY_MS
+        sent: Set[str] = set()
+        if last_event_id:
+            cursor = collection.find(pagination.since(last_event_id), {"_id": 0}) \
+                .sort(pagination.ASCENDING).batch_size(REPLAY_BATCH)
+            async for doc in cursor:
+                event = encode(doc)
+                sent.add(event.id)
+                yield event.frame
+            for event in broadcaster.recent(pagination.decode_cursor(last_event_id)):
+                if event.id not in sent:
+                    sent.add(event.id)
+                    yield event.frame
+        while True:
+            event = await subscription.next(heartbeat)
+            if event is None:
+                if subscription.dropped:
+                    return
+                # Keeps proxies from closing an idle stream
+                yield b": keep-alive\n\n"
+            elif event.id not in sent:
+                yield event.frame
+    finally:
+        broadcaster.unsubscribe(subscription)
@@ -0,0 +1,226 @@
+"""Declarative MongoDB index registry.
+
+Every index the application relies on is declared in ``registry`` and created
+at startup by ``IndexRegistry.ensure``. ``IndexRegistry.check`` compares the
+declarations with the live database and reports missing, mismatched,
+undeclared and unused indexes, plus explain-plan summaries of the admin
+queries. Run it as a script to print that report:
+
+    python indexes.py            # create missing indexes, then report
+    python indexes.py --check    # report only
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Sequence, Set, Tuple
+
+from pymongo.errors import PyMongoError
+
+import pagination
+import text_search
+
+logger = logging.getLogger(__name__)
+
+Keys = Tuple[Tuple[str, Any], ...]
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: Keys
+    name: str
+    options: Dict[str, Any]
+
+
+class ExplainQuery(NamedTuple):
+    name: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Sequence[Tuple[str, int]]
+    limit: int
+
+
+class IndexRegistry:
+    def __init__(self):
+        self.specs: List[IndexSpec] = []
+        self.queries: List[ExplainQuery] = []
+        # (collection, name) of indexes maintained by other code
+        self.external: Set[Tuple[str, str]] = set()
+
+    def add(self, collection: str, keys: Sequence[Tuple[str, Any]], name: str, **options) -> None:
+        self.specs.append(IndexSpec(collection, tuple(tuple(key) for key in keys), name, options))
+
+    def add_external(self, collection: str, name: str) -> None:
+        """Declare an index that is created elsewhere, so ``check`` does not
+        report it as undeclared."""
+        self.external.add((collection, name))
+
+    def add_query(self, name: str, collection: str, filter: Dict[str, Any],
+                  sort: Sequence[Tuple[str, int]] = (), limit: int = 0) -> None:
+        """Declare a query whose plan ``check`` should summarize."""
+        self.queries.append(ExplainQuery(name, collection, filter, sort, limit))
+
+    @property
+    def collections(self) -> List[str]:
+        return list(dict.fromkeys(spec.collection for spec in self.specs))
+
+    async def ensure(self, db) -> List[str]:
+        """Create every declared index, concurrently; returns the names that failed."""
+        async def create(spec: IndexSpec) -> bool:
+            try:
+                await db[spec.collection].create_index(list(spec.keys), name=spec.name, **spec.options)
+                return True
+            except PyMongoError as e:
+                logger.error("Creating index %s.%s failed: %s", spec.collection, spec.name, e)
+                return False
+
+        created = await asyncio.gather(*(create(spec) for spec in self.specs))
+        return [spec.name for spec, ok in zip(self.specs, created) if not ok]
+
+    async def check(self, db) -> Dict[str, Any]:
+        report: Dict[str, Any] = {"collections": {}, "queries": []}
+        for collection in self.collections:
+            report["collections"][collection] = await self._check_collection(db, collection)
+        for query in self.queries:
+            report["queries"].append(await self._explain(db, query))
+        return report
+
+    async def _check_collection(self, db, collection: str) -> Dict[str, Any]:
+        existing = await db[collection].index_information()
+        declared = {spec.name: spec for spec in self.specs if spec.collection == collection}
+        result: Dict[str, Any] = {"missing": [], "mismatched": [], "undeclared": [], "unused": None}
+        for name, spec in declared.items():
+            info = existing.get(name)
+            if info is None:
+                result["missing"].append(name)
+                continue
+            actual_keys = tuple(tuple(key) for key in info["key"])
+            wrong_options = {
+                option: info.get(option) for option, value in spec.options.items()
+                if info.get(option) != value
+            }
+            if actual_keys != _stored_keys(spec.keys) or wrong_options:
+                result["mismatched"].append({"name": name, "keys": actual_keys, "options": wrong_options})
+        result["undeclared"] = [
+            name for name in existing
+            if name != "_id_" and name not in declared and (collection, name) not in self.external
+        ]
+        try:
+            stats = await db[collection].aggregate([{"$indexStats": {}}]).to_list(None)
+            result["unused"] = [
+                stat["name"] for stat in stats
+                if stat["name"] != "_id_" and not stat.get("accesses", {}).get("ops")
+            ]
+        except PyMongoError as e:
+            result["unused_error"] = str(e)
+        return result
+
+    async def _explain(self, db, query: ExplainQuery) -> Dict[str, Any]:
+        cursor = db[query.collection].find(query.filter)
+        if query.sort:
+            cursor = cursor.sort(list(query.sort))
+        if query.limit:
+            cursor = cursor.limit(query.limit)
+        try:
+            explain = await cursor.explain()
+        except PyMongoError as e:
+            return {"name": query.name, "error": str(e)}
+        winning = explain.get("queryPlanner", {}).get("winningPlan", {})
+        stages = _plan_stages(winning.get("queryPlan", winning))
+        stats = explain.get("executionStats", {})
+        return {
+            "name": query.name,
+            "plan": " > ".join(stages),
+            "collection_scan": any(stage.startswith("COLLSCAN") for stage in stages),
+            "in_memory_sort": any(stage.startswith("SORT") for stage in stages),
+            "keys_examined": stats.get("totalKeysExamined"),
+            "docs_examined": stats.get("totalDocsExamined"),
+            "returned": stats.get("nReturned"),
+        }
+
+
+def _stored_keys(keys: Keys) -> Keys:
+    """``keys`` as ``index_information`` reports them: the text fields of a
+    text index become ``_fts``/``_ftsx`` (the fields are in ``weights``)."""
+    stored: List[Tuple[str, Any]] = []
+    for field, direction in keys:
+        if direction != "text":
+            stored.append((field, direction))
+        elif ("_fts", "text") not in stored:
+            stored += [("_fts", "text"), ("_ftsx", 1)]
+    return tuple(stored)
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    stages = []
+    while plan:
+        stage = plan.get("stage", "?")
+        if plan.get("indexName"):
+            stage += f"({plan['indexName']})"
+        stages.append(stage)
+        inputs = plan.get("inputStages") or [plan.get("inputStage")]
+        plan = inputs[0] if inputs else None
+    return stages
+
+
+registry = IndexRegistry()
+
+# Admin listing: keyset pagination on (timestamp, id), newest first
+registry.add("contact_messages", [("timestamp", -1), ("id", -1)], "timestamp_desc")
+# App-level id, also what makes batched/replayed writes idempotent
+registry.add("contact_messages", [("id", 1)], "id_unique", unique=True)
+# Messages from one sender
+registry.add("contact_messages", [("email", 1), ("timestamp", -1)], "email_timestamp")
+# Admin full-text search (text_search.py)
+registry.add(
+    "contact_messages", [(field, "text") for field in text_search.FIELDS], "message_text",
+    weights=text_search.WEIGHTS,
+)
+# Retention (see retention.py): TTL indexes follow CONTACT_RETENTION_DAYS, and
+# archive batches are read newest first
+registry.add_external("contact_messages", "timestamp_ttl")
+registry.add_external("contact_messages_archive", "newest_ttl")
+registry.add("contact_messages_archive", [("newest", -1)], "newest_desc")
+# Contact stats rollups (contact_stats.py): the buckets of a range
+registry.add("contact_stats", [("unit", 1), ("start", 1)], "unit_start")
+# Contact de-duplication: near-duplicate candidates by MinHash band, and
+# fingerprints expire after CONTACT_DEDUPE_TTL_HOURS
+registry.add("contact_fingerprints", [("bands", 1)], "bands")
+registry.add("contact_fingerprints", [("expires_at", 1)], "expires_at_ttl", expireAfterSeconds=0)
+# Hosted portfolios: one document per tenant and section (tenants.py)
+registry.add("tenant_content", [("tenant", 1), ("section", 1)], "tenant_section_unique", unique=True)
+# Published content versions, latest first, and one draft per section
+# (content_versions.py); the unique version makes concurrent publishes safe
+registry.add("content_versions", [("version", -1)], "version_unique", unique=True)
+registry.add("content_drafts", [("section", 1)], "section_unique", unique=True)
+# Cross-worker cache invalidations (CACHE_BUS=mongo) are only read briefly
+registry.add("cache_invalidations", [("at", 1)], "at_ttl", expireAfterSeconds=3600)
+# Idle rate-limit buckets (RATE_LIMIT_BACKEND=mongo) expire on their own
+registry.add("rate_limits", [("expires_at", 1)], "expires_at_ttl", expireAfterSeconds=0)
+
+registry.add_query("latest messages", "contact_messages", {}, pagination.SORT, 100)
+registry.add_query(
+    "next page", "contact_messages",
+    pagination.after(pagination.encode_cursor(datetime(2000, 1, 1), "")), pagination.SORT, 100,
+)
+registry.add_query(
+    "messages from sender", "contact_messages", {"email": "someone@example.com"},
+    [("timestamp", -1)], 100,
+)
+
+
+async def main(check_only: bool) -> Dict[str, Any]:
+    from server import db
+
+    if not check_only:
+        await registry.ensure(db)
+    return await registry.check(db)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create and check the declared MongoDB indexes")
+    parser.add_argument("--check", action="store_true", help="only report, do not create indexes")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args.check)), indent=2, default=str))
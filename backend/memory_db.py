@@ -0,0 +1,680 @@
+"""In-process stand-in for the subset of Motor the backend uses.
+
+Selected with ``MONGO_URL=memory://`` so the API, its tests and the benchmarks
+run without a MongoDB server. Collections keep deep copies of documents in
+insertion order and support the query/update operators the application relies
+on. Database-level change streams are supported too (unless the database is
+created with ``change_streams=False``, which mimics a standalone server), and
+so are ``$text`` queries, answered from a ``text_search.TextIndex`` once the
+collection has a text index.
+"""
+import asyncio
+import copy
+import heapq
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+import text_search
+
+_MISSING = object()
+TEXT_KEY = [("_fts", "text"), ("_ftsx", 1)]
+
+
+def _get_path(doc: Any, path: str) -> Any:
+    for part in path.split("."):
+        if isinstance(doc, Mapping):
+            doc = doc.get(part, _MISSING)
+        elif isinstance(doc, list) and part.isdigit() and int(part) < len(doc):
+            doc = doc[int(part)]
+        else:
+            return _MISSING
+        if doc is _MISSING:
+            return _MISSING
+    return doc
+
+
+def _set_path(doc: Dict[str, Any], path: str, value: Any) -> None:
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def _unset_path(doc: Dict[str, Any], path: str) -> None:
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(last, None)
+
+
+def _compare(a: Any, b: Any) -> Optional[int]:
+    try:
+        return (a > b) - (a < b)
+    except TypeError:
+        return None
+
+
+def _match_operator(value: Any, op: str, arg: Any) -> bool:
+    values = value if isinstance(value, list) else [value]
+    if op == "$eq":
+        return value == arg or arg in values
+    if op == "$ne":
+        return not _match_operator(value, "$eq", arg)
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        for candidate in values:
+            if candidate is _MISSING or candidate is None:
+                continue
+            cmp = _compare(candidate, arg)
+            if cmp is None:
+                continue
+            if (op == "$gt" and cmp > 0) or (op == "$gte" and cmp >= 0) \
+                    or (op == "$lt" and cmp < 0) or (op == "$lte" and cmp <= 0):
+                return True
+        return False
+    if op == "$in":
+        return any(candidate in arg for candidate in values) or value in arg
+    if op == "$nin":
+        return not _match_operator(value, "$in", arg)
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if op == "$regex":
+        pattern = arg if isinstance(arg, re.Pattern) else re.compile(arg)
+        return any(isinstance(candidate, str) and pattern.search(candidate) for candidate in values)
+    if op == "$options":
+        return True
+    raise OperationFailure(f"memory:// does not support query operator {op}")
+
+
+def matches(doc: Mapping[str, Any], query: Optional[Mapping[str, Any]]) -> bool:
+    """Evaluate a MongoDB filter document against ``doc``."""
+    if not query:
+        return True
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, sub) for sub in condition):
+                return False
+        elif key.startswith("$"):
+            raise OperationFailure(f"memory:// does not support query operator {key}")
+        else:
+            value = _get_path(doc, key)
+            if isinstance(condition, Mapping) and condition and all(k.startswith("$") for k in condition):
+                if "$regex" in condition and "i" in condition.get("$options", ""):
+                    condition = dict(condition, **{"$regex": re.compile(condition["$regex"], re.IGNORECASE)})
+                if not all(_match_operator(value, op, arg) for op, arg in condition.items()):
+                    return False
+            elif isinstance(condition, re.Pattern):
+                if not _match_operator(value, "$regex", condition):
+                    return False
+            elif not _match_operator(value, "$eq", condition):
+                return False
+    return True
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Mapping[str, Any]], score: float = 0.0) -> Dict[str, Any]:
+    if isinstance(projection, Mapping) and any(isinstance(value, Mapping) for value in projection.values()):
+        # {"field": {"$meta": "textScore"}} adds the score and leaves the
+        # inclusion/exclusion mode to the other fields
+        meta = [field for field, value in projection.items() if isinstance(value, Mapping)]
+        result = _project(doc, {field: value for field, value in projection.items() if field not in meta})
+        for field in meta:
+            result[field] = score
+        return result
+    if not projection:
+        return copy.deepcopy(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = bool(projection.get("_id", 1))
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if fields and any(fields.values()):
+        result: Dict[str, Any] = {}
+        if include_id and "_id" in doc:
+            result["_id"] = doc["_id"]
+        for field in fields:
+            value = _get_path(doc, field)
+            if value is not _MISSING:
+                _set_path(result, field, copy.deepcopy(value))
+        return result
+    result = copy.deepcopy(doc)
+    for field in fields:
+        _unset_path(result, field)
+    if not include_id:
+        result.pop("_id", None)
+    return result
+
+
+def _sort_key(value: Any):
+    # Mongo's BSON type order, reduced to the types the app stores
+    if value is _MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (5, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, ObjectId):
+        return (4, value.binary)
+    if isinstance(value, datetime):
+        return (6, value)
+    return (3, str(value))
+
+
+class MemoryCursor:
+    def __init__(self, collection: "MemoryCollection", query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort: List[tuple] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[List[Dict[str, Any]]] = None
+
+    def sort(self, key_or_list, direction: int = 1) -> "MemoryCursor":
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+
+    def skip(self, count: int) -> "MemoryCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "MemoryCursor":
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int) -> "MemoryCursor":
+        return self
+
+    def max_time_ms(self, ms: int) -> "MemoryCursor":
+        return self
+
+    async def explain(self) -> Dict[str, Any]:
+        raise OperationFailure("memory:// does not support explain")
+
+    def _evaluate(self) -> List[Dict[str, Any]]:
+        if self._results is None:
+            query, scores = self._query, {}
+            if query and "$text" in query:
+                # Scores are keyed by id() of the stored documents
+                scores, by_key = self._collection._text_search(query["$text"])
+                query = {key: value for key, value in query.items() if key != "$text"}
+                if self._limit and self._sort and isinstance(self._sort[0][1], Mapping) \
+                        and len(scores) > self._skip + self._limit:
+                    # Only the best skip + limit scores (and ties) can reach the page
+                    cutoff = heapq.nlargest(self._skip + self._limit, scores.values())[-1]
+                    candidates = [by_key[key] for key, score in scores.items() if score >= cutoff]
+                else:
+                    candidates = [by_key[key] for key in scores]
+                docs = [doc for doc in candidates if matches(doc, query)]
+            else:
+                docs = [doc for doc in self._collection._candidates(query) if matches(doc, query)]
+            for key, direction in reversed(self._sort):
+                if isinstance(direction, Mapping):  # {"$meta": "textScore"}
+                    docs.sort(key=lambda doc: scores.get(id(doc), 0.0), reverse=True)
+                else:
+                    docs.sort(key=lambda doc: _sort_key(_get_path(doc, key)), reverse=direction < 0)
+            docs = docs[self._skip:]
+            if self._limit:
+                docs = docs[:self._limit]
+            self._results = [_project(doc, self._projection, scores.get(id(doc), 0.0)) for doc in docs]
+        return self._results
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        results = self._evaluate()
+        batch = results if length is None else results[:length]
+        self._results = results[len(batch):]
+        return batch
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        results = self._evaluate()
+        if not results:
+            raise StopAsyncIteration
+        return results.pop(0)
+
+
+class MemoryChangeStream:
+    def __init__(self, database: "MemoryDatabase", pipeline):
+        self._database = database
+        self._match: Dict[str, Any] = {}
+        for stage in pipeline or []:
+            if "$match" in stage:
+                self._match.update(stage["$match"])
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._loop = asyncio.get_running_loop()
+        database._streams.append(self)
+
+    def _publish(self, event: Dict[str, Any]) -> None:
+        if not matches(event, self._match):
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._queue.put_nowait(event)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+
+    def close(self) -> None:
+        if self in self._database._streams:
+            self._database._streams.remove(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        return await self._queue.get()
+
+
+def _normalize_keys(keys) -> List[tuple]:
+    if isinstance(keys, str):
+        return [(keys, 1)]
+    return [tuple(key) if not isinstance(key, str) else (key, 1) for key in keys]
+
+
+class MemoryAggregateCursor:
+    """Result of ``aggregate``; supports the document-shaping stages only."""
+
+    def __init__(self, collection: "MemoryCollection", pipeline):
+        self._collection = collection
+        self._pipeline = list(pipeline)
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        cursor = MemoryCursor(self._collection, None, None)
+        docs = cursor._evaluate()
+        for stage in self._pipeline:
+            (op, arg), = stage.items()
+            if op == "$match":
+                docs = [doc for doc in docs if matches(doc, arg)]
+            elif op == "$sort":
+                for key, direction in reversed(list(arg.items())):
+                    docs.sort(key=lambda doc: _sort_key(_get_path(doc, key)), reverse=direction < 0)
+            elif op == "$skip":
+                docs = docs[arg:]
+            elif op == "$limit":
+                docs = docs[:arg]
+            elif op == "$project":
+                docs = [_project(doc, arg) for doc in docs]
+            else:
+                raise OperationFailure(f"memory:// does not support aggregation stage {op}")
+        return docs if length is None else docs[:length]
+
+
+class MemoryCollection:
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self._docs: List[Dict[str, Any]] = []
+        self._indexes: Dict[str, Dict[str, Any]] = {"_id_": {"key": [("_id", 1)]}}
+        # Index name -> keys present, for the unique indexes (and _id, which
+        # is always unique)
+        self._unique: Dict[str, set] = {"_id_": set()}
+        self._text: Optional[text_search.TextIndex] = None
+        self._text_docs: Dict[int, Dict[str, Any]] = {}
+        # Field -> value -> documents, for equality on the leading field of
+        # an index; built on first use, dropped on every write
+        self._lookups: Dict[str, Optional[Dict[Any, List[Dict[str, Any]]]]] = {}
+
+    def _notify(self, operation: str, doc: Mapping[str, Any]) -> None:
+        if self.database._streams:
+            event = {
+                "operationType": operation,
+                "ns": {"db": self.database.name, "coll": self.name},
+                "documentKey": {"_id": doc.get("_id")},
+            }
+            if operation == "insert":
+                event["fullDocument"] = copy.deepcopy(dict(doc))
+            for stream in list(self.database._streams):
+                stream._publish(event)
+
+    def _unique_key(self, doc: Mapping[str, Any], spec: Dict[str, Any]) -> Optional[str]:
+        key = [_get_path(doc, field) for field, _ in spec["key"]]
+        if spec.get("sparse") and all(value is _MISSING for value in key):
+            return None
+        return repr([None if value is _MISSING else value for value in key])
+
+    def _rebuild_unique(self) -> None:
+        self._unique = {}
+        for name, spec in self._indexes.items():
+            if spec.get("unique") or name == "_id_":
+                keys = self._unique[name] = set()
+                for doc in self._docs:
+                    key = self._unique_key(doc, spec)
+                    if key is None:
+                        continue
+                    if key in keys:
+                        raise DuplicateKeyError(f"E11000 duplicate key error index: {name}", code=11000)
+                    keys.add(key)
+
+    def _candidates(self, query: Optional[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+        """Documents that can match ``query``, narrowed by an equality on the
+        leading field of an index when the query has one."""
+        if query:
+            for spec in self._indexes.values():
+                field, direction = spec["key"][0]
+                value = query.get(field, _MISSING)
+                if direction == "text" or value is _MISSING or isinstance(value, (Mapping, list)):
+                    continue
+                if field not in self._lookups:
+                    self._lookups[field] = self._build_lookup(field)
+                lookup = self._lookups[field]
+                if lookup is not None:
+                    return lookup.get(value, [])
+        return self._docs
+
+    def _build_lookup(self, field: str) -> Optional[Dict[Any, List[Dict[str, Any]]]]:
+        lookup: Dict[Any, List[Dict[str, Any]]] = {}
+        for doc in self._docs:
+            value = _get_path(doc, field)
+            if isinstance(value, (Mapping, list)):
+                # Array and document values match in more ways than equality
+                return None
+            lookup.setdefault(None if value is _MISSING else value, []).append(doc)
+        return lookup
+
+    def _unindex(self, doc: Mapping[str, Any]) -> None:
+        self._lookups.clear()
+        for name, keys in self._unique.items():
+            keys.discard(self._unique_key(doc, self._indexes[name]))
+        if self._text is not None:
+            self._text.remove(id(doc))
+            self._text_docs.pop(id(doc), None)
+
+    def _reindex(self, doc: Mapping[str, Any]) -> None:
+        self._lookups.clear()
+        for name, keys in self._unique.items():
+            key = self._unique_key(doc, self._indexes[name])
+            if key is not None:
+                keys.add(key)
+        if self._text is not None:
+            self._reindex_text(doc)
+
+    def _rebuild_text(self) -> None:
+        self._text, self._text_docs = None, {}
+        for spec in self._indexes.values():
+            if spec["key"] == TEXT_KEY:
+                self._text = text_search.TextIndex(spec["weights"])
+                for doc in self._docs:
+                    self._reindex_text(doc)
+
+    def _reindex_text(self, doc: Dict[str, Any]) -> None:
+        self._text.add(id(doc), doc)
+        self._text_docs[id(doc)] = doc
+
+    def _text_search(self, spec: Mapping[str, Any]):
+        """Scores of the matching documents and the documents, both by id()."""
+        if self._text is None:
+            raise OperationFailure("text index required for $text query", code=27)
+        return self._text.search(text_search.parse(spec["$search"])), self._text_docs
+
+    def _insert(self, document: Dict[str, Any]) -> Any:
+        document.setdefault("_id", ObjectId())
+        added = []
+        for name, keys in self._unique.items():
+            key = self._unique_key(document, self._indexes[name])
+            if key is None:
+                continue
+            if key in keys:
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.database.name}.{self.name} "
+                    f"index: {name}",
+                    code=11000,
+                )
+            added.append((keys, key))
+        for keys, key in added:
+            keys.add(key)
+        stored = copy.deepcopy(document)
+        self._docs.append(stored)
+        self._lookups.clear()
+        if self._text is not None:
+            self._reindex_text(stored)
+        self._notify("insert", document)
+        return document["_id"]
+
+    async def insert_one(self, document: Dict[str, Any]) -> InsertOneResult:
+        return InsertOneResult(self._insert(document), True)
+
+    async def insert_many(self, documents: Iterable[Dict[str, Any]], ordered: bool = True) -> InsertManyResult:
+        inserted, errors = [], []
+        for index, document in enumerate(documents):
+            try:
+                inserted.append(self._insert(document))
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": e.code, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return InsertManyResult(inserted, True)
+
+    def aggregate(self, pipeline, **kwargs) -> MemoryAggregateCursor:
+        return MemoryAggregateCursor(self, pipeline)
+
+    async def create_index(self, keys, name: Optional[str] = None, **options) -> str:
+        key = _normalize_keys(keys)
+        name = name or "_".join(f"{field}_{direction}" for field, direction in key)
+        if any(direction == "text" for _, direction in key):
+            # Stored the way MongoDB reports text indexes
+            weights = options.pop("weights", {})
+            options["weights"] = {field: weights.get(field, 1) for field, direction in key if direction == "text"}
+            options.setdefault("default_language", "english")
+            key = TEXT_KEY
+        spec = dict(options, key=key)
+        existing = self._indexes.get(name)
+        if existing is not None and existing != spec:
+            raise OperationFailure(f"Index with name: {name} already exists with different options", code=85)
+        for other_name, other in self._indexes.items():
+            if other_name != name and other["key"] == key:
+                raise OperationFailure(f"Index already exists with a different name: {other_name}", code=85)
+        self._indexes[name] = spec
+        try:
+            self._rebuild_unique()
+        except DuplicateKeyError:
+            del self._indexes[name]
+            self._rebuild_unique()
+            raise
+        if key == TEXT_KEY and existing is None:
+            self._rebuild_text()
+        return name
+
+    async def index_information(self) -> Dict[str, Dict[str, Any]]:
+        return copy.deepcopy(self._indexes)
+
+    async def drop_index(self, name: str) -> None:
+        if name == "_id_" or name not in self._indexes:
+            raise OperationFailure(f"index not found with name [{name}]", code=27)
+        del self._indexes[name]
+        self._rebuild_unique()
+        self._rebuild_text()
+
+    def find(self, filter: Optional[Mapping[str, Any]] = None, projection=None) -> MemoryCursor:
+        return MemoryCursor(self, filter, projection)
+
+    async def find_one(self, filter: Optional[Mapping[str, Any]] = None, projection=None, sort=None):
+        cursor = self.find(filter, projection)
+        if sort:
+            cursor.sort(sort)
+        results = await cursor.limit(1).to_list(1)
+        return results[0] if results else None
+
+    async def count_documents(self, filter: Optional[Mapping[str, Any]] = None) -> int:
+        return sum(1 for doc in self._docs if matches(doc, filter))
+
+    async def estimated_document_count(self) -> int:
+        return len(self._docs)
+
+    def _apply_update(self, doc: Dict[str, Any], update: Mapping[str, Any], inserting: bool) -> None:
+        for op, fields in update.items():
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                for path, value in fields.items():
+                    _set_path(doc, path, copy.deepcopy(value))
+            elif op == "$setOnInsert":
+                continue
+            elif op == "$unset":
+                for path in fields:
+                    _unset_path(doc, path)
+            elif op == "$inc":
+                for path, amount in fields.items():
+                    current = _get_path(doc, path)
+                    _set_path(doc, path, (0 if current is _MISSING else current) + amount)
+            elif op == "$max":
+                for path, value in fields.items():
+                    current = _get_path(doc, path)
+                    if current is _MISSING or value > current:
+                        _set_path(doc, path, value)
+            elif op == "$push":
+                for path, value in fields.items():
+                    current = _get_path(doc, path)
+                    if current is _MISSING:
+                        current = []
+                        _set_path(doc, path, current)
+                    current.append(copy.deepcopy(value))
+            else:
+                raise OperationFailure(f"memory:// does not support update operator {op}")
+
+    def _upsert_document(self, filter: Mapping[str, Any]) -> Dict[str, Any]:
+        doc: Dict[str, Any] = {}
+        for key, value in (filter or {}).items():
+            if not key.startswith("$") and not (isinstance(value, Mapping) and any(k.startswith("$") for k in value)):
+                _set_path(doc, key, copy.deepcopy(value))
+        return doc
+
+    async def update_one(self, filter, update, upsert: bool = False) -> UpdateResult:
+        for doc in self._docs:
+            if matches(doc, filter):
+                self._unindex(doc)
+                self._apply_update(doc, update, inserting=False)
+                self._reindex(doc)
+                self._notify("update", doc)
+                return UpdateResult({"n": 1, "nModified": 1, "ok": 1.0}, True)
+        if upsert:
+            doc = self._upsert_document(filter)
+            self._apply_update(doc, update, inserting=True)
+            upserted_id = self._insert(doc)
+            return UpdateResult({"n": 1, "nModified": 0, "upserted": upserted_id, "ok": 1.0}, True)
+        return UpdateResult({"n": 0, "nModified": 0, "ok": 1.0}, True)
+
+    async def update_many(self, filter, update, upsert: bool = False) -> UpdateResult:
+        count = 0
+        for doc in self._docs:
+            if matches(doc, filter):
+                self._unindex(doc)
+                self._apply_update(doc, update, inserting=False)
+                self._reindex(doc)
+                self._notify("update", doc)
+                count += 1
+        if not count and upsert:
+            return await self.update_one(filter, update, upsert=True)
+        return UpdateResult({"n": count, "nModified": count, "ok": 1.0}, True)
+
+    async def replace_one(self, filter, replacement, upsert: bool = False) -> UpdateResult:
+        for index, doc in enumerate(self._docs):
+            if matches(doc, filter):
+                new_doc = copy.deepcopy(replacement)
+                new_doc["_id"] = doc["_id"]
+                self._unindex(doc)
+                self._reindex(new_doc)
+                self._docs[index] = new_doc
+                self._notify("replace", new_doc)
+                return UpdateResult({"n": 1, "nModified": 1, "ok": 1.0}, True)
+        if upsert:
+            upserted_id = self._insert(copy.deepcopy(replacement))
+            return UpdateResult({"n": 1, "nModified": 0, "upserted": upserted_id, "ok": 1.0}, True)
+        return UpdateResult({"n": 0, "nModified": 0, "ok": 1.0}, True)
+
+    async def delete_one(self, filter) -> DeleteResult:
+        for index, doc in enumerate(self._docs):
+            if matches(doc, filter):
+                del self._docs[index]
+                self._unindex(doc)
+                self._notify("delete", doc)
+                return DeleteResult({"n": 1, "ok": 1.0}, True)
+        return DeleteResult({"n": 0, "ok": 1.0}, True)
+
+    async def delete_many(self, filter) -> DeleteResult:
+        removed = [doc for doc in self._docs if matches(doc, filter)]
+        self._docs = [doc for doc in self._docs if not matches(doc, filter)]
+        for doc in removed:
+            self._unindex(doc)
+            self._notify("delete", doc)
+        return DeleteResult({"n": len(removed), "ok": 1.0}, True)
+
+
+class MemoryDatabase:
+    def __init__(self, name: str = "test", change_streams: bool = True):
+        self.name = name
+        self.change_streams = change_streams
+        self._collections: Dict[str, MemoryCollection] = {}
+        self._streams: List[MemoryChangeStream] = []
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = MemoryCollection(self, name)
+        return collection
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def list_collection_names(self) -> List[str]:
+        return [name for name, collection in self._collections.items() if collection._docs]
+
+    async def command(self, command, value=1, **kwargs) -> Dict[str, Any]:
+        name = command if isinstance(command, str) else next(iter(command))
+        if name == "ping":
+            return {"ok": 1.0}
+        if name == "collMod" and "index" in kwargs:
+            spec = self[value]._indexes.get(kwargs["index"].get("name"))
+            if spec is None:
+                raise OperationFailure("cannot find index", code=27)
+            old = spec.get("expireAfterSeconds")
+            spec["expireAfterSeconds"] = kwargs["index"]["expireAfterSeconds"]
+            return {"expireAfterSeconds_old": old, "expireAfterSeconds_new": spec["expireAfterSeconds"], "ok": 1.0}
+        raise OperationFailure(f"memory:// does not support command {name}")
+
+    def watch(self, pipeline=None, **kwargs) -> MemoryChangeStream:
+        if not self.change_streams:
+            raise OperationFailure(
+                "The $changeStream stage is only supported on replica sets", code=40573
+            )
+        return MemoryChangeStream(self, pipeline)
+
+
+class MemoryClient:
+    def __init__(self, url: str = "memory://", **kwargs):
+        self._databases: Dict[str, MemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        database = self._databases.get(name)
+        if database is None:
+            database = self._databases[name] = MemoryDatabase(name)
+        return database
+
+    def close(self) -> None:
+        pass
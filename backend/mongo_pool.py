@@ -0,0 +1,276 @@
+"""MongoDB connection pool settings, warm-up and readiness.
+
+``PoolSettings.from_env`` reads the ``MONGO_*`` variables below and turns
+them into client options. The defaults favour failing fast over queueing.
+A request waits at most ``MONGO_WAIT_QUEUE_TIMEOUT_MS`` for a pooled
+connection and ``MONGO_SERVER_SELECTION_TIMEOUT_MS`` for a reachable server.
+When MongoDB is slow, coroutines therefore give up instead of piling up
+behind the pool.
+
+=====================================  ========  ==============================
+Variable                               Default   Client option
+=====================================  ========  ==============================
+``MONGO_MAX_POOL_SIZE``                100       ``maxPoolSize``
+``MONGO_MIN_POOL_SIZE``                10        ``minPoolSize`` (also warmed)
+``MONGO_MAX_CONNECTING``               4         ``maxConnecting``
+``MONGO_MAX_IDLE_TIME_MS``             300000    ``maxIdleTimeMS``
+``MONGO_WAIT_QUEUE_TIMEOUT_MS``        2000      ``waitQueueTimeoutMS``
+``MONGO_SERVER_SELECTION_TIMEOUT_MS``  5000      ``serverSelectionTimeoutMS``
+``MONGO_CONNECT_TIMEOUT_MS``           5000      ``connectTimeoutMS``
+``MONGO_SOCKET_TIMEOUT_MS``            20000     ``socketTimeoutMS``
+``MONGO_RETRY_READS``                  1         ``retryReads``
+``MONGO_RETRY_WRITES``                 1         ``retryWrites``
+=====================================  ========  ==============================
+
+``warm_up`` runs ``min_pool_size`` concurrent pings at startup. Each one
+checks out its own connection, so the pool is open, authenticated and
+sized before the first request arrives.
+
+``PoolMonitor`` is a pool event listener that counts open, in-use and
+waiting connections. ``readiness`` combines those counts with a ping for
+``/api/health/ready``.
+
+``LazyClient`` defers building the client, which means importing Motor,
+parsing the URL and resolving SRV records, until the first operation. The
+app's lifespan performs that operation, not module import. Its databases
+hand out deferred collection handles, so objects built at import time can
+hold collections without touching the client.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+
+class PoolSettings(NamedTuple):
+    max_pool_size: int = 100
+    min_pool_size: int = 10
+    max_connecting: int = 4
+    max_idle_time_ms: int = 300000
+    wait_queue_timeout_ms: int = 2000
+    server_selection_timeout_ms: int = 5000
+    connect_timeout_ms: int = 5000
+    socket_timeout_ms: int = 20000
+    retry_reads: bool = True
+    retry_writes: bool = True
+
+    @classmethod
+    def from_env(cls) -> "PoolSettings":
+        values: Dict[str, Any] = {}
+        for field, default in cls._field_defaults.items():
+            raw = os.environ.get(f"MONGO_{field.upper()}")
+            if raw is not None:
+                values[field] = raw not in ("0", "false", "False") if isinstance(default, bool) else int(raw)
+        return cls(**values)
+
+    def client_options(self) -> Dict[str, Any]:
+        """Keyword arguments for ``AsyncIOMotorClient``."""
+        return {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "maxConnecting": self.max_connecting,
+            "maxIdleTimeMS": self.max_idle_time_ms,
+            "waitQueueTimeoutMS": self.wait_queue_timeout_ms,
+            "serverSelectionTimeoutMS": self.server_selection_timeout_ms,
+            "connectTimeoutMS": self.connect_timeout_ms,
+            "socketTimeoutMS": self.socket_timeout_ms,
+            "retryReads": self.retry_reads,
+            "retryWrites": self.retry_writes,
+        }
+
+
+class LazyClient:
+    """A client built by ``factory`` on first use."""
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._client = None
+
+    @property
+    def built(self) -> bool:
+        return self._client is not None
+
+    def get(self):
+        if self._client is None:
+            self._client = self._factory()
+        return self._client
+
+    def __getitem__(self, name: str) -> "LazyDatabase":
+        return LazyDatabase(self, name)
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+
+
+class LazyDatabase:
+    """A database of a ``LazyClient``; attributes and items are deferred."""
+
+    def __init__(self, client: LazyClient, name: str):
+        self._client = client
+        self.name = name
+
+    def get(self):
+        return self._client.get()[self.name]
+
+    def __getattr__(self, name: str) -> "Deferred":
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return Deferred(lambda: getattr(self.get(), name))
+
+    def __getitem__(self, name: str) -> "Deferred":
+        return Deferred(lambda: self.get()[name])
+
+
+class Deferred:
+    """Proxy for the result of ``factory``, evaluated on first use."""
+
+    __slots__ = ("_factory", "_target")
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            self._target = self._factory()
+        return self._target
+
+    def __getattr__(self, name: str):
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, name: str):
+        return self._resolve()[name]
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Counts pool connections across servers.
+
+    Events arrive on pymongo's threads, hence the lock.
+    """
+
+    def __init__(self, max_pool_size: int, registry=None):
+        self.max_pool_size = max_pool_size
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.gauge("mongodb_pool_connections", "Open MongoDB connections", function=lambda: self.open)
+            registry.gauge("mongodb_pool_in_use", "MongoDB connections checked out", function=lambda: self.in_use)
+            registry.gauge(
+                "mongodb_pool_waiting", "Operations waiting for a MongoDB connection", function=lambda: self.waiting,
+            )
+            registry.gauge(
+                "mongodb_pool_checkout_failures", "Failed MongoDB connection checkouts (timeouts included)",
+                function=lambda: self.checkout_failures,
+            )
+
+    @property
+    def saturation(self) -> float:
+        """Share of the pool in use."""
+        return self.in_use / self.max_pool_size if self.max_pool_size else 0.0
+
+    def _add(self, **deltas: int) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def connection_created(self, event) -> None:
+        self._add(open=1)
+
+    def connection_closed(self, event) -> None:
+        self._add(open=-1)
+
+    def connection_check_out_started(self, event) -> None:
+        self._add(waiting=1)
+
+    def connection_checked_out(self, event) -> None:
+        self._add(waiting=-1, in_use=1)
+
+    def connection_check_out_failed(self, event) -> None:
+        self._add(waiting=-1, checkout_failures=1)
+
+    def connection_checked_in(self, event) -> None:
+        self._add(in_use=-1)
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "open": self.open,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "max": self.max_pool_size,
+            "saturation": round(self.saturation, 3),
+            "checkout_failures": self.checkout_failures,
+        }
+
+
+async def warm_up(db, connections: int, timeout: float = 10.0) -> int:
+    """Open up to ``connections`` pooled connections; returns how many pings succeeded.
+
+    Failures are logged, not raised: the app starts anyway and reports
+    itself not ready until MongoDB answers.
+    """
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(asyncio.wait_for(db.command("ping"), timeout) for _ in range(max(connections, 1))),
+        return_exceptions=True,
+    )
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        logger.warning("MongoDB warm-up: %d of %d ping(s) failed: %s", len(errors), len(results), errors[0])
+    else:
+        logger.info("MongoDB warm-up: %d connection(s) in %.0f ms", len(results),
+                    (time.perf_counter() - started) * 1000)
+    return len(results) - len(errors)
+
+
+async def readiness(db, monitor: PoolMonitor, timeout: float = 1.0, max_saturation: float = 0.95,
+                    pending: Sequence[str] = ()) -> Tuple[bool, Dict[str, Any]]:
+    """Whether MongoDB answers a ping within ``timeout`` with the pool below
+    ``max_saturation``, plus the details behind the answer.
+
+    ``pending`` lists startup steps still waiting for MongoDB; each one is
+    a reason not to be ready.
+    """
+    reasons: List[str] = [f"startup incomplete: {step}" for step in pending]
+    latency_ms: Optional[float] = None
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout)
+        latency_ms = round((time.perf_counter() - started) * 1000, 2)
+    except Exception as e:
+        reasons.append(f"database unreachable: {type(e).__name__}")
+    if monitor.saturation >= max_saturation:
+        reasons.append(f"connection pool saturated ({monitor.in_use}/{monitor.max_pool_size} in use)")
+    return not reasons, {
+        "status": "ready" if not reasons else "not ready",
+        "reasons": reasons,
+        "database": {"ping_ms": latency_ms},
+        "pool": monitor.snapshot(),
+    }
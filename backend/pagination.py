@@ -0,0 +1,68 @@
+"""Keyset (seek) pagination over ``(timestamp, id)``.
+
+Pages are ordered newest first. A cursor encodes the sort key of the last row
+of a page, and the next page is fetched with a range condition on that key
+instead of ``skip``. The query cost therefore stays proportional to the page
+size, whatever the page number or collection size (given an index on
+``(timestamp, id)``).
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+SORT = [("timestamp", -1), ("id", -1)]
+# Oldest first, for reading forwards from a cursor (same index, scanned backwards)
+ASCENDING = [("timestamp", 1), ("id", 1)]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(timestamp: datetime, id: str) -> str:
+    raw = json.dumps([timestamp.isoformat(), id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), str(id)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+def cursor_for(doc: Dict[str, Any]) -> str:
+    return encode_cursor(doc["timestamp"], doc["id"])
+
+
+def after(cursor: Optional[str]) -> Dict[str, Any]:
+    """Filter selecting the rows that sort after ``cursor`` (all rows if None)."""
+    if not cursor:
+        return {}
+    timestamp, id = decode_cursor(cursor)
+    return {"$or": [
+        {"timestamp": {"$lt": timestamp}},
+        {"timestamp": timestamp, "id": {"$lt": id}},
+    ]}
+
+
+def since(cursor: str) -> Dict[str, Any]:
+    """Filter selecting the rows newer than ``cursor``, to read forwards with ``ASCENDING``."""
+    timestamp, id = decode_cursor(cursor)
+    return {"$or": [
+        {"timestamp": {"$gt": timestamp}},
+        {"timestamp": timestamp, "id": {"$gt": id}},
+    ]}
+
+
+def projection(fields: Optional[List[str]]) -> Dict[str, int]:
+    """Mongo projection for ``fields``, always keeping the keyset columns."""
+    if not fields:
+        return {"_id": 0}
+    keep = dict.fromkeys(fields, 1)
+    keep.update({"timestamp": 1, "id": 1, "_id": 0})
+    return keep
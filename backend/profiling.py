@@ -0,0 +1,311 @@
+"""Opt-in, request-scoped stage profiling.
+
+``ProfilingMiddleware`` profiles a request when the request carries the
+profile header (``X-Profile``) set to ``PROFILE_TOKEN``, or when it is
+drawn by ``PROFILE_SAMPLE_RATE``. Without a token the header is ignored, so
+that anonymous clients cannot make the server write files. The wall and
+CPU time of each stage is recorded:
+
+``routing``
+    Middleware plus route matching, up to the route handler.
+``validation``
+    Body parsing and parameter/dependency validation.
+``handler``
+    The endpoint itself. Code inside it marks nested stages with
+    ``stage("db")``, ``stage("serialization")`` and so on.
+``serialization``
+    ``response_model`` validation and rendering after the endpoint returns.
+
+Time not covered by any stage, such as sending the body, stays on the root
+frame, which is ``"<METHOD> <route template>"``. CPU time is the event-loop
+thread's, so it includes other requests interleaved at ``await`` points. It
+is exact only when requests do not overlap.
+
+Each profile is written to ``PROFILE_DIR`` as a pair of folded-stack files
+(``*.wall.folded`` and ``*.cpu.folded``, in microseconds), which
+``flamegraph.pl`` and speedscope read directly. Only the newest
+``PROFILE_MAX_FILES`` profiles are kept. The profile name is returned in the
+``X-Profile-Id`` response header.
+
+When no profile is active, ``stage`` and the route hooks cost one
+``ContextVar`` lookup. The middleware is only installed when ``PROFILE_DIR``
+is set.
+"""
+import contextlib
+import contextvars
+import functools
+import inspect
+import itertools
+import logging
+import os
+import random
+import secrets
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+HEADER = b"x-profile"
+ID_HEADER = b"x-profile-id"
+
+_current: contextvars.ContextVar[Optional["Profile"]] = contextvars.ContextVar("profile", default=None)
+_NO_STAGE = contextlib.nullcontext()
+
+
+class Profile:
+    """Nested stage timings of one request."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.started_wall = time.perf_counter()
+        self.started_cpu = time.thread_time()
+        # Open stages: [name, wall at start, cpu at start, child wall, child cpu]
+        self._stack: List[list] = [[root, self.started_wall, self.started_cpu, 0.0, 0.0]]
+        # Stage path (below the root) -> exclusive (wall, cpu) seconds
+        self.totals: Dict[Tuple[str, ...], List[float]] = {}
+        self.closed = False
+
+    def begin(self, name: str) -> None:
+        if not self.closed:
+            self._stack.append([name, time.perf_counter(), time.thread_time(), 0.0, 0.0])
+
+    def end(self) -> None:
+        if self.closed or len(self._stack) < 2:
+            return
+        path = tuple(frame[0] for frame in self._stack[1:])
+        name, wall_start, cpu_start, child_wall, child_cpu = self._stack.pop()
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        self._add(path, wall - child_wall, cpu - child_cpu)
+        self._stack[-1][3] += wall
+        self._stack[-1][4] += cpu
+
+    def switch(self, name: str) -> None:
+        """End the innermost stage and begin ``name`` in its place."""
+        self.end()
+        self.begin(name)
+
+    def unwind(self, depth: int) -> None:
+        while len(self._stack) > depth:
+            self.end()
+
+    @property
+    def depth(self) -> int:
+        return len(self._stack)
+
+    def record_since_start(self, name: str) -> None:
+        """Record ``name`` as a completed stage spanning the request so far."""
+        if self.closed or len(self._stack) != 1:
+            return
+        self.begin(name)
+        self._stack[-1][1:3] = [self.started_wall, self.started_cpu]
+        self.end()
+
+    def close(self) -> None:
+        self.unwind(1)
+        if self.closed:
+            return
+        _, wall_start, cpu_start, child_wall, child_cpu = self._stack[0]
+        self._add((), time.perf_counter() - wall_start - child_wall, time.thread_time() - cpu_start - child_cpu)
+        self.closed = True
+
+    def _add(self, path: Tuple[str, ...], wall: float, cpu: float) -> None:
+        totals = self.totals.setdefault(path, [0.0, 0.0])
+        totals[0] += max(wall, 0.0)
+        totals[1] += max(cpu, 0.0)
+
+    def folded(self, cpu: bool = False) -> str:
+        """Folded stacks (``root;stage;stage microseconds``), one per line."""
+        lines = []
+        for path, (wall, cpu_time) in self.totals.items():
+            micros = round((cpu_time if cpu else wall) * 1e6)
+            if micros:
+                lines.append(f"{';'.join((self.root,) + path)} {micros}")
+        return "\n".join(lines) + "\n"
+
+
+def current() -> Optional[Profile]:
+    return _current.get()
+
+
+def stage(name: str):
+    """Context manager timing a stage of the current profile (no-op without one).
+
+    Usable around ``await``: only the time between entering and leaving is
+    recorded.
+    """
+    profile = _current.get()
+    if profile is None:
+        return _NO_STAGE
+    return _Stage(profile, name)
+
+
+class _Stage:
+    __slots__ = ("profile", "name", "depth")
+
+    def __init__(self, profile: Profile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.depth = self.profile.depth
+        self.profile.begin(self.name)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.unwind(self.depth)
+
+
+def _profiled_endpoint(call: Callable) -> Callable:
+    """Wrap an endpoint so its run is the ``handler`` stage."""
+    if inspect.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def endpoint(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return await call(*args, **kwargs)
+            profile.switch("handler")
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                profile.switch("serialization")
+    else:
+        @functools.wraps(call)
+        def endpoint(*args, **kwargs):
+            # Runs in the threadpool, where CPU time belongs to another thread
+            profile = _current.get()
+            if profile is None:
+                return call(*args, **kwargs)
+            profile.switch("handler")
+            try:
+                return call(*args, **kwargs)
+            finally:
+                profile.switch("serialization")
+    return endpoint
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute marking the routing, validation, handler and serialization stages."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _profiled_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def route_handler(request):
+            profile = _current.get()
+            if profile is None:
+                return await handler(request)
+            profile.record_since_start("routing")
+            depth = profile.depth
+            profile.begin("validation")
+            try:
+                return await handler(request)
+            finally:
+                profile.unwind(depth)
+
+        return route_handler
+
+
+class Profiler:
+    """Decides which requests to profile and writes their profiles."""
+
+    def __init__(self, directory: Path, sample_rate: float = 0.0, max_files: int = 100,
+                 token: Optional[str] = None):
+        self.directory = Path(directory)
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        self.token = token.encode() if token else None
+        self._sequence = itertools.count()
+
+    @classmethod
+    def from_env(cls) -> "Profiler":
+        """Profiler configured by the ``PROFILE_*`` variables (``PROFILE_DIR`` is required)."""
+        profiler = cls(
+            Path(os.environ["PROFILE_DIR"]),
+            sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", "0")),
+            max_files=int(os.environ.get("PROFILE_MAX_FILES", "100")),
+            token=os.environ.get("PROFILE_TOKEN") or None,
+        )
+        if profiler.token is None:
+            logger.warning("PROFILE_TOKEN is not set; the %s header is ignored", HEADER.decode())
+        return profiler
+
+    def wants(self, headers) -> bool:
+        if self.token is not None:
+            for name, value in headers:
+                if name == HEADER:
+                    return secrets.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def name_for(self, profile: Profile) -> str:
+        """Unique file name, ordered by time, for a profile."""
+        label = "".join(c if c.isalnum() else "_" for c in profile.root).strip("_")
+        return f"{time.time_ns():020d}-{next(self._sequence):04d}-{label}"
+
+    def save(self, profile: Profile, name: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / f"{name}.wall.folded").write_text(profile.folded())
+        (self.directory / f"{name}.cpu.folded").write_text(profile.folded(cpu=True))
+        self._rotate()
+
+    def _rotate(self) -> None:
+        names = sorted({path.name.split(".", 1)[0] for path in self.directory.glob("*.folded")})
+        for name in names[:max(len(names) - self.max_files, 0)]:
+            for path in self.directory.glob(f"{name}.*"):
+                path.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """Profiles the requests chosen by ``profiler``. Add it outermost."""
+
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.wants(scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+        profile = Profile(scope["method"])
+        name = None
+
+        async def send_with_id(message):
+            nonlocal name
+            if message["type"] == "http.response.start":
+                # Named before the body is sent, so the header can carry it
+                profile.root = f"{scope['method']} {_route_label(scope)}"
+                name = self.profiler.name_for(profile)
+                message = dict(message, headers=list(message.get("headers", [])) + [(ID_HEADER, name.encode())])
+            await send(message)
+
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _current.reset(token)
+            profile.close()
+            if name is None:
+                profile.root = f"{scope['method']} {_route_label(scope)}"
+                name = self.profiler.name_for(profile)
+            try:
+                self.profiler.save(profile, name)
+                logger.info("Saved profile %s", name)
+            except OSError as e:
+                logger.warning("Writing profile failed: %s", e)
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    app = scope.get("app")
+    for candidate in app.router.routes if app is not None else ():
+        if candidate.matches(scope)[0] != Match.NONE:
+            return candidate.path
+    return scope["path"]
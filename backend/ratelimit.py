@@ -0,0 +1,257 @@
+"""Token-bucket plus sliding-window rate limiting.
+
+Each key, such as ``ip:203.0.113.7`` or ``email:someone@example.com``, gets a
+token bucket and a sliding-window counter:
+
+* The bucket allows bursts of ``burst`` requests, refilled at ``rate`` per
+  second.
+* The window caps the total at ``window_limit`` requests per ``window``
+  seconds. Its count is the current fixed window's count plus the previous
+  window's count, weighted by how much of the previous window still
+  overlaps the sliding one.
+
+A request is allowed only when both have room. A rejected request consumes
+nothing, and its ``retry_after`` says when it could pass. When a request
+checks several keys and a later one rejects it, the keys already taken are
+refunded.
+
+Buckets live in a backend:
+
+* ``MemoryBackend``: per process. It holds at most ``max_keys`` buckets, in
+  LRU order. An evicted key starts over with a full bucket, so size it
+  above the number of clients active within a window.
+* ``MongoBackend``: shared by every worker through one collection. Updates
+  use optimistic concurrency on a version field, and a TTL index removes
+  idle buckets.
+
+Both backends run the same ``_Bucket`` arithmetic. Timestamps are wall-clock
+seconds, so workers sharing the MongoDB backend agree on them.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimit(NamedTuple):
+    rate: float  # tokens per second (0: no token bucket)
+    burst: int  # bucket capacity
+    window: float = 3600.0  # sliding window length, in seconds
+    window_limit: int = 0  # requests per window (0: no window limit)
+
+    @property
+    def active(self) -> bool:
+        return bool(self.rate or self.window_limit)
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    retry_after: float = 0.0
+
+
+ALLOWED = Decision(True)
+
+
+class RateLimited(Exception):
+    def __init__(self, limit: str, retry_after: float):
+        super().__init__(f"Rate limit '{limit}' exceeded; retry after {retry_after:.1f}s")
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "window_start", "previous", "current")
+
+    def __init__(self, limit: RateLimit, now: float):
+        self.tokens = float(limit.burst)
+        self.updated = now
+        self.window_start = now - now % limit.window
+        self.previous = 0
+        self.current = 0
+
+    def take(self, limit: RateLimit, now: float) -> Decision:
+        wait = 0.0
+        if limit.rate:
+            self.tokens = min(float(limit.burst), self.tokens + (now - self.updated) * limit.rate)
+            self.updated = now
+            if self.tokens < 1:
+                wait = (1 - self.tokens) / limit.rate
+        if limit.window_limit:
+            start = now - now % limit.window
+            if start != self.window_start:
+                adjacent = start - self.window_start == limit.window
+                self.previous = self.current if adjacent else 0
+                self.current = 0
+                self.window_start = start
+            weight = 1 - (now - start) / limit.window
+            excess = self.previous * weight + self.current + 1 - limit.window_limit
+            if excess > 0:
+                if self.current + 1 > limit.window_limit or not self.previous:
+                    window_wait = start + limit.window - now
+                else:
+                    # Until the previous window's share has decayed by ``excess``
+                    window_wait = excess / self.previous * limit.window
+                wait = max(wait, window_wait)
+        if wait > 0:
+            return Decision(False, wait)
+        if limit.rate:
+            self.tokens -= 1
+        self.current += 1
+        return ALLOWED
+
+    def give_back(self, limit: RateLimit) -> None:
+        """Undo an allowed ``take``."""
+        if limit.rate:
+            self.tokens = min(float(limit.burst), self.tokens + 1)
+        if limit.window_limit and self.current:
+            self.current -= 1
+
+    def to_doc(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_doc(cls, doc: Dict[str, Any]) -> "_Bucket":
+        bucket = cls.__new__(cls)
+        for name in cls.__slots__:
+            setattr(bucket, name, doc[name])
+        return bucket
+
+
+class MemoryBackend:
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def take(self, key: str, limit: RateLimit, now: float) -> Decision:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(limit, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(limit, now)
+
+    async def refund(self, key: str, limit: RateLimit) -> None:
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.give_back(limit)
+
+
+class MongoBackend:
+    """Buckets shared by all workers, one document per key."""
+
+    def __init__(self, collection, retries: int = 5):
+        self.collection = collection
+        self.retries = retries
+
+    async def take(self, key: str, limit: RateLimit, now: float) -> Decision:
+        expires_at = datetime.fromtimestamp(now, timezone.utc).replace(tzinfo=None) + timedelta(
+            seconds=max(2 * limit.window if limit.window_limit else 0, limit.burst / limit.rate if limit.rate else 0)
+        )
+        for _ in range(self.retries):
+            doc = await self.collection.find_one({"_id": key})
+            bucket = _Bucket.from_doc(doc) if doc is not None else _Bucket(limit, now)
+            decision = bucket.take(limit, now)
+            if not decision.allowed:
+                return decision
+            state = dict(bucket.to_doc(), expires_at=expires_at)
+            if doc is None:
+                try:
+                    await self.collection.insert_one(dict(state, _id=key, version=1))
+                    return decision
+                except DuplicateKeyError:
+                    continue  # another worker created it first
+            result = await self.collection.update_one(
+                {"_id": key, "version": doc["version"]}, {"$set": state, "$inc": {"version": 1}}
+            )
+            if result.matched_count:
+                return decision
+            await asyncio.sleep(0)
+        # Still contended: treat the key as saturated rather than loop on
+        return Decision(False, 1.0)
+
+    async def refund(self, key: str, limit: RateLimit) -> None:
+        for _ in range(self.retries):
+            doc = await self.collection.find_one({"_id": key})
+            if doc is None:
+                return
+            bucket = _Bucket.from_doc(doc)
+            bucket.give_back(limit)
+            result = await self.collection.update_one(
+                {"_id": key, "version": doc["version"]}, {"$set": bucket.to_doc(), "$inc": {"version": 1}}
+            )
+            if result.matched_count:
+                return
+            await asyncio.sleep(0)
+        logger.warning("Refunding rate limit key %s gave up after %d attempts", key, self.retries)
+
+
+class RateLimiter:
+    """Named limits checked against one backend.
+
+    Errors talking to the backend are logged and the request is allowed,
+    so that a database outage cannot block the endpoint.
+    """
+
+    def __init__(self, backend, limits: Dict[str, RateLimit], clock: Callable[[], float] = time.time):
+        self.backend = backend
+        self.limits = limits
+        self.clock = clock
+
+    async def check(self, **keys: Optional[str]) -> None:
+        """Take one request from each named key; raises ``RateLimited``.
+
+        Keys are checked in order and the first rejection stops the check,
+        after refunding the keys taken before it. ``None`` values are
+        skipped.
+        """
+        now = self.clock()
+        taken = []
+        for name, value in keys.items():
+            limit = self.limits[name]
+            if value is None or not limit.active:
+                continue
+            key = f"{name}:{value}"
+            try:
+                decision = await self.backend.take(key, limit, now)
+            except PyMongoError as e:
+                logger.warning("Rate limit backend failed for %s (%s); allowing request", key, e)
+                continue
+            if not decision.allowed:
+                for key, limit in reversed(taken):
+                    try:
+                        await self.backend.refund(key, limit)
+                    except PyMongoError as e:
+                        logger.warning("Refunding rate limit key %s failed: %s", key, e)
+                raise RateLimited(name, decision.retry_after)
+            taken.append((key, limit))
+
+
+def client_ip(scope, trusted_hops: int = 0) -> Optional[str]:
+    """The client address as seen by the outermost of ``trusted_hops`` proxies.
+
+    Each proxy appends the address it received the request from to
+    ``X-Forwarded-For``, so only the last ``trusted_hops`` entries can be
+    trusted; anything left of them was sent by the client.
+    """
+    if trusted_hops > 0:
+        forwarded = [
+            entry.strip()
+            for name, value in scope.get("headers", ())
+            if name == b"x-forwarded-for"
+            for entry in value.decode("latin-1").split(",")
+        ]
+        if forwarded:
+            return forwarded[-min(trusted_hops, len(forwarded))] or None
+    client = scope.get("client")
+    return client[0] if client else None
@@ -0,0 +1,153 @@
+"""Retention and archival of contact messages.
+
+Messages older than ``archive_after`` are moved out of ``contact_messages`` in
+bulk by a background ``Archiver``. Each batch of up to ``batch_size`` rows
+becomes one document in ``contact_messages_archive``, which holds the rows as
+zlib-compressed BSON plus the batch's time range. The live collection, and
+the working set of the sorted admin query, then stay proportional to the
+archival age rather than to the age of the site.
+
+A batch's ``_id`` is derived from the ids of its rows. Two workers archiving
+the same rows, or a run interrupted between the insert and the delete, are
+harmless: the second insert fails as a duplicate, and the rows are deleted
+all the same.
+
+Hard expiry is left to MongoDB: ``ensure_ttl`` keeps a TTL index on the
+messages' ``timestamp`` and on the archive batches' ``newest`` in line with
+the configured retention, or drops it when retention is unlimited.
+
+``ArchivedRows`` reads archived messages back for
+``?include_archived=true``, with the same keyset order as the live listing.
+"""
+import asyncio
+import hashlib
+import logging
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import bson
+from bson.binary import Binary
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+def compress_rows(rows: List[Dict[str, Any]]) -> Binary:
+    return Binary(zlib.compress(bson.encode({"rows": rows})))
+
+
+def decompress_rows(data: bytes) -> List[Dict[str, Any]]:
+    return bson.decode(zlib.decompress(data))["rows"]
+
+
+def batch_id(rows: List[Dict[str, Any]]) -> str:
+    return hashlib.sha256("\n".join(row["id"] for row in rows).encode()).hexdigest()[:32]
+
+
+async def ensure_ttl(collection, field: str, name: str, seconds: Optional[int]) -> None:
+    """Create, update (collMod) or drop the TTL index ``name`` on ``field``."""
+    existing = (await collection.index_information()).get(name)
+    if not seconds:
+        if existing is not None:
+            await collection.drop_index(name)
+        return
+    if existing is None:
+        await collection.create_index([(field, 1)], name=name, expireAfterSeconds=seconds)
+    elif existing.get("expireAfterSeconds") != seconds:
+        await collection.database.command(
+            "collMod", collection.name, index={"name": name, "expireAfterSeconds": seconds}
+        )
+
+
+class Archiver:
+    def __init__(self, collection, archive, archive_after: timedelta, batch_size: int = 500,
+                 interval: float = 3600.0):
+        self.collection = collection
+        self.archive = archive
+        self.archive_after = archive_after
+        self.batch_size = batch_size
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self, now: Optional[datetime] = None) -> int:
+        """Archive every message older than the cutoff; returns how many moved."""
+        cutoff = (now or datetime.utcnow()) - self.archive_after
+        moved = 0
+        while True:
+            rows = await self.collection.find({"timestamp": {"$lt": cutoff}}, {"_id": 0}) \
+                .sort([("timestamp", 1), ("id", 1)]).limit(self.batch_size).to_list(self.batch_size)
+            if not rows:
+                return moved
+            await self._archive_batch(rows)
+            moved += len(rows)
+            if len(rows) < self.batch_size:
+                return moved
+
+    async def _archive_batch(self, rows: List[Dict[str, Any]]) -> None:
+        ids = [row["id"] for row in rows]
+        try:
+            await self.archive.insert_one({
+                "_id": batch_id(rows),
+                "oldest": rows[0]["timestamp"],
+                "newest": rows[-1]["timestamp"],
+                "count": len(rows),
+                "rows": compress_rows(rows),
+            })
+        except DuplicateKeyError:
+            logger.info("Archive batch of %d message(s) already stored", len(rows))
+        await self.collection.delete_many({"id": {"$in": ids}})
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                moved = await self.run_once()
+                if moved:
+                    logger.info("Archived %d contact message(s)", moved)
+            except PyMongoError as e:
+                logger.warning("Archiving contact messages failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+
+class ArchivedRows:
+    """Keyset-ordered reads over the archive batches."""
+
+    def __init__(self, archive):
+        self.archive = archive
+
+    async def page(self, after: Optional[Tuple[datetime, str]], limit: int) -> List[Dict[str, Any]]:
+        """Up to ``limit`` archived rows sorted (timestamp, id) descending,
+        strictly after the ``after`` key when given."""
+        query = {"oldest": {"$lte": after[0]}} if after else {}
+        cursor = self.archive.find(query, {"rows": 1, "newest": 1}).sort("newest", -1)
+        rows: List[Dict[str, Any]] = []
+        async for batch in cursor:
+            if len(rows) >= limit and batch["newest"] < rows[limit - 1]["timestamp"]:
+                break
+            for row in decompress_rows(batch["rows"]):
+                if after is None or (row["timestamp"], row["id"]) < after:
+                    rows.append(row)
+            rows.sort(key=_key, reverse=True)
+        return rows[:limit]
+
+
+def _key(row: Dict[str, Any]) -> Tuple[datetime, str]:
+    return row["timestamp"], row["id"]
+
+
+def merge_pages(*pages: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """Merge pages already sorted newest first into one page of ``limit`` rows."""
+    return sorted((row for page in pages for row in page), key=_key, reverse=True)[:limit]
@@ -0,0 +1,178 @@
+"""Multi-process launcher for the API.
+
+    python backend/serve.py [--host 0.0.0.0] [--port 8001] [--workers N]
+
+The parent binds the listening socket, then starts ``--workers`` uvicorn
+processes (default: ``WEB_CONCURRENCY``, else one per usable core) that
+accept on it. The kernel spreads connections between them. Cached reads
+are CPU bound and share nothing between workers, so read throughput grows
+with the worker count up to the number of cores. ``bench_workers.py``
+measures that scaling.
+
+The parent restarts workers that exit, and gives up when a worker keeps
+dying right after it starts. SIGINT or SIGTERM stops every worker
+gracefully.
+
+Each worker gets, through the environment:
+
+* ``WORKER_INDEX``: 0..N-1, stable across restarts. Worker 0 alone runs
+  the archiver, and each worker spills contact messages to its own file.
+  Spill files of workers that no longer exist go to worker 0 at launch
+  (see ``contact_writer.adopt_spills``).
+* ``CACHE_BUS_DIR``: a directory of Unix sockets, so cache invalidations
+  reach every worker (``CACHE_BUS=unix``, see ``cache_bus.py``). Workers
+  spread over several hosts should set ``CACHE_BUS=mongo`` instead.
+
+Everything else is per worker: the MongoDB pool (``MONGO_MAX_POOL_SIZE`` is
+per process), the caches, ``/metrics``, and the in-memory rate limiter.
+Use ``RATE_LIMIT_BACKEND=mongo`` to share limits between workers. With
+``MONGO_URL=memory://`` every worker has a database of its own.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+# A worker that exits sooner than this after starting counts as a crash
+MIN_UPTIME = 5.0
+MAX_CRASHES = 5
+
+logger = logging.getLogger("serve")
+
+
+def usable_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS
+        return os.cpu_count() or 1
+
+
+def default_workers() -> int:
+    return int(os.environ.get("WEB_CONCURRENCY") or usable_cores())
+
+
+def bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(index: int, sock: socket.socket, options: Dict) -> None:
+    import uvicorn
+
+    os.environ["WORKER_INDEX"] = str(index)
+    sys.path.insert(0, str(BACKEND_DIR))
+    config = uvicorn.Config("server:app", **options)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    def __init__(self, sock: socket.socket, workers: int, options: Dict):
+        self.sock = sock
+        self.workers = workers
+        self.options = options
+        self.context = multiprocessing.get_context("spawn")
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.started_at: Dict[int, float] = {}
+        self.crashes = 0
+        self.stopping = False
+
+    def spawn(self, index: int) -> None:
+        process = self.context.Process(
+            target=_run_worker, args=(index, self.sock, self.options), name=f"worker-{index}",
+        )
+        process.start()
+        self.processes[index] = process
+        self.started_at[index] = time.monotonic()
+        logger.info("Started worker %d (pid %d)", index, process.pid)
+
+    def run(self) -> int:
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, self._stop)
+        for index in range(self.workers):
+            self.spawn(index)
+        while not self.stopping:
+            time.sleep(0.5)
+            for index, process in list(self.processes.items()):
+                if process.is_alive() or self.stopping:
+                    continue
+                uptime = time.monotonic() - self.started_at[index]
+                self.crashes = self.crashes + 1 if uptime < MIN_UPTIME else 0
+                logger.warning("Worker %d (pid %d) exited with %s after %.1fs",
+                               index, process.pid, process.exitcode, uptime)
+                if self.crashes >= MAX_CRASHES:
+                    logger.error("Workers keep exiting right after they start; giving up")
+                    self.shutdown()
+                    return 1
+                self.spawn(index)
+        self.shutdown()
+        return 0
+
+    def _stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def shutdown(self, timeout: float = 30.0) -> None:
+        self.stopping = True
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in self.processes.values():
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the API from several worker processes")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="worker processes (default: WEB_CONCURRENCY, else one per usable core)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    from dotenv import load_dotenv
+
+    from contact_writer import adopt_spills
+
+    load_dotenv(BACKEND_DIR / ".env")
+    workers = max(args.workers, 1)
+    adopt_spills(Path(os.environ.get("CONTACT_SPILL_PATH", BACKEND_DIR / "contact_spill.jsonl")), workers)
+    if workers > 1 and os.environ.get("RATE_LIMIT_BACKEND", "memory") != "mongo":
+        logger.warning("Each of the %d workers enforces the contact rate limit on its own; "
+                       "set RATE_LIMIT_BACKEND=mongo to share it", workers)
+
+    bus_dir = None
+    if not os.environ.get("CACHE_BUS") and not os.environ.get("CACHE_BUS_DIR"):
+        bus_dir = tempfile.mkdtemp(prefix="portfolio-cache-bus-")
+        os.environ["CACHE_BUS_DIR"] = bus_dir
+    sock = bind(args.host, args.port)
+    logger.info("Serving on %s:%d with %d worker(s)", args.host, sock.getsockname()[1], workers)
+    options = {"log_level": args.log_level, "access_log": False, "lifespan": "on"}
+    try:
+        return Supervisor(sock, workers, options).run()
+    finally:
+        sock.close()
+        if bus_dir is not None:
+            shutil.rmtree(bus_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,209 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Body, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import ExecutionTimeout
+from pydantic import ValidationError
 import os
+import secrets
+import socket
+import asyncio
 import logging
+import math
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
+from contextlib import asynccontextmanager
 from typing import List, Optional, Dict, Any
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs
 
+import cache_bus
+import compression
+import contact_export
+import contact_stats
+import content_versions
+import dedupe
+import fast_json
+import inbox
+import indexes
+import metrics
+import mongo_pool
+import pagination
+import profiling
+import ratelimit
+import retention
+import tenants
+import text_search
+from content_cache import ContentCache, stable_id
+from content_store import ContentStore
+from contact_writer import ContactQueueFull, ContactWriter, worker_spill_path
+from http_cache import CachedRoutes, CachePolicy, ConditionalGetMiddleware
+from memory_db import MemoryClient
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# Request, MongoDB command and queue metrics, served on /metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+metrics_registry = metrics.Registry()
+http_metrics = metrics.HttpMetrics(metrics_registry)
+command_metrics = metrics.CommandMetrics(metrics_registry)
+
+# MongoDB connection; pool sizing and timeouts come from MONGO_* (see mongo_pool.py).
+# The client is built on first use, during startup, not at import.
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+pool_settings = mongo_pool.PoolSettings.from_env()
+pool_monitor = mongo_pool.PoolMonitor(pool_settings.max_pool_size, metrics_registry)
+
+def build_client():
+    if mongo_url.startswith('memory://'):
+        # In-process stand-in for tests, benchmarks and offline development
+        return MemoryClient(mongo_url)
+    from motor.motor_asyncio import AsyncIOMotorClient
+    return AsyncIOMotorClient(
+        mongo_url,
+        event_listeners=[pool_monitor] + ([command_metrics] if METRICS_ENABLED else []),
+        **pool_settings.client_options(),
+    )
+
+client = mongo_pool.LazyClient(build_client)
 db = client[os.environ['DB_NAME']]
+READY_TIMEOUT = float(os.environ.get('READY_TIMEOUT_MS', '1000')) / 1000
+READY_MAX_POOL_SATURATION = float(os.environ.get('READY_MAX_POOL_SATURATION', '0.95'))
+
+# Set by serve.py in each worker of a multi-process server
+WORKER_INDEX = int(os.environ['WORKER_INDEX']) if os.environ.get('WORKER_INDEX') else None
+
+# Cache invalidations reach every worker through this bus (see cache_bus.py)
+bus = cache_bus.from_env(db, metrics_registry)
+
+# Hourly and daily contact counts, kept up to date as messages are written
+contact_rollups = contact_stats.Rollups(db.contact_stats)
+
+# Contact messages are queued and written to MongoDB in batches
+contact_writer = ContactWriter(
+    db.contact_messages,
+    spill_path=worker_spill_path(
+        Path(os.environ.get('CONTACT_SPILL_PATH', ROOT_DIR / 'contact_spill.jsonl')), WORKER_INDEX
+    ),
+    max_batch=int(os.environ.get('CONTACT_BATCH_SIZE', '100')),
+    flush_interval=float(os.environ.get('CONTACT_FLUSH_INTERVAL_MS', '50')) / 1000,
+    max_queue=int(os.environ.get('CONTACT_QUEUE_SIZE', '10000')),
+    on_stored=contact_rollups.record,
+)
+metrics_registry.gauge(
+    "contact_queue_depth", "Contact messages accepted but not yet written",
+    function=lambda: contact_writer.depth,
+)
+
+# Accepted messages are pushed to open admin inbox streams (see inbox.py)
+inbox_broadcaster = inbox.Broadcaster(
+    max_buffer=int(os.environ.get('INBOX_BUFFER', '256')),
+    history=int(os.environ.get('INBOX_HISTORY', '1000')),
+    max_subscribers=int(os.environ.get('INBOX_MAX_SUBSCRIBERS', '100')),
+    registry=metrics_registry,
+)
+INBOX_HEARTBEAT = float(os.environ.get('INBOX_HEARTBEAT', '15'))
+
+# Contact submissions are throttled per client IP and per email address.
+# RATE_LIMIT_BACKEND=mongo shares the limits between workers.
+CONTACT_RATE_LIMIT = ratelimit.RateLimit(
+    rate=float(os.environ.get('CONTACT_RATE_PER_MINUTE', '5')) / 60,
+    burst=int(os.environ.get('CONTACT_RATE_BURST', '5')),
+    window=3600,
+    window_limit=int(os.environ.get('CONTACT_RATE_PER_HOUR', '20')),
+)
+if os.environ.get('RATE_LIMIT_BACKEND', 'memory') == 'mongo':
+    rate_limit_backend = ratelimit.MongoBackend(db.rate_limits)
+else:
+    rate_limit_backend = ratelimit.MemoryBackend(int(os.environ.get('RATE_LIMIT_MAX_KEYS', '10000')))
+contact_limiter = ratelimit.RateLimiter(
+    rate_limit_backend, {"ip": CONTACT_RATE_LIMIT, "email": CONTACT_RATE_LIMIT}
+)
+# Reverse proxies in front of the app, each appending to X-Forwarded-For; the
+# client address is taken that many entries from the right. The older
+# RATE_LIMIT_TRUST_PROXY=1 means one proxy
+TRUSTED_PROXY_HOPS = int(os.environ.get('RATE_LIMIT_TRUSTED_HOPS', os.environ.get('RATE_LIMIT_TRUST_PROXY', '0')))
+rate_limited = metrics_registry.counter(
+    "contact_rate_limited_total", "Contact submissions rejected by a rate limit", ("limit",),
+)
+
+# Repeated and near-duplicate submissions are rejected (409) or merged into
+# the first message, per CONTACT_DEDUPE_MODE (reject, merge or off)
+DEDUPE_MODE = os.environ.get('CONTACT_DEDUPE_MODE', 'reject')
+contact_dedupe = dedupe.Deduplicator(
+    db.contact_fingerprints,
+    ttl=float(os.environ.get('CONTACT_DEDUPE_TTL_HOURS', '168')) * 3600,
+    max_entries=int(os.environ.get('CONTACT_DEDUPE_MAX_ENTRIES', '50000')),
+    min_similarity=float(os.environ.get('CONTACT_DEDUPE_SIMILARITY', '0.7')),
+)
+duplicates = metrics_registry.counter(
+    "contact_duplicates_total", "Duplicate contact submissions by outcome", ("mode",),
+)
+
+# Messages older than CONTACT_ARCHIVE_AFTER_DAYS (0, the default: never) are
+# moved into compressed archive batches. Only the listing's
+# ?include_archived=true reads them back; export, search and the inbox
+# replay cover live messages only. CONTACT_RETENTION_DAYS (0: forever)
+# removes messages and archive batches for good through TTL indexes
+ARCHIVE_AFTER_DAYS = float(os.environ.get('CONTACT_ARCHIVE_AFTER_DAYS', '0'))
+RETENTION_DAYS = float(os.environ.get('CONTACT_RETENTION_DAYS', '0'))
+archiver = retention.Archiver(
+    db.contact_messages,
+    db.contact_messages_archive,
+    archive_after=timedelta(days=ARCHIVE_AFTER_DAYS),
+    batch_size=int(os.environ.get('CONTACT_ARCHIVE_BATCH_SIZE', '500')),
+    interval=float(os.environ.get('CONTACT_ARCHIVE_INTERVAL', '3600')),
+)
+archived_rows = retention.ArchivedRows(db.contact_messages_archive)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=fast_json.FastJSONResponse, lifespan=lifespan)
 
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", route_class=profiling.ProfiledRoute)
+
+# Pre-serialized portfolio sections, loaded from MongoDB and served as raw bytes
+content_cache = ContentCache(ttl=float(os.environ.get('CONTENT_CACHE_TTL', '300')))
+content_store = ContentStore(
+    db, content_cache, poll_interval=float(os.environ.get('CONTENT_POLL_INTERVAL', '30'))
+)
+
+# Drafts and versioned publishes of the content (admin API, see content_versions.py)
+version_store = content_versions.VersionStore(db, content_store, bus=bus)
+
+# ETag / Cache-Control for cached routes; CACHE_MAX_AGE and
+# CACHE_STALE_WHILE_REVALIDATE set the default policy
+cached_routes = CachedRoutes(CachePolicy.from_env())
+
+# Hosted portfolios other than the default one (see tenants.py)
+tenant_store = tenants.TenantStore(db, content_store.specs, bus=bus)
+tenant_cache = tenants.TenantCache(
+    tenant_store.load,
+    max_bytes=int(float(os.environ.get('TENANT_CACHE_MAX_MB', '64')) * 1024 * 1024),
+    max_entries=int(os.environ.get('TENANT_CACHE_MAX_ENTRIES', '10000')),
+    ttl=float(os.environ.get('TENANT_CACHE_TTL', '300')),
+    registry=metrics_registry,
+    max_missing=int(os.environ.get('TENANT_CACHE_MAX_MISSING', '1024')),
+)
+
+async def refresh_content(name: Optional[str]):
+    if name is None:
+        await content_store.refresh_all()
+    else:
+        await content_cache.refresh(name)
+
+bus.subscribe("content", refresh_content)
+bus.subscribe("tenant", tenant_cache.invalidate)
 
 
 # Portfolio Models
@@ -70,6 +250,13 @@ class AboutInfo(BaseModel):
     current_focus: str
     stats: Dict[str, Dict[str, str]]  # {"years_experience": {"value": "5+", "label": "Years Experience"}}
 
+class Portfolio(BaseModel):
+    personal_info: Optional[PersonalInfo] = None
+    about: Optional[AboutInfo] = None
+    skills: Optional[List[SkillCategory]] = None
+    experience: Optional[List[Experience]] = None
+    projects: Optional[List[Project]] = None
+
 class ContactMessage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
@@ -84,16 +271,35 @@ class ContactMessageCreate(BaseModel):
     subject: str
     message: str
 
+# Admin endpoints (content editing, the contact listing and live inbox,
+# contact export, search and stats): enabled by setting ADMIN_TOKEN, which callers send as
+# "Authorization: Bearer <token>"
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+def require_admin(authorization: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="The admin API is disabled; set ADMIN_TOKEN to enable it")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
 # Portfolio API Endpoints
 @api_router.get("/")
 async def root():
     return {"message": "Varshank Portfolio API"}
 
-@api_router.get("/portfolio/personal-info", response_model=PersonalInfo)
-async def get_personal_info():
-    """Get personal information"""
-    # Return static data for now - can be made dynamic later
+@api_router.get("/health/ready")
+async def health_ready():
+    """Readiness probe: MongoDB answers a ping and the connection pool has headroom"""
+    pending = ["database setup not finished"] if startup_retry is not None else []
+    ready, details = await mongo_pool.readiness(db, pool_monitor, READY_TIMEOUT, READY_MAX_POOL_SATURATION, pending)
+    return fast_json.trusted_response(details, status_code=200 if ready else 503, headers={"Cache-Control": "no-store"})
+
+# Portfolio Content: seed documents, inserted into empty collections at startup
+@content_store.section("personal_info", collection="personal_info", model=PersonalInfo)
+def default_personal_info():
     return PersonalInfo(
+        id=stable_id("personal_info", "Varshank Shukla"),
         name="Varshank",
         surname="Shukla", 
         title="Business Manager & Data Science Professional",
@@ -104,10 +310,10 @@ async def get_personal_info():
         availability_status="Available for opportunities"
     )
 
-@api_router.get("/portfolio/about", response_model=AboutInfo)
-async def get_about_info():
-    """Get about section information"""
+@content_store.section("about", collection="about_info", model=AboutInfo)
+def default_about_info():
     return AboutInfo(
+        id=stable_id("about", "about"),
         journey_description="Client-focused Business Manager with diverse experience in sales, business operations, and technical support. Expert at relationship-building, project coordination, innovation, and process improvement to transform underperforming operations and drive business growth.",
         current_focus="Currently pursuing advanced Data Science & AI to merge business acumen with cutting-edge analytics.",
         stats={
@@ -118,11 +324,11 @@ async def get_about_info():
         }
     )
 
-@api_router.get("/portfolio/skills", response_model=List[SkillCategory])
-async def get_skills():
-    """Get skills and expertise"""
+@content_store.section("skills", collection="skill_categories", model=SkillCategory, many=True)
+def default_skills():
     return [
         SkillCategory(
+            id=stable_id("skills", "Business Leadership"),
             category_name="Business Leadership",
             icon="👥",
             skills=[
@@ -135,6 +341,7 @@ async def get_skills():
             ]
         ),
         SkillCategory(
+            id=stable_id("skills", "Technical Expertise"),
             category_name="Technical Expertise", 
             icon="💻",
             skills=[
@@ -147,6 +354,7 @@ async def get_skills():
             ]
         ),
         SkillCategory(
+            id=stable_id("skills", "Core Competencies"),
             category_name="Core Competencies",
             icon="🎯", 
             skills=[
@@ -160,11 +368,11 @@ async def get_skills():
         )
     ]
 
-@api_router.get("/portfolio/experience", response_model=List[Experience])
-async def get_experience():
-    """Get professional experience"""
+@content_store.section("experience", collection="experiences", model=Experience, many=True)
+def default_experience():
     return [
         Experience(
+            id=stable_id("experience", "Family-Owned Business Manager"),
             position="Family-Owned Business Manager",
             company="Gurudev Electricals & Real Estate, Lucknow",
             location="Lucknow",
@@ -181,6 +389,7 @@ async def get_experience():
             highlight_metric={"value": "25%", "label": "Cost Reduction"}
         ),
         Experience(
+            id=stable_id("experience", "Associate – Customer Service (Internet)"),
             position="Associate – Customer Service (Internet)",
             company="Sutherland Global Services Pvt. Ltd., Chennai", 
             location="Chennai",
@@ -195,11 +404,11 @@ async def get_experience():
         )
     ]
 
-@api_router.get("/portfolio/projects", response_model=List[Project])
-async def get_projects():
-    """Get featured projects"""
+@content_store.section("projects", collection="projects", model=Project, many=True)
+def default_projects():
     return [
         Project(
+            id=stable_id("projects", "Rossmann Store Sales Forecasting"),
             title="Rossmann Store Sales Forecasting",
             category="Data Science Capstone",
             description="Forecasted daily sales for 9 key Rossmann stores using VAR/VARMAX time series models with comprehensive data analysis and feature engineering.",
@@ -212,6 +421,7 @@ async def get_projects():
             status="Completed 2025"
         ),
         Project(
+            id=stable_id("projects", "Business Process Optimization System"),
             title="Business Process Optimization System",
             category="Business Operations", 
             description="Implemented data-driven process improvements across multiple business units, resulting in significant operational efficiency gains.",
@@ -224,6 +434,7 @@ async def get_projects():
             status="Ongoing"
         ),
         Project(
+            id=stable_id("projects", "Customer Analytics Dashboard"),
             title="Customer Analytics Dashboard",
             category="Data Visualization",
             description="Developed comprehensive analytics dashboard using Power BI to track customer behavior, sales performance, and operational metrics.",
@@ -237,27 +448,410 @@ async def get_projects():
         )
     ]
 
+def _portfolio_sections(query_string: str):
+    sections = parse_qs(query_string).get("sections")
+    return sections[0].split(",") if sections else None
+
+async def _portfolio(query_string: str):
+    tenant = tenants.current.get()
+    if tenant is not None:
+        return tenant.aggregate(_portfolio_sections(query_string))
+    return await content_cache.aggregate(_portfolio_sections(query_string))
+
+def _section(name: str):
+    async def lookup(query_string: str):
+        tenant = tenants.current.get()
+        return tenant.section(name) if tenant is not None else await content_cache.fetch(name)
+    return lookup
+
+cached_routes.add("/api/portfolio", _portfolio)
+cached_routes.add("/api/portfolio/personal-info", _section("personal_info"))
+cached_routes.add("/api/portfolio/about", _section("about"))
+cached_routes.add("/api/portfolio/skills", _section("skills"))
+cached_routes.add("/api/portfolio/experience", _section("experience"))
+cached_routes.add("/api/portfolio/projects", _section("projects"))
+
+@api_router.get("/portfolio", response_model=Portfolio)
+async def get_portfolio(
+    request: Request,
+    sections: Optional[str] = Query(None, description="Comma-separated sections to include, e.g. skills,projects")
+):
+    """Get all portfolio sections in a single response"""
+    try:
+        return await cached_routes.respond(request)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+
+@api_router.get("/portfolio/personal-info", response_model=PersonalInfo)
+async def get_personal_info(request: Request):
+    """Get personal information"""
+    return await cached_routes.respond(request)
+
+@api_router.get("/portfolio/about", response_model=AboutInfo)
+async def get_about_info(request: Request):
+    """Get about section information"""
+    return await cached_routes.respond(request)
+
+@api_router.get("/portfolio/skills", response_model=List[SkillCategory])
+async def get_skills(request: Request):
+    """Get skills and expertise"""
+    return await cached_routes.respond(request)
+
+@api_router.get("/portfolio/experience", response_model=List[Experience])
+async def get_experience(request: Request):
+    """Get professional experience"""
+    return await cached_routes.respond(request)
+
+@api_router.get("/portfolio/projects", response_model=List[Project])
+async def get_projects(request: Request):
+    """Get featured projects"""
+    return await cached_routes.respond(request)
+
 @api_router.post("/portfolio/contact", response_model=ContactMessage)
-async def submit_contact_message(message: ContactMessageCreate):
+async def submit_contact_message(message: ContactMessageCreate, request: Request):
     """Submit contact form message"""
     try:
-        contact_message = ContactMessage(**message.dict())
-        await db.contact_messages.insert_one(contact_message.dict())
-        return contact_message
+        await contact_limiter.check(
+            ip=ratelimit.client_ip(request.scope, TRUSTED_PROXY_HOPS), email=message.email.lower()
+        )
+    except ratelimit.RateLimited as e:
+        rate_limited.inc(e.limit)
+        raise HTTPException(
+            status_code=429,
+            detail="Too many messages, please try again later",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    # Already validated as ContactMessageCreate; only defaults are added
+    contact_message = ContactMessage.model_construct(**message.dict())
+    fingerprint = None
+    if DEDUPE_MODE != 'off':
+        with profiling.stage("dedupe"):
+            fingerprint = dedupe.fingerprint(message.subject, message.message, message.email)
+            duplicate = await contact_dedupe.check(fingerprint, contact_message.id, contact_message.timestamp)
+        if duplicate is not None:
+            duplicates.inc(DEDUPE_MODE)
+            if DEDUPE_MODE == 'merge':
+                return await merge_duplicate(contact_message, duplicate)
+            raise HTTPException(status_code=409, detail="This message has already been received")
+    try:
+        with profiling.stage("queue"):
+            doc = contact_message.dict()
+            await contact_writer.submit(doc)
+    except ContactQueueFull:
+        await release_fingerprint(fingerprint, contact_message.id)
+        raise HTTPException(
+            status_code=503,
+            detail="Too many messages right now, please try again shortly",
+            headers={"Retry-After": "1"},
+        )
     except Exception as e:
+        await release_fingerprint(fingerprint, contact_message.id)
         raise HTTPException(status_code=500, detail=f"Failed to save message: {str(e)}")
+    inbox_broadcaster.publish(doc)
+    return fast_json.trusted_response(contact_message)
+
+async def release_fingerprint(fingerprint: Optional[dedupe.Fingerprint], message_id: str):
+    """A message that was not accepted must not make its retry a duplicate."""
+    if fingerprint is not None:
+        await contact_dedupe.release(fingerprint, message_id)
 
-@api_router.get("/portfolio/contact/messages", response_model=List[ContactMessage])
-async def get_contact_messages():
-    """Get all contact messages (admin endpoint)"""
+async def merge_duplicate(contact_message: ContactMessage, duplicate: dedupe.Duplicate):
+    """Count a repeat on the original message and answer with its id."""
+    try:
+        # Best effort: the original may still be queued in the contact writer
+        await db.contact_messages.update_one(
+            {"id": duplicate.message_id},
+            {"$inc": {"duplicate_count": 1}, "$set": {"last_duplicate_at": contact_message.timestamp}},
+        )
+    except Exception as e:
+        logger.warning("Recording duplicate of %s failed: %s", duplicate.message_id, e)
+    contact_message.id = duplicate.message_id
+    return fast_json.trusted_response(contact_message)
+
+MAX_MESSAGES_PAGE = int(os.environ.get('CONTACT_PAGE_LIMIT', '500'))
+
+@api_router.get("/portfolio/contact/messages", response_model=List[ContactMessage],
+                dependencies=[Depends(require_admin)])
+async def get_contact_messages(
+    limit: int = Query(100, ge=1, le=MAX_MESSAGES_PAGE),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name,subject,timestamp"),
+    include_archived: bool = Query(False, description="Also return messages moved to the archive"),
+):
+    """Get contact messages, newest first (admin endpoint)"""
+    requested = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    if requested:
+        unknown = set(requested).difference(ContactMessage.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(sorted(unknown))}")
+    try:
+        query = pagination.after(cursor)
+    except pagination.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
-        messages = await db.contact_messages.find().sort("timestamp", -1).to_list(100)
-        return [ContactMessage(**msg) for msg in messages]
+        with profiling.stage("db"):
+            messages = await db.contact_messages.find(query, pagination.projection(requested)) \
+                .sort(pagination.SORT).limit(limit + 1).to_list(limit + 1)
+            if include_archived:
+                after = pagination.decode_cursor(cursor) if cursor else None
+                archived = await archived_rows.page(after, limit + 1)
+                messages = retention.merge_pages(messages, archived, limit=limit + 1)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve messages: {str(e)}")
+    headers = {}
+    if len(messages) > limit:
+        messages = messages[:limit]
+        headers["X-Next-Cursor"] = pagination.cursor_for(messages[-1])
+    if requested:
+        messages = [{field: msg[field] for field in requested if field in msg} for msg in messages]
+    # Rows were validated when they were accepted; serialize them as stored
+    return fast_json.trusted_response(messages, headers=headers)
+
+@api_router.get("/portfolio/contact/messages/stream", dependencies=[Depends(require_admin)])
+async def stream_contact_messages(
+    request: Request,
+    last_event_id: Optional[str] = Query(None, description="Resume after this event id (same as the Last-Event-ID header)"),
+):
+    """Server-Sent Events: contact messages as they are accepted, resumable with Last-Event-ID (admin endpoint)"""
+    last_event_id = request.headers.get("last-event-id") or last_event_id
+    if last_event_id:
+        try:
+            pagination.decode_cursor(last_event_id)
+        except pagination.InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        events = inbox.stream(inbox_broadcaster, db.contact_messages, last_event_id, INBOX_HEARTBEAT)
+        # Subscribes now, so a full house is answered with a status
+        first = await events.__anext__()
+    except inbox.TooManySubscribers:
+        raise HTTPException(status_code=503, detail="Too many open inbox streams", headers={"Retry-After": "5"})
+
+    async def body():
+        try:
+            yield first
+            async for chunk in events:
+                yield chunk
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        body(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+
+MAX_SEARCH_PAGE = int(os.environ.get('CONTACT_SEARCH_PAGE_LIMIT', '100'))
+SEARCH_MAX_TIME_MS = int(os.environ.get('CONTACT_SEARCH_MAX_TIME_MS', '2000'))
+
+@api_router.get("/portfolio/contact/messages/search", dependencies=[Depends(require_admin)])
+async def search_contact_messages(
+    q: str = Query(..., min_length=1, max_length=256, description='Words, "exact phrases" and -excluded words'),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_PAGE),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+):
+    """Search contact messages, best match first, with highlighted snippets (admin endpoint)"""
+    query = text_search.parse(q)
+    try:
+        offset = text_search.decode_cursor(cursor) if cursor else 0
+    except pagination.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not query.terms:
+        return fast_json.trusted_response([])
+    try:
+        with profiling.stage("db"):
+            messages = await text_search.search(db.contact_messages, q, offset, limit + 1, SEARCH_MAX_TIME_MS)
+    except ExecutionTimeout:
+        raise HTTPException(status_code=503, detail="Search timed out; try a more specific query")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to search messages: {str(e)}")
+    headers = {}
+    if len(messages) > limit:
+        messages = messages[:limit]
+        if offset + limit <= text_search.MAX_OFFSET:
+            headers["X-Next-Cursor"] = text_search.encode_cursor(offset + limit)
+    return fast_json.trusted_response([text_search.hit(msg, query) for msg in messages], headers=headers)
+
+def _naive_utc(value: datetime) -> datetime:
+    # Timestamps are stored as naive UTC
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+STATS_DEFAULT_RANGE = {"hour": timedelta(hours=48), "day": timedelta(days=30)}
+
+@api_router.get("/portfolio/contact/stats", dependencies=[Depends(require_admin)])
+async def get_contact_stats(
+    granularity: str = Query("day", pattern="^(hour|day)$"),
+    start: Optional[datetime] = Query(None, description="Start of the range (default: 48 hours or 30 days before end)"),
+    end: Optional[datetime] = Query(None, description="End of the range, exclusive (default: now)"),
+    top: int = Query(10, ge=1, le=50, description="Sender domains and subject keywords to list"),
+):
+    """Contact volume per hour or day, top sender domains and subject keywords (admin endpoint)"""
+    end = _naive_utc(end) if end else datetime.utcnow()
+    start = _naive_utc(start) if start else end - STATS_DEFAULT_RANGE[granularity]
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    try:
+        with profiling.stage("db"):
+            stats = await contact_rollups.stats(granularity, start, end, top)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return fast_json.trusted_response(stats)
+
+EXPORT_BATCH_SIZE = int(os.environ.get('CONTACT_EXPORT_BATCH_SIZE', '500'))
+
+@api_router.get("/portfolio/contact/messages/export", dependencies=[Depends(require_admin)])
+async def export_contact_messages(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    start: Optional[datetime] = Query(None, description="Only messages received at or after this time"),
+    end: Optional[datetime] = Query(None, description="Only messages received before this time"),
+):
+    """Stream all contact messages, oldest first, as NDJSON or CSV (admin endpoint)"""
+    query: Dict[str, Any] = {}
+    if start or end:
+        query["timestamp"] = {}
+        if start:
+            query["timestamp"]["$gte"] = _naive_utc(start)
+        if end:
+            query["timestamp"]["$lt"] = _naive_utc(end)
+    cursor = db.contact_messages.find(query, {"_id": 0}) \
+        .sort([("timestamp", 1), ("id", 1)]).batch_size(EXPORT_BATCH_SIZE)
+    return StreamingResponse(
+        contact_export.export_rows(cursor, format, EXPORT_BATCH_SIZE),
+        media_type=contact_export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="contact_messages.{format}"'},
+    )
+
+# Content editing (admin API, below)
+admin_router = APIRouter(
+    prefix="/api/admin", route_class=profiling.ProfiledRoute, dependencies=[Depends(require_admin)]
+)
+
+class PublishRequest(BaseModel):
+    note: Optional[str] = Field(None, max_length=500)
+
+@asynccontextmanager
+async def content_errors():
+    """Map VersionStore errors onto HTTP statuses."""
+    try:
+        yield
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except content_versions.VersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+def _content_section(section: str) -> str:
+    try:
+        return version_store.section_name(section)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+@admin_router.get("/content/{section}")
+async def get_draft_section(section: str):
+    """Draft of a section (its published content when it has no draft)"""
+    async with content_errors():
+        return fast_json.trusted_response(await version_store.draft(_content_section(section)))
 
-# Include the router in the main app
+@admin_router.put("/content/{section}")
+async def put_draft_section(section: str, content: Any = Body(...)):
+    """Replace the draft of a section: a document, or every item of a list section"""
+    async with content_errors():
+        return fast_json.trusted_response(await version_store.put(_content_section(section), content))
+
+@admin_router.post("/content/{section}", status_code=201)
+async def add_draft_item(section: str, item: Dict[str, Any] = Body(...)):
+    """Add an item to the draft of a list section (skills, experience, projects)"""
+    async with content_errors():
+        item = await version_store.add_item(_content_section(section), item)
+    return fast_json.trusted_response(item, status_code=201)
+
+@admin_router.put("/content/{section}/{item_id}")
+async def update_draft_item(section: str, item_id: str, item: Dict[str, Any] = Body(...)):
+    """Replace an item in the draft of a list section"""
+    async with content_errors():
+        return fast_json.trusted_response(await version_store.update_item(_content_section(section), item_id, item))
+
+@admin_router.delete("/content/{section}/{item_id}", status_code=204)
+async def delete_draft_item(section: str, item_id: str):
+    """Remove an item from the draft of a list section"""
+    async with content_errors():
+        await version_store.delete_item(_content_section(section), item_id)
+    return Response(status_code=204)
+
+@admin_router.get("/drafts")
+async def get_drafts():
+    """Sections with unpublished changes"""
+    return fast_json.trusted_response(await version_store.drafted())
+
+@admin_router.delete("/drafts", status_code=204)
+async def discard_drafts(section: Optional[str] = Query(None, description="Only this section's draft")):
+    """Discard unpublished changes"""
+    await version_store.discard(_content_section(section) if section else None)
+    return Response(status_code=204)
+
+@admin_router.get("/versions")
+async def get_versions(limit: int = Query(50, ge=1, le=500)):
+    """Published content versions, newest first"""
+    return fast_json.trusted_response(await version_store.history(limit))
+
+@admin_router.post("/versions", status_code=201)
+async def publish_content(request: Optional[PublishRequest] = None):
+    """Publish every section, drafts included, as a new version"""
+    async with content_errors():
+        version = await version_store.publish(request.note if request else None)
+    return fast_json.trusted_response(version, status_code=201)
+
+@admin_router.get("/versions/{version}")
+async def get_version(version: int):
+    """One published version, with its content"""
+    async with content_errors():
+        return fast_json.trusted_response(await version_store.version(version))
+
+@admin_router.post("/versions/{version}/rollback", status_code=201)
+async def rollback_content(version: int, request: Optional[PublishRequest] = None):
+    """Publish the content of an earlier version again, as a new version"""
+    async with content_errors():
+        version = await version_store.rollback(version, request.note if request else None)
+    return fast_json.trusted_response(version, status_code=201)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(content=metrics_registry.render(), media_type=metrics.CONTENT_TYPE)
+
+# Include the routers in the main app
 app.include_router(api_router)
+app.include_router(admin_router)
+
+# Cached routes carry pre-compressed variants (see content_cache.py); only
+# the dynamic contact endpoints are gzipped per request
+app.add_middleware(
+    compression.GzipStreamMiddleware,
+    paths={
+        "/api/portfolio/contact/messages",
+        "/api/portfolio/contact/messages/search",
+        "/api/portfolio/contact/messages/export",
+        "/api/portfolio/contact/stats",
+    },
+    minimum_size=int(os.environ.get('COMPRESSION_MIN_SIZE', compression.MIN_SIZE)),
+    level=int(os.environ.get('COMPRESSION_STREAM_LEVEL', compression.STREAM_GZIP_LEVEL)),
+)
+
+# Runs inside CORS (so 304s still carry CORS headers) but ahead of routing,
+# validation and the handlers
+app.add_middleware(ConditionalGetMiddleware, routes=cached_routes)
+
+# Tenant by path prefix (TENANT_PATH_PREFIX, /t/<slug>/api/...) or by
+# subdomain of TENANT_DOMAIN; outside the 304 check, which reads the tenant
+app.add_middleware(
+    tenants.TenantMiddleware,
+    cache=tenant_cache,
+    paths=frozenset(cached_routes.paths),
+    domain=os.environ.get('TENANT_DOMAIN') or None,
+    prefix=os.environ.get('TENANT_PATH_PREFIX', '/t'),
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -265,8 +859,17 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Outermost, so the latency includes every other middleware
+if METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware, metrics=http_metrics)
+
+# Opt-in stage profiling of sampled or X-Profile requests (see profiling.py)
+if os.environ.get('PROFILE_DIR'):
+    app.add_middleware(profiling.ProfilingMiddleware, profiler=profiling.Profiler.from_env())
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -274,6 +877,91 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
+async def load_portfolio_content() -> bool:
+    try:
+        await content_store.seed()
+        # Every section is encoded now, so no request pays for the first load
+        await content_cache.warm()
+        return True
+    except Exception as e:
+        logger.error("Loading the portfolio content failed (%s); serving the built-in content", e)
+        content_store.use_defaults()
+        return False
+
+async def ensure_retention_ttls() -> bool:
+    seconds = int(RETENTION_DAYS * 86400)
+    try:
+        await retention.ensure_ttl(db.contact_messages, "timestamp", "timestamp_ttl", seconds)
+        await retention.ensure_ttl(db.contact_messages_archive, "newest", "newest_ttl", seconds)
+        return True
+    except Exception as e:
+        logger.error("Updating the contact retention TTL indexes failed: %s", e)
+        return False
+
+async def prepare_contact_stats() -> bool:
+    try:
+        # Before the writer stores anything (see contact_stats.py)
+        await contact_rollups.prepare()
+        # One backfill per deployment is enough: worker 0 runs it
+        if not WORKER_INDEX:
+            await contact_rollups.backfill(db.contact_messages, owner=socket.gethostname())
+        return True
+    except Exception as e:
+        logger.error("Preparing the contact stats rollups failed: %s", e)
+        return False
+
+async def prepare_database() -> bool:
+    """Indexes, seed content, the content cache and the stats backfill;
+    False if any of it failed."""
+    # Independent round trips, run concurrently to keep cold starts short
+    failed_indexes, loaded, ttls = await asyncio.gather(
+        indexes.registry.ensure(db), load_portfolio_content(), ensure_retention_ttls()
+    )
+    # After the indexes: the backfill reads messages in timestamp order
+    stats = await prepare_contact_stats()
+    return not failed_indexes and loaded and ttls and stats
+
+# When MongoDB is unreachable at startup, the app serves the built-in
+# content, reports itself not ready and retries every STARTUP_RETRY_INTERVAL
+# seconds, backing off to STARTUP_RETRY_MAX_INTERVAL
+STARTUP_RETRY_INTERVAL = float(os.environ.get('STARTUP_RETRY_INTERVAL', '5'))
+STARTUP_RETRY_MAX_INTERVAL = float(os.environ.get('STARTUP_RETRY_MAX_INTERVAL', '60'))
+startup_retry: Optional[asyncio.Task] = None
+
+async def retry_startup():
+    global startup_retry
+    delay = STARTUP_RETRY_INTERVAL
+    while True:
+        await asyncio.sleep(delay)
+        if await prepare_database():
+            break
+        delay = min(delay * 2, STARTUP_RETRY_MAX_INTERVAL)
+    # The built-in content stood in for the stored content until now
+    await content_store.refresh_all()
+    logger.info("MongoDB is reachable; database setup finished")
+    startup_retry = None
+
+async def startup():
+    global startup_retry
+    # Builds the client and opens the pool
+    await mongo_pool.warm_up(db, pool_settings.min_pool_size)
+    await bus.start()
+    if not await prepare_database():
+        startup_retry = asyncio.ensure_future(retry_startup())
+    # After the indexes: the unique id index makes spill replays idempotent
+    await contact_writer.start()
+    content_store.start()
+    # One archiver per deployment is enough: worker 0 runs it
+    if ARCHIVE_AFTER_DAYS and not WORKER_INDEX:
+        archiver.start()
+
+async def shutdown():
+    global startup_retry
+    if startup_retry is not None:
+        startup_retry.cancel()
+        startup_retry = None
+    await archiver.stop()
+    await contact_writer.stop()
+    await content_store.stop()
+    await bus.stop()
     client.close()
@@ -0,0 +1,111 @@
+"""Static snapshot of the cacheable API routes.
+
+Every route in ``server.cached_routes`` (``/api/portfolio`` and its sections)
+is rendered from the content cache into ``<output>/<route>/index.json``.
+Next to each file go the cache's pre-compressed variants of the body,
+``index.json.gz`` and, when the ``brotli`` package is installed,
+``index.json.br``. Bodies too small to be worth compressing get no copies.
+``manifest.json`` lists every file with its size and the ETag and
+``Cache-Control`` the live API sends for the same representation, so clients
+can move between the snapshot and the API without refetching.
+
+Files are written atomically, each one renamed into place, and the manifest
+goes last. A server reading the directory during a run sees either the old
+or the new version of each file. Requests the snapshot does not cover, such
+as ``/api/portfolio?sections=...`` or the contact endpoints, fall back to
+the live API. With nginx, for example:
+
+    location /api/portfolio {
+        root /srv/api-snapshot;
+        gzip_static on;      # brotli_static on; with ngx_brotli
+        default_type application/json;
+        try_files $uri/index.json @api;
+    }
+
+Run it against the same database as the API, once the API has seeded it.
+The snapshot only reads:
+
+    python backend/snapshot.py build/api-snapshot
+"""
+import asyncio
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict
+
+import compression
+
+INDEX_FILE = "index.json"
+
+
+def _write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+async def render(routes, output: Path) -> Dict[str, Any]:
+    """Write every route of ``routes`` (a ``CachedRoutes``) under ``output``; returns the manifest."""
+    codings = list(compression.available())
+    manifest: Dict[str, Any] = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "encodings": list(codings),
+        "routes": {},
+    }
+    for path in routes.paths:
+        route = routes.match(path)
+        entry = await route.lookup("")
+        file = Path(path.strip("/")) / INDEX_FILE
+        _write(output / file, entry.body)
+        info: Dict[str, Any] = {
+            "file": file.as_posix(),
+            "size": len(entry.body),
+            "etag": entry.etag,
+            "content_type": "application/json",
+            "cache_control": route.policy.header,
+            "encodings": {},
+        }
+        for coding, (body, etag) in entry.variants.items():
+            compressed = file.with_name(file.name + compression.EXTENSIONS[coding])
+            _write(output / compressed, body)
+            info["encodings"][coding] = {"file": compressed.as_posix(), "size": len(body), "etag": etag}
+        manifest["routes"][path] = info
+    _write(output / "manifest.json", json.dumps(manifest, indent=2).encode())
+    return manifest
+
+
+async def main(output: Path) -> Dict[str, Any]:
+    import server
+
+    # Only reads the content, on a client of its own: the app's startup would
+    # also build indexes, seed collections and start the background tasks
+    client = server.build_client()
+    try:
+        server.content_store.db = client[os.environ["DB_NAME"]]
+        await server.content_cache.warm()
+        return await render(server.cached_routes, output)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Render the cacheable API routes into static files")
+    parser.add_argument("output", type=Path, help="directory to write the snapshot to")
+    args = parser.parse_args()
+    manifest = asyncio.run(main(args.output))
+    for path, info in manifest["routes"].items():
+        sizes = ", ".join(f"{coding} {item['size']}" for coding, item in info["encodings"].items())
+        print(f"{path:<32} {info['size']:>7} bytes ({sizes or 'uncompressed only'})")
+    if "br" not in manifest["encodings"]:
+        print("brotli is not installed; wrote gzip copies only")
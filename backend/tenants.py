@@ -0,0 +1,375 @@
+"""Multi-tenant portfolio hosting.
+
+One deployment serves many portfolios. ``TenantMiddleware`` finds the
+tenant of each request in one of two places:
+
+* a path prefix: ``/t/<slug>/api/portfolio/...`` is served as
+  ``/api/portfolio/...`` of tenant ``<slug>``,
+* a subdomain: with ``TENANT_DOMAIN=folio.example.com``, requests for
+  ``<slug>.folio.example.com`` belong to ``<slug>``.
+
+Any other request, for the bare domain or ``www`` for example, goes to the
+default tenant. That is the original single portfolio, read from its own
+collections through ``ContentCache`` as before. Tenants get the portfolio
+routes only. The contact and admin endpoints belong to the default tenant.
+
+Tenant content lives in the ``tenant_content`` collection, one document per
+tenant and section::
+
+    {"tenant": "ada", "section": "projects", "content": [...], "updated_at": ...}
+
+A tenant exists when it has at least one such document. Sections it has
+not written are empty: ``null``, or ``[]`` for list sections.
+
+``TenantCache`` keeps the encoded payloads of recently used tenants in an
+LRU bounded by entry count and by bytes. A payload holds every section
+plus the full portfolio, each with its compressed variants. Unknown slugs
+are cached too, for ``MISSING_TTL`` at most, in a separate LRU of
+``max_missing`` slugs: probing random subdomains does not reach the
+database for recently probed slugs, and never evicts a real tenant. Hits,
+misses and evictions
+are exported as metrics. ``benchmarks/bench_tenants.py`` measures the hit
+rate and memory at 10k tenants.
+"""
+import asyncio
+import contextvars
+import logging
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Collection, Dict, Optional, Sequence, Tuple
+
+import fast_json
+from content_cache import CachedResponse, resolve_sections, splice
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "tenant_content"
+SLUG = re.compile(r"[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?")
+# Subdomains that stay with the default tenant
+RESERVED = frozenset({"www"})
+
+# Approximate size of the Python objects around one tenant's payload bytes
+# (dicts, CachedResponse instances, hex ETags); see bench_tenants.py
+ENTRY_OVERHEAD = 4096
+# Unknown tenants are looked up again after this many seconds
+MISSING_TTL = 30.0
+
+NOT_FOUND = b'{"detail":"Not Found"}'
+
+# Content of the tenant serving the current request; None for the default
+current: contextvars.ContextVar[Optional["TenantContent"]] = contextvars.ContextVar("tenant", default=None)
+
+
+class TenantContent:
+    """Encoded sections of one tenant, plus the aggregates built from them.
+
+    ``found`` is false for a slug without content; such an entry only
+    remembers that the tenant does not exist.
+    """
+
+    def __init__(self, tenant: str, sections: Dict[str, CachedResponse], expires_at: float):
+        self.tenant = tenant
+        self.sections = sections
+        self.found = bool(sections)
+        self.expires_at = expires_at
+        self.size = ENTRY_OVERHEAD + sum(entry.size for entry in sections.values())
+        self.on_grow: Optional[Callable[["TenantContent", int], None]] = None
+        self._aggregates: Dict[Tuple[str, ...], CachedResponse] = {}
+        if self.found:
+            # The full portfolio is what most visitors load
+            self.aggregate()
+
+    def section(self, name: str) -> CachedResponse:
+        return self.sections[name]
+
+    def aggregate(self, names: Optional[Sequence[str]] = None) -> CachedResponse:
+        key = resolve_sections(tuple(self.sections), names)
+        entry = self._aggregates.get(key)
+        if entry is None:
+            entry = self._aggregates[key] = splice(key, [self.sections[name] for name in key])
+            self.size += entry.size
+            if self.on_grow is not None:
+                self.on_grow(self, entry.size)
+        return entry
+
+
+class TenantStore:
+    """Tenant content documents, validated with the section models of ``specs``
+    (``ContentStore.specs``). Writes are published on ``bus`` (a
+    ``cache_bus.Bus``), so every worker drops its copy of the tenant."""
+
+    def __init__(self, db, specs, bus=None):
+        self.db = db
+        self.specs = specs
+        self.bus = bus
+
+    @property
+    def collection(self):
+        return self.db[COLLECTION]
+
+    async def load(self, tenant: str) -> Optional[Dict[str, Any]]:
+        """Section name -> model(s) of ``tenant``, or None for an unknown tenant."""
+        docs = await self.collection.find({"tenant": tenant}, {"_id": 0, "section": 1, "content": 1}).to_list(None)
+        if not docs:
+            return None
+        content = {doc["section"]: doc.get("content") for doc in docs}
+        return {name: self._validate(spec, content.get(name)) for name, spec in self.specs.items()}
+
+    async def put(self, tenant: str, section: str, content: Any) -> None:
+        """Create or replace one section of ``tenant``."""
+        if not SLUG.fullmatch(tenant):
+            raise ValueError(f"Invalid tenant slug '{tenant}'")
+        try:
+            spec = self.specs[section]
+        except KeyError:
+            raise KeyError(f"Unknown content section '{section}'") from None
+        value = self._validate(spec, content)
+        doc = [item.dict() for item in value] if spec.many else (value.dict() if value is not None else None)
+        await self.collection.update_one(
+            {"tenant": tenant, "section": section},
+            {"$set": {"content": doc, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+        await self._changed(tenant)
+
+    async def delete(self, tenant: str) -> int:
+        result = await self.collection.delete_many({"tenant": tenant})
+        await self._changed(tenant)
+        return result.deleted_count
+
+    async def _changed(self, tenant: str) -> None:
+        if self.bus is not None:
+            await self.bus.publish("tenant", tenant)
+
+    @staticmethod
+    def _validate(spec, content: Any):
+        if spec.many:
+            return [item if isinstance(item, spec.model) else spec.model(**item) for item in content or ()]
+        if content is None or isinstance(content, spec.model):
+            return content
+        return spec.model(**content)
+
+
+class TenantCache:
+    """LRU of ``TenantContent`` bounded by ``max_entries`` and ``max_bytes``.
+
+    Unknown tenants are remembered apart, in an LRU of ``max_missing``
+    slugs, so they count against neither bound.
+
+    ``load(tenant)`` returns the tenant's section values, or None when it
+    does not exist. Like ``ContentCache``, an expired entry keeps being
+    served while a single background load replaces it. Concurrent misses
+    on one tenant share a single load.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[str], Awaitable[Optional[Dict[str, Any]]]],
+        max_bytes: int = 64 * 1024 * 1024,
+        max_entries: int = 10000,
+        ttl: float = 300.0,
+        registry=None,
+        max_missing: int = 1024,
+    ):
+        self._loader = load
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_missing = max_missing
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, TenantContent]" = OrderedDict()
+        self._missing: "OrderedDict[str, TenantContent]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._metrics = None
+        if registry is not None:
+            self._metrics = (
+                registry.counter("tenant_cache_hits_total", "Tenant content served from the cache"),
+                registry.counter("tenant_cache_misses_total", "Tenant content loaded from MongoDB"),
+                registry.counter(
+                    "tenant_cache_evictions_total", "Tenants evicted from the cache", labels=("reason",)
+                ),
+            )
+            registry.gauge("tenant_cache_bytes", "Approximate bytes held by the tenant cache",
+                           function=lambda: self.bytes)
+            registry.gauge("tenant_cache_entries", "Tenants in the cache", function=lambda: len(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, tenant: str) -> bool:
+        return tenant in self._entries
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "missing": len(self._missing),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+    async def get(self, tenant: str) -> TenantContent:
+        entries = self._entries if tenant in self._entries else self._missing
+        content = entries.get(tenant)
+        if content is None:
+            self.misses += 1
+            if self._metrics:
+                self._metrics[1].inc()
+            return await self.refresh(tenant)
+        entries.move_to_end(tenant)
+        self.hits += 1
+        if self._metrics:
+            self._metrics[0].inc()
+        if content.expires_at <= time.monotonic() and tenant not in self._pending:
+            asyncio.ensure_future(self._refresh_quietly(tenant))
+        return content
+
+    async def refresh(self, tenant: str) -> TenantContent:
+        """Reload a tenant now; concurrent callers share a single load."""
+        pending = self._pending.get(tenant)
+        if pending is None:
+            pending = self._pending[tenant] = asyncio.ensure_future(self._load(tenant))
+            pending.add_done_callback(lambda _: self._pending.pop(tenant, None))
+        return await asyncio.shield(pending)
+
+    def invalidate(self, tenant: Optional[str] = None) -> None:
+        """Drop one tenant (or all of them); it is reloaded on next access."""
+        if tenant is None:
+            self._entries.clear()
+            self._missing.clear()
+            self.bytes = 0
+            return
+        self._missing.pop(tenant, None)
+        content = self._entries.pop(tenant, None)
+        if content is not None:
+            self.bytes -= content.size
+
+    async def _load(self, tenant: str) -> TenantContent:
+        values = await self._loader(tenant)
+        now = time.monotonic()
+        self.invalidate(tenant)
+        if values is None:
+            content = self._missing[tenant] = TenantContent(tenant, {}, now + min(self.ttl, MISSING_TTL))
+            while len(self._missing) > self.max_missing:
+                self._missing.popitem(last=False)
+                self.evictions += 1
+                if self._metrics:
+                    self._metrics[2].inc("missing")
+            return content
+        # Validated models: encoded directly, skipping jsonable_encoder
+        sections = {name: CachedResponse(name, fast_json.dumps(value)) for name, value in values.items()}
+        content = TenantContent(tenant, sections, now + self.ttl)
+        content.on_grow = self._grew
+        self._entries[tenant] = content
+        self.bytes += content.size
+        self._evict(tenant)
+        return content
+
+    async def _refresh_quietly(self, tenant: str) -> None:
+        try:
+            await self.refresh(tenant)
+        except Exception:
+            logger.exception("Reloading tenant '%s' failed; serving stale copy", tenant)
+
+    def _grew(self, content: TenantContent, delta: int) -> None:
+        if self._entries.get(content.tenant) is content:
+            self.bytes += delta
+            self._evict(content.tenant)
+
+    def _evict(self, keep: str) -> None:
+        """Drop least recently used tenants, never ``keep``, until within bounds."""
+        while len(self._entries) > 1 and (self.bytes > self.max_bytes or len(self._entries) > self.max_entries):
+            reason = "bytes" if self.bytes > self.max_bytes else "entries"
+            tenant = next(iter(self._entries))
+            if tenant == keep:
+                self._entries.move_to_end(tenant)
+                continue
+            self.bytes -= self._entries.pop(tenant).size
+            self.evictions += 1
+            if self._metrics:
+                self._metrics[2].inc(reason)
+
+
+class TenantMiddleware:
+    """Resolve the tenant of each request; tenants are served ``paths`` only.
+
+    Requests for an unknown tenant, or for a path tenants do not get, are
+    answered with 404 here. Requests for a known tenant run with its content
+    in ``current``.
+    """
+
+    def __init__(self, app, cache: TenantCache, paths: Collection[str],
+                 domain: Optional[str] = None, prefix: str = "/t"):
+        self.app = app
+        self.cache = cache
+        self.paths = paths
+        self.domain = domain.lower().strip(".") if domain else None
+        self.prefix = prefix.rstrip("/") + "/"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        tenant = self._from_path(scope)
+        if tenant is None:
+            tenant = self._from_host(scope)
+            if tenant is None:
+                await self.app(scope, receive, send)
+                return
+        if not SLUG.fullmatch(tenant) or scope["path"] not in self.paths:
+            await _not_found(send)
+            return
+        content = await self.cache.get(tenant)
+        if not content.found:
+            await _not_found(send)
+            return
+        token = current.set(content)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current.reset(token)
+
+    def _from_path(self, scope) -> Optional[str]:
+        path = scope["path"]
+        if not path.startswith(self.prefix):
+            return None
+        tenant, _, rest = path[len(self.prefix):].partition("/")
+        # Routed (and labelled in metrics) like the default tenant's route
+        scope["path"] = "/" + rest
+        scope["raw_path"] = scope["path"].encode("latin-1")
+        return tenant
+
+    def _from_host(self, scope) -> Optional[str]:
+        if self.domain is None:
+            return None
+        for name, value in scope["headers"]:
+            if name == b"host":
+                host = value.decode("latin-1").lower().rsplit(":", 1)[0]
+                break
+        else:
+            return None
+        if not host.endswith("." + self.domain):
+            return None
+        tenant = host[:-len(self.domain) - 1]
+        return None if tenant in RESERVED else tenant
+
+
+async def _not_found(send) -> None:
+    await send({
+        "type": "http.response.start",
+        "status": 404,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(NOT_FOUND)).encode())],
+    })
+    await send({"type": "http.response.body", "body": NOT_FOUND})
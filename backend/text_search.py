@@ -0,0 +1,223 @@
+"""Full-text search over contact messages.
+
+MongoDB does the matching and ranking. ``contact_messages`` has a text index
+over ``name``, ``subject`` and ``message`` (``message_text`` in indexes.py),
+and ``search`` runs a ``$text`` query sorted by ``textScore``. Pages are
+addressed by offset. To return a page, MongoDB keeps only the best
+``offset + limit`` matches while it sorts, so offsets are capped at
+``MAX_OFFSET`` and every query gets a ``maxTimeMS``.
+
+This module adds what MongoDB does not:
+
+* ``highlight``: a snippet of a field around its matched words. The text is
+  HTML-escaped and the matches are wrapped in ``<mark>``.
+* ``TextIndex``: an in-process inverted index. It takes the same query
+  syntax as ``$text`` (words, ``"phrases"`` and ``-negated`` words) and
+  approximates MongoDB's scoring. ``memory_db`` uses it to answer ``$text``
+  queries.
+
+Tokens are case-folded words. English stop words are dropped, and a light
+suffix-stripping stemmer is applied, so "payments" finds "payment".
+"""
+import base64
+import bisect
+import binascii
+import html
+import json
+import re
+from typing import Any, Dict, Iterator, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from pagination import InvalidCursor
+
+FIELDS = ("name", "subject", "message")
+WEIGHTS = {"subject": 5, "name": 3, "message": 1}
+MAX_OFFSET = 1000
+SNIPPET_WIDTH = 160
+
+STOP_WORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these they this those
+through to too under until up very was we were what when where which while who whom why will with
+would you your yours yourself yourselves
+""".split())
+
+_WORD = re.compile(r"\w+")
+_PHRASE = re.compile(r'"([^"]*)"?')
+
+
+def stem(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            word = word[:-len(suffix)]
+            break
+    if len(word) > 4 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+
+def _words(text: str) -> Iterator[Tuple[re.Match, Optional[str]]]:
+    """Each word of ``text`` with its term (None for a stop word)."""
+    for match in _WORD.finditer(text):
+        word = match.group().casefold()
+        yield match, None if word in STOP_WORDS else stem(word)
+
+
+def tokenize(text: str) -> List[str]:
+    return [term for _, term in _words(text) if term is not None]
+
+
+class Query(NamedTuple):
+    terms: Tuple[str, ...]  # any of them must match (includes the phrases' terms)
+    phrases: Tuple[str, ...]  # case-folded; all of them must appear
+    excluded: Tuple[str, ...]  # none of them may appear
+
+
+def parse(text: str) -> Query:
+    phrases = [phrase.casefold().strip() for phrase in _PHRASE.findall(text) if phrase.strip()]
+    terms: List[str] = []
+    excluded: List[str] = []
+    for word in _PHRASE.sub(" ", text).split():
+        if word.startswith("-"):
+            excluded.extend(tokenize(word[1:]))
+        else:
+            terms.extend(tokenize(word))
+    for phrase in phrases:
+        terms.extend(tokenize(phrase))
+    return Query(tuple(dict.fromkeys(terms)), tuple(phrases), tuple(dict.fromkeys(excluded)))
+
+
+def field_scores(doc: Mapping[str, Any], weights: Mapping[str, int]) -> Dict[str, float]:
+    """Score of each term of ``doc``, the way MongoDB computes it: per field,
+    ``weight * (0.5 * occurrences / field terms + 0.5)``, summed over fields."""
+    scores: Dict[str, float] = {}
+    for field, weight in weights.items():
+        value = doc.get(field)
+        if not isinstance(value, str):
+            continue
+        terms = tokenize(value)
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            scores[term] = scores.get(term, 0.0) + weight * (0.5 * count / len(terms) + 0.5)
+    return scores
+
+
+class TextIndex:
+    """Inverted index from terms to the documents containing them."""
+
+    def __init__(self, weights: Mapping[str, int]):
+        self.weights = dict(weights)
+        self._postings: Dict[str, Dict[Any, float]] = {}
+        self._terms: Dict[Any, Tuple[str, ...]] = {}
+        # Case-folded text, for phrase matches
+        self._text: Dict[Any, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def add(self, key: Any, doc: Mapping[str, Any]) -> None:
+        self.remove(key)
+        scores = field_scores(doc, self.weights)
+        for term, score in scores.items():
+            self._postings.setdefault(term, {})[key] = score
+        self._terms[key] = tuple(scores)
+        self._text[key] = "\n".join(
+            doc[field].casefold() for field in self.weights if isinstance(doc.get(field), str)
+        )
+
+    def remove(self, key: Any) -> None:
+        for term in self._terms.pop(key, ()):
+            postings = self._postings[term]
+            del postings[key]
+            if not postings:
+                del self._postings[term]
+        self._text.pop(key, None)
+
+    def search(self, query: Query) -> Dict[Any, float]:
+        """Score of every matching key."""
+        scores: Dict[Any, float] = {}
+        for term in query.terms:
+            for key, score in self._postings.get(term, {}).items():
+                scores[key] = scores.get(key, 0.0) + score
+        if not query.excluded and not query.phrases:
+            return scores
+        excluded: Set[Any] = set()
+        for term in query.excluded:
+            excluded.update(self._postings.get(term, ()))
+        return {
+            key: score for key, score in scores.items()
+            if key not in excluded and all(phrase in self._text[key] for phrase in query.phrases)
+        }
+
+
+def highlight(text: str, query: Query, width: int = SNIPPET_WIDTH) -> Optional[str]:
+    """HTML snippet of ``text`` around its matches, or None without one."""
+    terms = set(query.terms)
+    spans = [match.span() for match, term in _words(text) if term in terms]
+    if not spans:
+        return None
+    start, end = 0, len(text)
+    if len(text) > width:
+        # The window holding the most matches, with a little context before
+        ends = [span_end for _, span_end in spans]
+        best = max(range(len(spans)), key=lambda i: bisect.bisect_right(ends, spans[i][0] + width) - i)
+        first = spans[best][0]
+        lead = first - width // 4
+        if lead > 0:
+            start = text.find(" ", lead, first) + 1 or lead
+        end = min(start + width, len(text))
+        if end < len(text):
+            cut = text.rfind(" ", spans[best][1], end)
+            end = cut if cut > 0 else end
+    parts = ["…" if start else ""]
+    position = start
+    for span_start, span_end in spans:
+        if span_start < start or span_end > end:
+            continue
+        parts += [html.escape(text[position:span_start]), "<mark>", html.escape(text[span_start:span_end]), "</mark>"]
+        position = span_end
+    parts += [html.escape(text[position:end]), "…" if end < len(text) else ""]
+    return "".join(parts)
+
+
+def hit(doc: Dict[str, Any], query: Query) -> Dict[str, Any]:
+    """A search result: the message, its score and snippets of the matched fields."""
+    highlights = {}
+    for field in FIELDS:
+        value = doc.get(field)
+        snippet = highlight(value, query) if isinstance(value, str) else None
+        if snippet is not None:
+            highlights[field] = snippet
+    return dict(doc, score=round(doc.get("score", 0.0), 4), highlights=highlights)
+
+
+def encode_cursor(offset: int) -> str:
+    raw = json.dumps({"offset": offset}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        offset = json.loads(raw)["offset"]
+    except (binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(offset, int) or not 0 <= offset <= MAX_OFFSET:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+    return offset
+
+
+async def search(collection, text: str, offset: int, limit: int, max_time_ms: int = 0) -> List[Dict[str, Any]]:
+    """Messages matching ``text``, best first, each with its ``score``."""
+    cursor = collection.find({"$text": {"$search": text}}, {"_id": 0, "score": {"$meta": "textScore"}}) \
+        .sort([("score", {"$meta": "textScore"}), ("timestamp", -1), ("id", -1)]) \
+        .skip(offset).limit(limit)
+    if max_time_ms:
+        cursor = cursor.max_time_ms(max_time_ms)
+    return await cursor.to_list(limit)
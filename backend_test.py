@@ -4,6 +4,7 @@ Backend API Testing for Portfolio Application
 Tests all portfolio endpoints for functionality and data integrity
 """
 
+import os
 import requests
 import json
 from datetime import datetime
@@ -271,7 +272,9 @@ def test_contact_messages_retrieval():
     """Test contact messages retrieval"""
     print("\n🔍 Testing Contact Messages Retrieval...")
     try:
-        response = requests.get(f"{BASE_URL}/portfolio/contact/messages", timeout=10)
+        # The listing is an admin endpoint
+        headers = {"Authorization": f"Bearer {os.environ.get('ADMIN_TOKEN', '')}"}
+        response = requests.get(f"{BASE_URL}/portfolio/contact/messages", headers=headers, timeout=10)
         print(f"Status Code: {response.status_code}")
         
         if response.status_code == 200:
@@ -31,19 +31,14 @@ function App() {
     try {
       setLoading(true);
       
-      const [personalRes, aboutRes, skillsRes, experienceRes, projectsRes] = await Promise.all([
-        axios.get(`${API}/portfolio/personal-info`),
-        axios.get(`${API}/portfolio/about`),
-        axios.get(`${API}/portfolio/skills`),
-        axios.get(`${API}/portfolio/experience`),
-        axios.get(`${API}/portfolio/projects`)
-      ]);
-
-      setPersonalInfo(personalRes.data);
-      setAboutInfo(aboutRes.data);
-      setSkills(skillsRes.data);
-      setExperience(experienceRes.data);
-      setProjects(projectsRes.data);
+      // All sections arrive in one precomputed payload
+      const { data } = await axios.get(`${API}/portfolio`);
+
+      setPersonalInfo(data.personal_info);
+      setAboutInfo(data.about);
+      setSkills(data.skills || []);
+      setExperience(data.experience || []);
+      setProjects(data.projects || []);
     } catch (error) {
       console.error('Error fetching portfolio data:', error);
     } finally {
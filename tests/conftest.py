@@ -0,0 +1,83 @@
+import contextlib
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("MONGO_URL", "memory://")
+os.environ.setdefault("DB_NAME", "portfolio_test")
+os.environ.setdefault("CONTACT_SPILL_PATH", str(Path(tempfile.mkdtemp()) / "contact_spill.jsonl"))
+# Tests submit many (identical) messages from one client; rate limiting and
+# de-duplication are tested on their own
+os.environ.setdefault("CONTACT_RATE_PER_MINUTE", "0")
+os.environ.setdefault("CONTACT_RATE_PER_HOUR", "0")
+os.environ.setdefault("CONTACT_DEDUPE_MODE", "off")
+
+# Import the backend app now, before the repo root copy of server.py can
+# shadow it once pytest puts the rootdir on sys.path.
+import server  # noqa: E402
+from memory_db import MemoryDatabase  # noqa: E402
+
+ADMIN_TOKEN = "secret"
+
+
+def _make_messages(count, start=datetime(2025, 1, 1, 12, 0, 0), step=timedelta(hours=1), same_time=1, **fields):
+    """``count`` contact message documents with ids ``msg-0000`` upwards.
+
+    Timestamps start at ``start`` and advance by ``step`` every ``same_time``
+    messages. ``fields`` replace the default values; strings are formatted
+    with the message number, as in ``subject="Re: {n}"``.
+    """
+    messages = []
+    for n in range(count):
+        message = {
+            "id": f"msg-{n:04d}",
+            "name": f"Sender {n}",
+            "email": f"sender{n}@example.com",
+            "subject": f"Subject {n}",
+            "message": f"Body {n}",
+            "timestamp": start + step * (n // same_time),
+        }
+        message.update((name, value.format(n=n) if isinstance(value, str) else value) for name, value in fields.items())
+        messages.append(message)
+    return messages
+
+
+@pytest.fixture
+def make_messages():
+    return _make_messages
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """An empty in-memory database standing in for ``server.db``."""
+    database = MemoryDatabase()
+    monkeypatch.setattr(server, "db", database)
+    return database
+
+
+@pytest.fixture
+def make_client(db, monkeypatch):
+    """Opens a ``TestClient`` on the app, with ``messages`` stored in ``db``.
+
+    With ``admin`` (the default) the admin API is enabled and the client
+    sends its token.
+    """
+    with contextlib.ExitStack() as stack:
+        def make(messages=(), admin=True):
+            headers = {}
+            if admin:
+                monkeypatch.setattr(server, "ADMIN_TOKEN", ADMIN_TOKEN)
+                headers["Authorization"] = f"Bearer {ADMIN_TOKEN}"
+            client = stack.enter_context(TestClient(server.app, headers=headers))
+            if messages:
+                client.portal.call(db.contact_messages.insert_many, list(messages))
+            return client
+        yield make
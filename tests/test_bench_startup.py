@@ -0,0 +1,22 @@
+import importlib.util
+from pathlib import Path
+
+_spec = importlib.util.spec_from_file_location(
+    "bench_startup", Path(__file__).resolve().parent.parent / "backend" / "benchmarks" / "bench_startup.py"
+)
+bench_startup = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bench_startup)
+
+
+def test_cold_start_reports_every_timing():
+    timings = bench_startup.run_once("/api/portfolio")
+    assert set(timings) == set(bench_startup.METRICS)
+    assert all(value > 0 for value in timings.values())
+    assert timings["ready_ms"] < timings["process_ms"]
+
+
+def test_compare_needs_relative_and_absolute_increase():
+    baseline = {"results": {"import_ms": 500.0, "first_request_ms": 2.0, "startup_ms": 100.0}}
+    current = {"results": {"import_ms": 650.0, "first_request_ms": 4.0, "startup_ms": 90.0}}
+    regressions = bench_startup.compare(baseline, current, threshold=20.0, min_delta_ms=25.0)
+    assert regressions == ["import_ms: 500.0 ms -> 650.0 ms (+30.0%)"]
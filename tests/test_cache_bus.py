@@ -0,0 +1,184 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+import cache_bus
+import serve
+import server
+import tenants
+from contact_writer import adopt_spills, worker_spill_path
+from memory_db import MemoryDatabase
+
+
+async def settle(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "invalidation never arrived"
+        await asyncio.sleep(0.01)
+
+
+def recorder():
+    seen = []
+    return seen, seen.append
+
+
+def test_unix_bus_reaches_other_workers_once(tmp_path):
+    async def scenario():
+        a = cache_bus.UnixSocketBus(tmp_path, name="a")
+        b = cache_bus.UnixSocketBus(tmp_path, name="b")
+        seen_a, handler_a = recorder()
+        seen_b, handler_b = recorder()
+        a.subscribe("content", handler_a)
+        b.subscribe("content", handler_b)
+        await a.start()
+        await b.start()
+        try:
+            await a.publish("content", "projects")
+            await settle(lambda: seen_b)
+            await asyncio.sleep(0.05)
+            assert seen_a == ["projects"] and seen_b == ["projects"]
+        finally:
+            await a.stop()
+            await b.stop()
+        assert not list(tmp_path.glob("*.sock"))
+
+    asyncio.run(scenario())
+
+
+def test_unix_bus_drops_sockets_of_dead_workers(tmp_path):
+    async def scenario():
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        stale.bind(str(tmp_path / "gone.sock"))
+        stale.close()
+        bus = cache_bus.UnixSocketBus(tmp_path, name="live")
+        await bus.start()
+        try:
+            await bus.publish("tenant", None)
+        finally:
+            await bus.stop()
+        assert not (tmp_path / "gone.sock").exists()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("change_streams", [True, False])
+def test_mongo_bus(change_streams):
+    async def scenario():
+        db = MemoryDatabase(change_streams=change_streams)
+        a = cache_bus.MongoBus(db, poll_interval=0.02)
+        b = cache_bus.MongoBus(db, poll_interval=0.02)
+        seen_a, handler_a = recorder()
+        seen_b, handler_b = recorder()
+        a.subscribe("tenant", handler_a)
+        b.subscribe("tenant", handler_b)
+        await a.start()
+        await b.start()
+        await asyncio.sleep(0.05)
+        try:
+            await a.publish("tenant", "ada")
+            await settle(lambda: seen_b)
+            await asyncio.sleep(0.1)
+            assert seen_a == ["ada"] and seen_b == ["ada"]
+        finally:
+            await a.stop()
+            await b.stop()
+
+    asyncio.run(scenario())
+
+
+def test_failing_handlers_do_not_stop_the_others():
+    async def scenario():
+        bus = cache_bus.Bus()
+        seen, handler = recorder()
+
+        def broken(key):
+            raise RuntimeError("boom")
+
+        bus.subscribe("content", broken)
+        bus.subscribe("content", handler)
+        await bus.publish("content", None)
+        assert seen == [None]
+
+    asyncio.run(scenario())
+
+
+def test_from_env(monkeypatch, tmp_path):
+    monkeypatch.delenv("CACHE_BUS", raising=False)
+    monkeypatch.delenv("CACHE_BUS_DIR", raising=False)
+    assert type(cache_bus.from_env(None)) is cache_bus.Bus
+    monkeypatch.setenv("CACHE_BUS_DIR", str(tmp_path))
+    assert isinstance(cache_bus.from_env(None), cache_bus.UnixSocketBus)
+    monkeypatch.setenv("CACHE_BUS", "mongo")
+    assert isinstance(cache_bus.from_env(None), cache_bus.MongoBus)
+    monkeypatch.setenv("CACHE_BUS", "carrier-pigeon")
+    with pytest.raises(ValueError):
+        cache_bus.from_env(None)
+
+
+def test_tenant_writes_invalidate_through_the_bus():
+    async def scenario():
+        bus = cache_bus.Bus()
+        store = tenants.TenantStore(MemoryDatabase(), server.content_store.specs, bus=bus)
+        cache = tenants.TenantCache(store.load)
+        bus.subscribe("tenant", cache.invalidate)
+        assert not (await cache.get("ada")).found
+        await store.put("ada", "personal_info", server.content_store.specs["personal_info"].default().dict())
+        assert (await cache.get("ada")).found
+
+    asyncio.run(scenario())
+
+
+def test_spills_of_departed_workers_go_to_worker_zero(tmp_path):
+    path = tmp_path / "contact_spill.jsonl"
+    assert worker_spill_path(path, None) == path
+    assert worker_spill_path(path, 2) == tmp_path / "contact_spill.2.jsonl"
+    path.write_text("single\n")
+    worker_spill_path(path, 0).write_text("zero\n")
+    worker_spill_path(path, 1).write_text("one\n")
+    worker_spill_path(path, 3).write_text("three\n")
+    Path(f"{worker_spill_path(path, 2)}.replay").write_text("two\n")
+    assert adopt_spills(path, workers=2) == 3
+    assert sorted(worker_spill_path(path, 0).read_text().split()) == ["single", "three", "two", "zero"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["contact_spill.0.jsonl", "contact_spill.1.jsonl"]
+
+
+def test_default_worker_count(monkeypatch):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    assert serve.default_workers() == serve.usable_cores() >= 1
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    assert serve.default_workers() == 3
+
+
+def test_launcher_serves_from_several_workers(tmp_path):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    env = dict(os.environ, MONGO_URL="memory://", DB_NAME="test_serve", METRICS_ENABLED="0",
+               CONTACT_SPILL_PATH=str(tmp_path / "spill.jsonl"))
+    env.pop("CACHE_BUS", None)
+    env.pop("CACHE_BUS_DIR", None)
+    process = subprocess.Popen(
+        [sys.executable, str(Path(serve.__file__)), "--host", "127.0.0.1", "--port", str(port),
+         "--workers", "2", "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            assert process.poll() is None and time.monotonic() < deadline
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/portfolio", timeout=1) as response:
+                    assert response.status == 200
+                    break
+            except OSError:
+                time.sleep(0.2)
+    finally:
+        process.terminate()
+        assert process.wait(30) == 0
@@ -0,0 +1,127 @@
+import asyncio
+import gzip
+import zlib
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+import compression
+from content_cache import CachedResponse
+
+BODY = b'{"projects": [%s]}' % b",".join(b'{"title": "Project %d", "text": "lorem ipsum"}' % n for n in range(40))
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("gzip", "gzip"),
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("deflate", None),
+    ("*", "br"),
+    ("*;q=0.3, br;q=0", "gzip"),
+    ("gzip;q=0", None),
+    ("x-gzip", "gzip"),
+    ("GZIP ; q=0.8", "gzip"),
+])
+def test_negotiate(header, expected):
+    assert compression.negotiate(header, ("br", "gzip")) == expected
+
+
+def test_small_bodies_have_no_variants():
+    entry = CachedResponse("about", b'{"name": "x"}')
+    assert entry.variants == {}
+    assert entry.select("gzip") == (None, entry.body, entry.etag)
+
+
+def test_cached_response_variants():
+    entry = CachedResponse("projects", BODY)
+    assert list(entry.variants) == ["gzip"]
+    coding, body, etag = entry.select("gzip, deflate")
+    assert coding == "gzip"
+    assert gzip.decompress(body) == BODY
+    assert etag == entry.etag[:-1] + '-gzip"'
+    assert entry.select("identity") == (None, BODY, entry.etag)
+
+
+def test_brotli_variant_preferred_when_installed(monkeypatch):
+    fake = SimpleNamespace(compress=lambda body, quality: zlib.compress(body, 9))
+    monkeypatch.setattr(compression, "brotli", fake)
+    entry = CachedResponse("projects", BODY)
+    assert entry.codings == ("br", "gzip")
+    coding, body, _ = entry.select("gzip, deflate, br")
+    assert coding == "br"
+    assert zlib.decompress(body) == BODY
+
+
+@pytest.fixture
+def client(make_client, make_messages):
+    return make_client(make_messages(30, start=datetime(2025, 3, 1, 9, 30),
+                                     message="Hello there, I would like to talk about a project."))
+
+
+def test_cached_route_negotiates_variant(client):
+    plain = client.get("/api/portfolio", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["vary"] == "Accept-Encoding"
+    gzipped = client.get("/api/portfolio", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["vary"] == "Accept-Encoding"
+    assert int(gzipped.headers["content-length"]) < len(plain.content)
+    assert gzipped.content == plain.content
+    assert gzipped.headers["etag"] != plain.headers["etag"]
+
+
+def test_304_uses_the_negotiated_variant_etag(client):
+    gzip_etag = client.get("/api/portfolio", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    response = client.get("/api/portfolio", headers={"Accept-Encoding": "gzip", "If-None-Match": gzip_etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == gzip_etag
+    assert response.headers["vary"] == "Accept-Encoding"
+    # The identity representation has another tag
+    response = client.get("/api/portfolio", headers={"Accept-Encoding": "identity", "If-None-Match": gzip_etag})
+    assert response.status_code == 200
+
+
+def test_contact_listing_is_gzipped_on_the_fly(client):
+    plain = client.get("/api/portfolio/contact/messages", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["vary"] == "Accept-Encoding"
+    gzipped = client.get("/api/portfolio/contact/messages", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert int(gzipped.headers["content-length"]) < len(plain.content)
+    assert gzipped.json() == plain.json()
+
+
+def test_export_is_gzipped_as_a_stream(client):
+    response = client.get("/api/portfolio/contact/messages/export", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert len(response.text.splitlines()) == 30
+
+
+def test_streamed_chunks_are_flushed():
+    chunks = [b"row %d\n" % n * 50 for n in range(3)]
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = compression.GzipStreamMiddleware(app, paths={"/rows"})
+    scope = {"type": "http", "path": "/rows", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(middleware(scope, None, send))
+    assert dict(sent[0]["headers"])[b"content-encoding"] == b"gzip"
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # Each chunk decodes as soon as it arrives
+    for chunk, message in zip(chunks, sent[1:]):
+        assert decoder.decompress(message["body"]) == chunk
+    assert decoder.decompress(sent[-1]["body"]) == b""
+    assert decoder.eof
@@ -0,0 +1,76 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import contact_export
+from memory_db import MemoryDatabase
+
+BASE = datetime(2025, 3, 1, 9, 30)
+
+
+@pytest.fixture
+def client(make_client, make_messages):
+    messages = make_messages(12, start=BASE, message='Line one\nline two, with "quotes" {n}')
+    messages[0]["subject"] = '=HYPERLINK("http://evil")'
+    return make_client(messages)
+
+
+def test_ndjson_export(client):
+    response = client.get("/api/portfolio/contact/messages/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert 'filename="contact_messages.ndjson"' in response.headers["content-disposition"]
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [f"msg-{n:04d}" for n in range(12)]
+    assert rows[1]["timestamp"] == (BASE + timedelta(hours=1)).isoformat()
+
+
+def test_csv_export_with_date_range(client):
+    response = client.get("/api/portfolio/contact/messages/export", params={
+        "format": "csv",
+        "start": (BASE + timedelta(hours=2)).isoformat() + "Z",
+        "end": (BASE + timedelta(hours=5)).isoformat(),
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["id"] for row in rows] == ["msg-0002", "msg-0003", "msg-0004"]
+    assert rows[0]["message"] == 'Line one\nline two, with "quotes" 2'
+
+
+def test_csv_neutralizes_formulas(client):
+    response = client.get("/api/portfolio/contact/messages/export", params={"format": "csv"})
+    first = next(csv.DictReader(io.StringIO(response.text)))
+    assert first["subject"].startswith("'=")
+
+
+def test_unknown_format_rejected(client):
+    assert client.get("/api/portfolio/contact/messages/export", params={"format": "xml"}).status_code == 422
+
+
+def test_rows_are_streamed_one_chunk_per_batch(make_messages):
+    db = MemoryDatabase()
+
+    async def scenario():
+        await db.contact_messages.insert_many(make_messages(7))
+        cursor = db.contact_messages.find({}, {"_id": 0}).sort("timestamp", 1)
+        return [chunk async for chunk in contact_export.export_rows(cursor, "ndjson", batch_size=3)]
+
+    chunks = asyncio.run(scenario())
+    assert [chunk.count(b"\n") for chunk in chunks] == [3, 3, 1]
+
+
+@pytest.mark.parametrize("path", [
+    "/api/portfolio/contact/messages",
+    "/api/portfolio/contact/messages/export",
+    "/api/portfolio/contact/messages/search?q=hello",
+    "/api/portfolio/contact/stats",
+])
+def test_admin_reads_require_the_token(client, path):
+    assert client.get(path, headers={"Authorization": ""}).status_code == 401
+    assert client.get(path, headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get(path).status_code == 200
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import pagination
+import server
+
+BASE = datetime(2025, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def client(make_client, make_messages):
+    # Pairs of messages share a timestamp to exercise the id tie-breaker
+    return make_client(make_messages(25, start=BASE, step=timedelta(minutes=1), same_time=2))
+
+
+def walk(client, **params):
+    pages, cursor = [], None
+    while True:
+        response = client.get("/api/portfolio/contact/messages", params=dict(params, **({"cursor": cursor} if cursor else {})))
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            return pages
+
+
+def test_keyset_pages_cover_everything_in_order(client):
+    pages = walk(client, limit=10)
+    assert [len(page) for page in pages] == [10, 10, 5]
+    ids = [msg["id"] for page in pages for msg in page]
+    assert ids == [f"msg-{n:04d}" for n in reversed(range(25))]
+
+
+def test_default_page_returns_full_documents(client):
+    messages = client.get("/api/portfolio/contact/messages").json()
+    assert len(messages) == 25
+    assert set(messages[0]) == {"id", "name", "email", "subject", "message", "timestamp"}
+    assert server.ContactMessage(**messages[0]).id == "msg-0024"
+
+
+def test_fields_projection(client):
+    pages = walk(client, limit=7, fields="id,subject")
+    assert all(set(msg) == {"id", "subject"} for page in pages for msg in page)
+    assert sum(len(page) for page in pages) == 25
+
+
+def test_invalid_parameters(client):
+    assert client.get("/api/portfolio/contact/messages", params={"fields": "id,password"}).status_code == 400
+    assert client.get("/api/portfolio/contact/messages", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/api/portfolio/contact/messages", params={"limit": 0}).status_code == 422
+    assert client.get("/api/portfolio/contact/messages", params={"limit": 10_000}).status_code == 422
+
+
+def test_cursor_round_trip():
+    cursor = pagination.encode_cursor(BASE, "abc")
+    assert pagination.decode_cursor(cursor) == (BASE, "abc")
+    assert pagination.after(cursor)["$or"][1] == {"timestamp": BASE, "id": {"$lt": "abc"}}
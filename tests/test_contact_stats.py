@@ -0,0 +1,146 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import contact_stats
+import indexes
+import server
+from contact_writer import ContactWriter
+from memory_db import MemoryDatabase
+
+START = datetime(2024, 5, 1)
+
+
+def message(n, hours, email="ada@example.com", subject="Invoice for the analytical engine"):
+    return {"id": f"m{n}", "email": email, "subject": subject, "message": "Hi",
+            "timestamp": START + timedelta(hours=hours, minutes=n % 60)}
+
+
+def test_keywords_and_domains():
+    assert contact_stats.keywords("Re: The INVOICE invoice, 2024 & an offer!") == ["invoice", "offer"]
+    assert contact_stats.sender_domain("Ada@Mail.Example.COM") == "mail.example.com"
+
+
+def test_rollups_answer_ranges_without_reading_messages():
+    async def scenario():
+        db = MemoryDatabase()
+        rollups = contact_stats.Rollups(db.contact_stats)
+        # Nothing to backfill: every message is counted as it is stored
+        await rollups.backfill(db.contact_messages)
+        await rollups.record([
+            message(1, 0),
+            message(2, 0, email="bob@analytical.engine.org"),
+            message(3, 2, subject="Engine offer"),
+            message(4, 30),
+        ])
+        hourly = await rollups.stats("hour", START, START + timedelta(hours=4))
+        assert [point["count"] for point in hourly["series"]] == [2, 0, 1, 0]
+        assert hourly["total"] == 3
+        assert hourly["top_domains"] == [
+            {"domain": "example.com", "count": 2}, {"domain": "analytical.engine.org", "count": 1},
+        ]
+        assert hourly["top_keywords"][0] == {"keyword": "engine", "count": 3}
+
+        daily = await rollups.stats("day", START + timedelta(hours=5), START + timedelta(days=3), top=1)
+        assert daily["start"] == START
+        assert [point["count"] for point in daily["series"]] == [3, 1, 0]
+        assert daily["top_domains"] == [{"domain": "example.com", "count": 3}]
+        with pytest.raises(ValueError):
+            await rollups.stats("hour", START, START + timedelta(days=60))
+
+    asyncio.run(scenario())
+
+
+def test_backfill_runs_once():
+    async def scenario():
+        db = MemoryDatabase()
+        await db.contact_messages.insert_many([message(n, n) for n in range(5)])
+        rollups = contact_stats.Rollups(db.contact_stats)
+        assert await rollups.backfill(db.contact_messages) == 5
+        assert await rollups.backfill(db.contact_messages) == 0
+        assert await contact_stats.Rollups(db.contact_stats).backfill(db.contact_messages) == 0
+        assert (await rollups.stats("day", START, START + timedelta(days=1)))["total"] == 5
+
+    asyncio.run(scenario())
+
+
+def test_live_and_backfilled_messages_are_counted_once():
+    async def scenario():
+        db = MemoryDatabase()
+        await db.contact_messages.insert_many([message(n, n) for n in range(4)])
+        # Another worker's writer fixed the cutoff and stores while the backfill has not run
+        writer_side = contact_stats.Rollups(db.contact_stats)
+        cutoff = await writer_side.prepare()
+        replayed, fresh = message(8, 4), dict(message(9, 0), timestamp=cutoff + timedelta(seconds=1))
+        await db.contact_messages.insert_many([replayed, fresh])
+        await writer_side.record([replayed, fresh])
+
+        assert await contact_stats.Rollups(db.contact_stats).backfill(db.contact_messages) == 5
+        old = await writer_side.stats("day", START, START + timedelta(days=1))
+        assert old["total"] == 5 and old["top_domains"] == [{"domain": "example.com", "count": 5}]
+        assert (await writer_side.stats("hour", cutoff, cutoff + timedelta(hours=1)))["total"] == 1
+        # A spill replayed after the backfill finished is counted live
+        late = message(10, 5)
+        await writer_side.record([late])
+        assert (await writer_side.stats("day", START, START + timedelta(days=1)))["total"] == 6
+
+    asyncio.run(scenario())
+
+
+def test_unfinished_backfill_is_taken_over_and_redone():
+    async def scenario():
+        db = MemoryDatabase()
+        await db.contact_messages.insert_many([message(n, n) for n in range(3)])
+        assert await contact_stats.Rollups(db.contact_stats).backfill(db.contact_messages, owner="a") == 3
+        # As if "a" died before finishing
+        await db.contact_stats.update_one({"_id": contact_stats.BACKFILL}, {"$unset": {"finished_at": ""}})
+        assert await contact_stats.Rollups(db.contact_stats).backfill(db.contact_messages, owner="b") == 0
+        assert await contact_stats.Rollups(db.contact_stats).backfill(
+            db.contact_messages, owner="b", timeout=0) == 3
+        await db.contact_stats.update_one({"_id": contact_stats.BACKFILL}, {"$unset": {"finished_at": ""}})
+        assert await contact_stats.Rollups(db.contact_stats).backfill(db.contact_messages, owner="b") == 3
+        rollups = contact_stats.Rollups(db.contact_stats)
+        assert (await rollups.stats("day", START, START + timedelta(days=1)))["total"] == 3
+
+    asyncio.run(scenario())
+
+
+def test_writer_records_each_stored_message_once(tmp_path):
+    async def scenario():
+        db = MemoryDatabase()
+        await indexes.registry.ensure(db)
+        rollups = contact_stats.Rollups(db.contact_stats)
+        await rollups.backfill(db.contact_messages)
+        writer = ContactWriter(db.contact_messages, tmp_path / "spill.jsonl", on_stored=rollups.record)
+        await writer.start()
+        for n in range(3):
+            await writer.submit(message(n, 0))
+        await writer.flush()
+        # A replayed batch: two rows were already stored
+        await writer._write([message(1, 0), message(2, 0), message(9, 0)])
+        await writer.stop()
+        assert (await rollups.stats("hour", START, START + timedelta(hours=1)))["total"] == 4
+
+    asyncio.run(scenario())
+
+
+def test_stats_endpoint(monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+    with TestClient(server.app, headers={"Authorization": "Bearer secret"}) as client:
+        before = client.get("/api/portfolio/contact/stats", params={"granularity": "hour"}).json()
+        client.post("/api/portfolio/contact", json={
+            "name": "Ada", "email": "ada@stats.example", "subject": "Quarterly forecast", "message": "Hello",
+        })
+        client.portal.call(server.contact_writer.flush)
+        stats = client.get("/api/portfolio/contact/stats", params={"granularity": "hour"}).json()
+        assert stats["total"] == before["total"] + 1
+        assert len(stats["series"]) in (48, 49)
+        assert {"domain": "stats.example", "count": 1} in stats["top_domains"]
+        assert client.get("/api/portfolio/contact/stats", params={
+            "start": "2024-05-02T00:00:00", "end": "2024-05-01T00:00:00",
+        }).status_code == 400
+        assert client.get("/api/portfolio/contact/stats", params={
+            "granularity": "hour", "start": "2020-01-01T00:00:00",
+        }).status_code == 400
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from pymongo.errors import AutoReconnect
+
+import server
+from contact_writer import ContactQueueFull, ContactWriter
+
+
+class RecordingCollection:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+
+    async def insert_many(self, docs, ordered=True):
+        if self.fail:
+            raise AutoReconnect("connection refused")
+        self.batches.append([doc["n"] for doc in docs])
+
+
+def test_flushes_by_batch_size(tmp_path):
+    collection = RecordingCollection()
+    writer = ContactWriter(collection, tmp_path / "spill.jsonl", max_batch=100, flush_interval=10)
+
+    async def scenario():
+        await writer.start()
+        for n in range(250):
+            await writer.submit({"n": n})
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert [len(batch) for batch in collection.batches] == [100, 100, 50]
+    assert sum(collection.batches, []) == list(range(250))
+
+
+def test_flushes_by_time_window(tmp_path):
+    collection = RecordingCollection()
+    writer = ContactWriter(collection, tmp_path / "spill.jsonl", max_batch=100, flush_interval=0.01)
+
+    async def scenario():
+        await writer.start()
+        for n in range(3):
+            await writer.submit({"n": n})
+        await asyncio.sleep(0.05)
+        assert collection.batches == [[0, 1, 2]]
+        await writer.stop()
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_after_timeout(tmp_path):
+    writer = ContactWriter(RecordingCollection(), tmp_path / "spill.jsonl", max_queue=2, enqueue_timeout=0.01)
+
+    async def scenario():
+        await writer.submit({"n": 1})
+        await writer.submit({"n": 2})
+        with pytest.raises(ContactQueueFull):
+            await writer.submit({"n": 3})
+        assert writer.depth == 2
+
+    asyncio.run(scenario())
+
+
+def test_outage_spills_to_disk_and_replays(tmp_path):
+    spill = tmp_path / "spill.jsonl"
+    down = RecordingCollection(fail=True)
+    writer = ContactWriter(down, spill, flush_interval=0.001)
+
+    async def outage():
+        await writer.start()
+        for n in range(5):
+            await writer.submit({"n": n})
+        await writer.flush()
+        await writer.stop()
+
+    asyncio.run(outage())
+    assert len(spill.read_text().splitlines()) == 5
+
+    up = RecordingCollection()
+    recovered = ContactWriter(up, spill)
+    asyncio.run(recovered.start())
+    assert sum(up.batches, []) == list(range(5))
+    assert not spill.exists()
+    asyncio.run(recovered.stop())
+
+
+def test_submit_is_acknowledged_before_write_and_listed_after_flush(monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+    with TestClient(server.app, headers={"Authorization": "Bearer secret"}) as client:
+        response = client.post("/api/portfolio/contact", json={
+            "name": "Ada", "email": "ada@example.com", "subject": "Hello", "message": "Write-behind",
+        })
+        assert response.status_code == 200
+        message_id = response.json()["id"]
+        client.portal.call(server.contact_writer.flush)
+        listed = client.get("/api/portfolio/contact/messages").json()
+        assert message_id in [message["id"] for message in listed]
+
+
+def test_full_queue_returns_503(monkeypatch):
+    async def reject(doc):
+        raise ContactQueueFull()
+
+    with TestClient(server.app) as client:
+        monkeypatch.setattr(server.contact_writer, "submit", reject)
+        response = client.post("/api/portfolio/contact", json={
+            "name": "Ada", "email": "ada@example.com", "subject": "Hello", "message": "Flood",
+        })
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
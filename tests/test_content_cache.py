@@ -0,0 +1,163 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from content_cache import ContentCache, stable_id
+
+SECTION_ROUTES = {
+    "personal_info": "/api/portfolio/personal-info",
+    "about": "/api/portfolio/about",
+    "skills": "/api/portfolio/skills",
+    "experience": "/api/portfolio/experience",
+    "projects": "/api/portfolio/projects",
+}
+
+
+@pytest.fixture
+def client():
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+@pytest.mark.parametrize("section,path", SECTION_ROUTES.items())
+def test_section_served_from_cache(client, section, path):
+    first = client.get(path)
+    second = client.get(path)
+    assert first.status_code == 200
+    assert first.headers["content-type"] == "application/json"
+    assert first.content == second.content == server.content_cache.get(section).body
+
+
+def test_ids_are_stable_across_rebuilds(client):
+    before = client.get("/api/portfolio/projects").json()
+    server.content_cache.invalidate()
+    after = client.get("/api/portfolio/projects").json()
+    assert [p["id"] for p in before] == [p["id"] for p in after]
+    assert before[0]["id"] == stable_id("projects", "Rossmann Store Sales Forecasting")
+
+
+def test_payload_matches_models(client):
+    info = client.get("/api/portfolio/personal-info").json()
+    assert server.PersonalInfo(**info).name == "Varshank"
+    skills = client.get("/api/portfolio/skills").json()
+    assert [s["category_name"] for s in skills] == [
+        "Business Leadership", "Technical Expertise", "Core Competencies"
+    ]
+
+
+def test_loader_runs_once_until_invalidated():
+    calls = []
+    cache = ContentCache()
+
+    @cache.section("demo")
+    async def load_demo():
+        calls.append(1)
+        return {"value": len(calls)}
+
+    async def scenario():
+        await cache.warm()
+        assert json.loads((await cache.fetch("demo")).body) == {"value": 1}
+        assert json.loads(cache.get("demo").body) == {"value": 1}
+        cache.invalidate("demo")
+        with pytest.raises(LookupError):
+            cache.get("demo")
+        assert json.loads((await cache.fetch("demo")).body) == {"value": 2}
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_concurrent_misses_share_one_load():
+    calls = []
+    cache = ContentCache()
+
+    @cache.section("demo")
+    async def load_demo():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return [1, 2, 3]
+
+    async def scenario():
+        entries = await asyncio.gather(*(cache.fetch("demo") for _ in range(10)))
+        assert len({id(entry) for entry in entries}) == 1
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
+
+
+def test_expired_entry_served_stale_while_refreshing():
+    values = iter([1, 2])
+    cache = ContentCache(ttl=0)
+    cache.register("demo", lambda: next(values))
+
+    async def scenario():
+        first = await cache.fetch("demo")
+        assert json.loads((await cache.fetch("demo")).body) == 1
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert cache.get("demo") is not first
+        assert json.loads(cache.get("demo").body) == 2
+
+    asyncio.run(scenario())
+
+
+def test_unchanged_reload_keeps_entry():
+    cache = ContentCache()
+    cache.register("demo", lambda: {"a": 1})
+
+    async def scenario():
+        first = await cache.fetch("demo")
+        assert await cache.refresh("demo") is first
+
+    asyncio.run(scenario())
+
+
+def test_duplicate_and_unknown_sections_rejected():
+    cache = ContentCache()
+    cache.register("demo", dict)
+    with pytest.raises(ValueError):
+        cache.register("demo", dict)
+    with pytest.raises(KeyError):
+        cache.get("missing")
+
+
+def test_aggregated_portfolio_matches_section_routes(client):
+    portfolio = client.get("/api/portfolio")
+    assert portfolio.status_code == 200
+    data = portfolio.json()
+    assert list(data) == list(SECTION_ROUTES)
+    for section, path in SECTION_ROUTES.items():
+        assert data[section] == client.get(path).json()
+
+
+def test_aggregated_portfolio_sections_filter(client):
+    data = client.get("/api/portfolio", params={"sections": "projects,personal-info"}).json()
+    assert list(data) == ["personal_info", "projects"]
+    assert client.get("/api/portfolio", params={"sections": "personal_info,projects"}).content == \
+        client.get("/api/portfolio", params={"sections": "projects,personal-info"}).content
+
+
+def test_aggregated_portfolio_rejects_unknown_section(client):
+    response = client.get("/api/portfolio", params={"sections": "skills,hobbies"})
+    assert response.status_code == 400
+    assert "hobbies" in response.json()["detail"]
+
+
+def test_invalidating_a_section_drops_dependent_aggregates():
+    cache = ContentCache()
+    values = {"a": 1, "b": 1}
+    cache.register("a", lambda: values["a"])
+    cache.register("b", lambda: values["b"])
+
+    async def scenario():
+        assert json.loads((await cache.aggregate()).body) == {"a": 1, "b": 1}
+        assert json.loads((await cache.aggregate(["b"])).body) == {"b": 1}
+        values["a"] = 2
+        cache.invalidate("a")
+        assert json.loads((await cache.aggregate()).body) == {"a": 2, "b": 1}
+        assert await cache.aggregate(["b"]) is await cache.aggregate(["b"])
+
+    asyncio.run(scenario())
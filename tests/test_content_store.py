@@ -0,0 +1,126 @@
+import asyncio
+import json
+import time
+
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+import server
+from content_cache import ContentCache
+from content_store import ContentStore
+from memory_db import MemoryDatabase
+
+
+class Item(BaseModel):
+    id: str
+    label: str
+
+
+def make_store(db, poll_interval=0.01):
+    cache = ContentCache()
+    store = ContentStore(db, cache, poll_interval=poll_interval)
+
+    @store.section("items", collection="items", model=Item, many=True)
+    def default_items():
+        return [Item(id="a", label="first"), Item(id="b", label="second")]
+
+    @store.section("single", collection="single", model=Item)
+    def default_single():
+        return Item(id="s", label="solo")
+
+    return store, cache
+
+
+async def wait_for(predicate, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.005)
+
+
+def test_seed_is_idempotent_and_ordered():
+    db = MemoryDatabase()
+    store, cache = make_store(db)
+
+    async def scenario():
+        await store.seed()
+        await store.seed()
+        assert await db.items.count_documents({}) == 2
+        assert await db.single.count_documents({}) == 1
+        await cache.warm()
+        assert [item["id"] for item in json.loads(cache.get("items").body)] == ["a", "b"]
+        assert "order" not in json.loads(cache.get("items").body)[0]
+
+    asyncio.run(scenario())
+
+
+def test_defaults_stand_in_until_the_content_loads():
+    db = MemoryDatabase()
+    store, cache = make_store(db)
+
+    async def scenario():
+        await db.single.insert_one({"id": "s", "label": "stored"})
+        store.use_defaults()
+        assert json.loads(cache.get("single").body)["label"] == "solo"
+        assert [item["id"] for item in json.loads((await cache.aggregate()).body)["items"]] == ["a", "b"]
+        await store.refresh_all()
+        assert json.loads(cache.get("single").body)["label"] == "stored"
+        # Loaded sections are not replaced
+        store.use_defaults()
+        assert json.loads(cache.get("single").body)["label"] == "stored"
+
+    asyncio.run(scenario())
+
+
+def test_change_stream_refreshes_edited_section():
+    db = MemoryDatabase()
+    store, cache = make_store(db, poll_interval=60)
+
+    async def scenario():
+        await store.seed()
+        await cache.warm()
+        store.start()
+        await asyncio.sleep(0)
+        before = cache.get("items")
+        await db.items.update_one({"id": "b"}, {"$set": {"label": "edited"}})
+        await wait_for(lambda: cache.get("items") is not before)
+        assert json.loads(cache.get("items").body)[1]["label"] == "edited"
+        assert cache.get("single").body == json.dumps({"id": "s", "label": "solo"}, separators=(",", ":")).encode()
+        await store.stop()
+
+    asyncio.run(scenario())
+
+
+def test_polling_fallback_without_change_streams():
+    db = MemoryDatabase(change_streams=False)
+    store, cache = make_store(db, poll_interval=0.01)
+
+    async def scenario():
+        await store.seed()
+        await cache.warm()
+        store.start()
+        await db.single.update_one({"id": "s"}, {"$set": {"label": "polled"}})
+        await wait_for(lambda: json.loads(cache.get("single").body)["label"] == "polled")
+        await store.stop()
+
+    asyncio.run(scenario())
+
+
+def test_api_serves_content_edited_in_mongo():
+    with TestClient(server.app) as client:
+        before = client.get("/api/portfolio/about").json()
+        assert before["stats"]["years_experience"]["value"] == "5+"
+        client.portal.call(
+            server.db.about_info.update_one, {}, {"$set": {"stats.years_experience.value": "6+"}}
+        )
+        try:
+            deadline = time.monotonic() + 1
+            while client.get("/api/portfolio/about").json()["stats"]["years_experience"]["value"] != "6+":
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+            assert client.get("/api/portfolio").json()["about"]["stats"]["years_experience"]["value"] == "6+"
+        finally:
+            client.portal.call(
+                server.db.about_info.update_one, {}, {"$set": {"stats.years_experience.value": "5+"}}
+            )
+            client.portal.call(server.content_cache.refresh, "about")
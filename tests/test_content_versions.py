@@ -0,0 +1,191 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+import cache_bus
+import indexes
+import server
+from content_cache import ContentCache
+from content_store import ContentStore
+from content_versions import VersionStore
+from memory_db import MemoryDatabase
+
+
+class Item(BaseModel):
+    id: str
+    label: str
+
+
+def make_stores(db):
+    cache = ContentCache()
+    store = ContentStore(db, cache)
+
+    @store.section("items", collection="items", model=Item, many=True)
+    def default_items():
+        return [Item(id="a", label="first"), Item(id="b", label="second")]
+
+    @store.section("single", collection="single", model=Item)
+    def default_single():
+        return Item(id="s", label="solo")
+
+    bus = cache_bus.Bus()
+    bus.subscribe("content", lambda name: store.refresh_all())
+    return VersionStore(db, store, bus=bus), cache
+
+
+def body(cache, name):
+    return json.loads(cache.get(name).body)
+
+
+def test_drafts_stay_unpublished_until_publish():
+    db = MemoryDatabase()
+    versions, cache = make_stores(db)
+
+    async def scenario():
+        await indexes.registry.ensure(db)
+        await versions.store.seed()
+        await cache.warm()
+        await versions.add_item("items", {"id": "c", "label": "third"})
+        await versions.update_item("items", "a", {"label": "edited"})
+        await versions.delete_item("items", "b")
+        await versions.put("single", {"id": "s", "label": "new"})
+        assert [item.label for item in await versions.draft("items")] == ["edited", "third"]
+        assert [doc["section"] for doc in await versions.drafted()] == ["items", "single"]
+        # Readers still get the seeded content
+        assert [item["label"] for item in body(cache, "items")] == ["first", "second"]
+
+        published = await versions.publish(note="first edit")
+        assert published["version"] == 1 and published["note"] == "first edit"
+        assert cache.version == 1
+        assert [item["label"] for item in body(cache, "items")] == ["edited", "third"]
+        assert body(cache, "single")["label"] == "new"
+        assert json.loads((await cache.aggregate()).body)["single"]["label"] == "new"
+        assert await versions.drafted() == []
+
+    asyncio.run(scenario())
+
+
+def test_rollback_publishes_an_earlier_version_again():
+    db = MemoryDatabase()
+    versions, cache = make_stores(db)
+
+    async def scenario():
+        await indexes.registry.ensure(db)
+        await versions.store.seed()
+        await cache.warm()
+        await versions.publish()
+        await versions.put("single", {"id": "s", "label": "v2"})
+        await versions.publish()
+        assert body(cache, "single")["label"] == "v2"
+
+        rolled = await versions.rollback(1, note="undo")
+        assert rolled["version"] == 3 and rolled["rolled_back_from"] == 1
+        assert body(cache, "single")["label"] == "solo"
+        assert [doc["version"] for doc in await versions.history()] == [3, 2, 1]
+        assert "sections" not in (await versions.history())[0]
+        with pytest.raises(KeyError):
+            await versions.rollback(9)
+
+    asyncio.run(scenario())
+
+
+def test_invalid_edits_are_rejected():
+    db = MemoryDatabase()
+    versions, cache = make_stores(db)
+
+    async def scenario():
+        await indexes.registry.ensure(db)
+        await versions.store.seed()
+        with pytest.raises(ValueError):
+            await versions.add_item("single", {"id": "x", "label": "x"})
+        with pytest.raises(ValueError):
+            await versions.add_item("items", {"id": "a", "label": "duplicate"})
+        with pytest.raises(ValueError):
+            await versions.put("items", {"id": "a", "label": "not a list"})
+        with pytest.raises(KeyError):
+            await versions.update_item("items", "missing", {"label": "x"})
+        assert await versions.drafted() == []
+
+    asyncio.run(scenario())
+
+
+def test_swap_is_not_undone_by_a_load_that_started_before_it():
+    cache = ContentCache()
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_load():
+        started.set()
+        await release.wait()
+        return {"label": "old"}
+
+    cache.register("one", slow_load)
+    cache.register("two", lambda: {"label": "old"})
+
+    async def scenario():
+        loading = asyncio.ensure_future(cache.refresh("one"))
+        await started.wait()
+        cache.swap(5, {"one": {"label": "new"}, "two": {"label": "new"}})
+        release.set()
+        assert json.loads((await loading).body) == {"label": "new"}
+        assert json.loads((await cache.aggregate()).body) == {"one": {"label": "new"}, "two": {"label": "new"}}
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+    with TestClient(server.app, headers={"Authorization": "Bearer secret"}) as client:
+        yield client
+        client.portal.call(server.db.content_versions.delete_many, {})
+        client.portal.call(server.db.content_drafts.delete_many, {})
+        server.content_cache.version = None
+        server.content_cache.invalidate()
+        client.portal.call(server.content_cache.warm)
+
+
+def test_admin_api_requires_the_token(admin, monkeypatch):
+    assert admin.get("/api/admin/drafts", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "")
+    assert admin.get("/api/admin/drafts").status_code == 403
+
+
+def test_admin_edit_publish_and_rollback(admin):
+    projects = admin.get("/api/portfolio/projects").json()
+    created = admin.post("/api/admin/content/projects", json={
+        "title": "Churn Model", "category": "Data Science", "description": "Predicting churn.",
+        "technologies": ["Python"], "key_results": ["Fewer cancellations"], "status": "Ongoing",
+    })
+    assert created.status_code == 201
+    new_id = created.json()["id"]
+    assert admin.put("/api/admin/content/personal-info", json=dict(
+        admin.get("/api/admin/content/personal-info").json(), title="Data Scientist",
+    )).status_code == 200
+    assert admin.get("/api/portfolio/projects").json() == projects
+
+    published = admin.post("/api/admin/versions", json={"note": "new project"})
+    assert published.status_code == 201 and published.json()["version"] == 1
+    portfolio = admin.get("/api/portfolio").json()
+    assert portfolio["projects"][-1]["id"] == new_id
+    assert portfolio["personal_info"]["title"] == "Data Scientist"
+    assert admin.get("/api/portfolio/projects").json() == portfolio["projects"]
+
+    assert admin.delete(f"/api/admin/content/projects/{new_id}").status_code == 204
+    assert admin.delete("/api/admin/content/projects/nope").status_code == 404
+    assert admin.post("/api/admin/versions").json()["version"] == 2
+    assert admin.get("/api/portfolio/projects").json() == projects
+
+    assert admin.post("/api/admin/versions/1/rollback").json()["rolled_back_from"] == 1
+    assert admin.get("/api/portfolio/projects").json()[-1]["id"] == new_id
+    assert [v["version"] for v in admin.get("/api/admin/versions").json()] == [3, 2, 1]
+    assert admin.get("/api/admin/versions/3").json()["sections"]["projects"][-1]["id"] == new_id
+
+
+def test_admin_rejects_invalid_content(admin):
+    assert admin.get("/api/admin/content/hobbies").status_code == 404
+    assert admin.post("/api/admin/content/projects", json={"title": "No fields"}).status_code == 422
+    assert admin.post("/api/admin/content/about", json={"id": "x"}).status_code == 400
+    assert admin.get("/api/admin/drafts").json() == []
@@ -0,0 +1,153 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from pymongo.errors import AutoReconnect
+
+import dedupe
+import server
+from contact_writer import ContactWriter
+from dedupe import Deduplicator, FingerprintIndex, fingerprint
+from memory_db import MemoryDatabase
+
+NOW = datetime(2025, 1, 1, 12, 0)
+SPAM = (
+    "Grow your business",
+    "Hi there, we help portfolio sites rank on the first page of Google. "
+    "Reply to this message or visit https://seo.example.com/offer?ref=123 for a free audit of your website today.",
+)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_normalization_ignores_case_spacing_punctuation_links_and_numbers():
+    variant = (
+        "GROW your   business!!",
+        SPAM[1].upper().replace("https://seo.example.com/offer?ref=123", "http://other.example.net/x?ref=999"),
+    )
+    assert fingerprint(*variant).exact == fingerprint(*SPAM).exact
+
+
+def test_near_duplicates_have_similar_signatures():
+    near = fingerprint(SPAM[0], SPAM[1].replace("Hi there,", "Hello friend,"))
+    other = fingerprint("Internship", "I enjoyed your projects and would love to talk about an internship next summer.")
+    signature = fingerprint(*SPAM).signature
+    assert dedupe.similarity(signature, near.signature) >= 0.7
+    assert dedupe.similarity(signature, other.signature) < 0.2
+    assert set(fingerprint(*SPAM).bands) & set(near.bands)
+    assert not set(fingerprint(*SPAM).bands) & set(other.bands)
+
+
+def test_short_messages_only_match_the_same_sender():
+    assert fingerprint("Hi", "Hello!", "a@example.com").signature is None
+    assert fingerprint("Hi", "Hello!", "a@example.com").exact != fingerprint("Hi", "Hello!", "b@example.com").exact
+    assert fingerprint("Hi", "Hello!", "a@example.com").exact == fingerprint("hi", "hello", "A@example.com").exact
+
+
+def test_index_finds_exact_and_near_matches_and_stays_bounded():
+    index = FingerprintIndex(max_entries=2)
+    fp = fingerprint(*SPAM)
+    index.add(fp, "m1", NOW + timedelta(hours=1))
+    assert index.lookup(fp, NOW) == dedupe.Duplicate("m1", 1.0)
+    near = fingerprint(SPAM[0], SPAM[1].replace("Hi there,", "Hello friend,"))
+    found = index.lookup(near, NOW)
+    assert found.message_id == "m1" and found.similarity >= 0.7
+    assert index.lookup(fp, NOW + timedelta(hours=2)) is None
+    assert len(index) == 0
+    for n in range(5):
+        index.add(fingerprint("x", f"message {'abcde'[n]}", "a@example.com"), f"m{n}", NOW + timedelta(hours=1))
+    assert len(index) == 2
+    assert sum(len(bucket) for bucket in index._bands.values()) == 0
+
+
+def test_deduplicator_records_first_message_and_flags_repeats():
+    deduplicator = Deduplicator(MemoryDatabase().contact_fingerprints)
+    fp = fingerprint(*SPAM)
+    assert run(deduplicator.check(fp, "m1", NOW)) is None
+    assert run(deduplicator.check(fp, "m2", NOW)) == dedupe.Duplicate("m1", 1.0)
+
+
+def test_workers_share_fingerprints_through_mongo():
+    collection = MemoryDatabase().contact_fingerprints
+    first, second = Deduplicator(collection), Deduplicator(collection)
+    assert run(first.check(fingerprint(*SPAM), "m1", NOW)) is None
+    assert run(second.check(fingerprint(*SPAM), "m2", NOW)) == dedupe.Duplicate("m1", 1.0)
+    near = fingerprint(SPAM[0], SPAM[1].replace("Hi there,", "Hello friend,"))
+    found = run(Deduplicator(collection).check(near, "m3", NOW))
+    assert found.message_id == "m1" and found.similarity >= 0.7
+    # Expired fingerprints are ignored even before the TTL monitor removes them
+    assert run(Deduplicator(collection).check(near, "m4", NOW + timedelta(days=8))) is None
+
+
+def test_database_errors_treat_messages_as_new():
+    class Broken:
+        def find(self, *args, **kwargs):
+            raise AutoReconnect("down")
+
+        async def update_one(self, *args, **kwargs):
+            raise AutoReconnect("down")
+
+    deduplicator = Deduplicator(Broken())
+    assert run(deduplicator.check(fingerprint(*SPAM), "m1", NOW)) is None
+    # Still caught by the in-memory index
+    assert run(deduplicator.check(fingerprint(*SPAM), "m2", NOW)).message_id == "m1"
+
+
+def test_released_fingerprints_are_forgotten():
+    collection = MemoryDatabase().contact_fingerprints
+    deduplicator = Deduplicator(collection)
+    fp = fingerprint(*SPAM)
+    assert run(deduplicator.check(fp, "m1", NOW)) is None
+    # Only the message that recorded it can release it
+    run(deduplicator.release(fp, "m2"))
+    assert run(deduplicator.check(fp, "m3", NOW)).message_id == "m1"
+    run(deduplicator.release(fp, "m1"))
+    assert len(deduplicator.index) == 0
+    assert run(Deduplicator(collection).check(fp, "m4", NOW)) is None
+
+
+@pytest.fixture
+def message():
+    return {"name": "Spammer", "email": "spam@example.com", "subject": SPAM[0], "message": SPAM[1]}
+
+
+def test_contact_endpoint_rejects_duplicates(monkeypatch, message):
+    monkeypatch.setattr(server, "DEDUPE_MODE", "reject")
+    monkeypatch.setattr(server, "contact_dedupe", Deduplicator(MemoryDatabase().contact_fingerprints))
+    with TestClient(server.app) as client:
+        assert client.post("/api/portfolio/contact", json=message).status_code == 200
+        response = client.post("/api/portfolio/contact", json=dict(message, name="Someone else"))
+    assert response.status_code == 409
+
+
+def test_contact_endpoint_merges_duplicates(monkeypatch, message):
+    db = MemoryDatabase()
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "DEDUPE_MODE", "merge")
+    monkeypatch.setattr(server, "contact_dedupe", Deduplicator(db.contact_fingerprints))
+    with TestClient(server.app) as client:
+        first = client.post("/api/portfolio/contact", json=message).json()
+        run(db.contact_messages.insert_one(dict(first)))
+        second = client.post("/api/portfolio/contact", json=message)
+    assert second.status_code == 200
+    assert second.json()["id"] == first["id"]
+    stored = run(db.contact_messages.find_one({"id": first["id"]}))
+    assert stored["duplicate_count"] == 1
+
+
+def test_retry_after_a_full_queue_is_not_a_duplicate(monkeypatch, tmp_path, message):
+    monkeypatch.setattr(server, "DEDUPE_MODE", "reject")
+    monkeypatch.setattr(server, "contact_dedupe", Deduplicator(MemoryDatabase().contact_fingerprints))
+    with TestClient(server.app) as client:
+        writer = ContactWriter(MemoryDatabase().contact_messages, tmp_path / "spill.jsonl",
+                               max_queue=1, enqueue_timeout=0.01)
+        monkeypatch.setattr(server, "contact_writer", writer)
+        writer.queue.put_nowait({"id": "filler"})
+        response = client.post("/api/portfolio/contact", json=message)
+        assert response.status_code == 503
+        writer.queue.get_nowait()
+        assert client.post("/api/portfolio/contact", json=message).status_code == 200
+        writer.queue.get_nowait()
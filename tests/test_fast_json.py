@@ -0,0 +1,71 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import fast_json
+import server
+
+
+@pytest.fixture
+def client():
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def restore_serializer():
+    name = fast_json.serializer_name
+    yield
+    fast_json.use(name)
+
+
+PAYLOAD = {
+    "id": "abc",
+    "name": "Zoë",
+    "timestamp": datetime(2025, 1, 2, 3, 4, 5, 678901),
+    "nested": [{"value": 1.5, "flag": True, "none": None}],
+}
+
+
+@pytest.mark.skipif(fast_json.orjson is None, reason="orjson not installed")
+def test_serializers_agree(restore_serializer):
+    fast_json.use("json")
+    stdlib = fast_json.dumps(PAYLOAD)
+    fast_json.use("orjson")
+    assert fast_json.dumps(PAYLOAD) == stdlib
+
+
+def test_models_are_encoded_without_jsonable_encoder():
+    message = server.ContactMessage.model_construct(
+        name="Ada", email="ada@example.com", subject="Hi", message="Hello"
+    )
+    encoded = fast_json.dumps(message)
+    assert encoded.startswith(b'{"id":"')
+    assert message.timestamp.isoformat().encode() in encoded
+
+
+def test_unknown_serializer_rejected(restore_serializer):
+    with pytest.raises(ValueError):
+        fast_json.use("yaml")
+
+
+def test_app_default_response_class(client):
+    assert server.app.router.default_response_class is fast_json.FastJSONResponse
+    assert client.get("/api/").json() == {"message": "Varshank Portfolio API"}
+
+
+def test_trusted_contact_response_matches_model(client):
+    response = client.post("/api/portfolio/contact", json={
+        "name": "Ada", "email": "ada@example.com", "subject": "Hi", "message": "Hello",
+    })
+    assert response.status_code == 200
+    message = server.ContactMessage(**response.json())
+    assert message.email == "ada@example.com"
+
+
+def test_contact_validation_still_applies(client):
+    response = client.post("/api/portfolio/contact", json={
+        "name": "Ada", "email": "not-an-email", "subject": "Hi", "message": "Hello",
+    })
+    assert response.status_code == 422
@@ -0,0 +1,100 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from http_cache import CachePolicy, etag_matches
+
+CACHED_PATHS = [
+    "/api/portfolio",
+    "/api/portfolio/personal-info",
+    "/api/portfolio/about",
+    "/api/portfolio/skills",
+    "/api/portfolio/experience",
+    "/api/portfolio/projects",
+]
+
+
+@pytest.fixture
+def client():
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+@pytest.mark.parametrize("path", CACHED_PATHS)
+def test_cached_routes_emit_validators(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.headers["etag"].startswith('"')
+    assert response.headers["cache-control"] == server.cached_routes.match(path).policy.header
+    assert client.get(path).headers["etag"] == response.headers["etag"]
+
+
+@pytest.mark.parametrize("path", CACHED_PATHS)
+def test_matching_if_none_match_returns_304(client, path):
+    etag = client.get(path).headers["etag"]
+    response = client.get(path, headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_304_carries_cors_headers(client):
+    etag = client.get("/api/portfolio").headers["etag"]
+    response = client.get("/api/portfolio", headers={"If-None-Match": etag, "Origin": "https://example.com"})
+    assert response.status_code == 304
+    assert response.headers["access-control-allow-origin"]
+
+
+def test_stale_etag_gets_full_response(client):
+    response = client.get("/api/portfolio/skills", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+    assert response.json()
+
+
+def test_etag_depends_on_sections_filter(client):
+    full = client.get("/api/portfolio").headers["etag"]
+    partial = client.get("/api/portfolio", params={"sections": "skills"}).headers["etag"]
+    assert full != partial
+    response = client.get("/api/portfolio", params={"sections": "skills"}, headers={"If-None-Match": full})
+    assert response.status_code == 200
+
+
+def test_unknown_sections_still_reach_handler(client):
+    response = client.get("/api/portfolio", params={"sections": "nope"}, headers={"If-None-Match": "*"})
+    assert response.status_code == 400
+
+
+def test_304_does_not_run_handler(client, monkeypatch):
+    etag = client.get("/api/portfolio/projects").headers["etag"]
+
+    def fail(request):
+        raise AssertionError("handler should not run")
+
+    monkeypatch.setattr(server.cached_routes, "respond", fail)
+    response = client.get("/api/portfolio/projects", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_per_route_policy(client):
+    original = server.cached_routes.match("/api/portfolio/about").policy
+    server.cached_routes.set_policy("/api/portfolio/about", CachePolicy(max_age=5, stale_while_revalidate=30))
+    try:
+        response = client.get("/api/portfolio/about")
+        assert response.headers["cache-control"] == "public, max-age=5, stale-while-revalidate=30"
+        assert client.get("/api/portfolio/skills").headers["cache-control"] == original.header
+    finally:
+        server.cached_routes.set_policy("/api/portfolio/about", original)
+
+
+def test_policy_from_env(monkeypatch):
+    monkeypatch.setenv("CACHE_MAX_AGE", "120")
+    monkeypatch.setenv("CACHE_STALE_WHILE_REVALIDATE", "3600")
+    assert CachePolicy.from_env().header == "public, max-age=120, stale-while-revalidate=3600"
+
+
+def test_etag_matches():
+    assert etag_matches('"a"', '"a"')
+    assert etag_matches('W/"a"', '"a"')
+    assert etag_matches('"b", "a"', '"a"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches('"b"', '"a"')
@@ -0,0 +1,122 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import inbox
+import indexes
+import pagination
+import server
+from memory_db import MemoryDatabase
+
+START = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def message(n):
+    return {
+        "id": f"m{n:03d}",
+        "name": "Ada",
+        "email": "ada@example.com",
+        "subject": f"Hello {n}",
+        "message": "Hi",
+        "timestamp": START + timedelta(seconds=n),
+    }
+
+
+def ids(frames):
+    return [json.loads(frame.split(b"data: ")[1])["id"] for frame in frames if b"data: " in frame]
+
+
+async def take(events, count):
+    return [await asyncio.wait_for(events.__anext__(), 1) for _ in range(count)]
+
+
+def test_live_events_reach_every_subscriber():
+    async def scenario():
+        broadcaster = inbox.Broadcaster()
+        first = inbox.stream(broadcaster, MemoryDatabase().contact_messages, None)
+        second = inbox.stream(broadcaster, MemoryDatabase().contact_messages, None)
+        assert await first.__anext__() == b"retry: 3000\n\n"
+        await second.__anext__()
+        broadcaster.publish(message(1))
+        broadcaster.publish(message(2))
+        frames = await take(first, 2)
+        assert ids(frames) == ["m001", "m002"]
+        assert frames[0].startswith(b"id: " + pagination.cursor_for(message(1)).encode())
+        assert await take(second, 2) == frames
+        await first.aclose()
+        await second.aclose()
+        assert not broadcaster.subscribers
+
+    asyncio.run(scenario())
+
+
+def test_slow_subscribers_are_dropped():
+    async def scenario():
+        broadcaster = inbox.Broadcaster(max_buffer=3)
+        slow = inbox.stream(broadcaster, MemoryDatabase().contact_messages, None)
+        await slow.__anext__()
+        for n in range(5):
+            broadcaster.publish(message(n))
+        assert not broadcaster.subscribers
+        with pytest.raises(StopAsyncIteration):
+            await slow.__anext__()
+
+    asyncio.run(scenario())
+
+
+def test_resume_replays_stored_then_queued_messages_once():
+    async def scenario():
+        db = MemoryDatabase()
+        await indexes.registry.ensure(db)
+        broadcaster = inbox.Broadcaster(history=10)
+        # 1-4 are stored; 4-5 are recent events, 5 still waiting in the writer
+        await db.contact_messages.insert_many([message(n) for n in range(1, 5)])
+        for n in (4, 5):
+            broadcaster.publish(message(n))
+        events = inbox.stream(broadcaster, db.contact_messages, pagination.cursor_for(message(2)), heartbeat=0.01)
+        await events.__anext__()
+        assert ids(await take(events, 3)) == ["m003", "m004", "m005"]
+        broadcaster.publish(message(6))
+        assert ids(await take(events, 1)) == ["m006"]
+        assert await take(events, 1) == [b": keep-alive\n\n"]
+        await events.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_subscriber_limit():
+    broadcaster = inbox.Broadcaster(max_subscribers=1)
+    broadcaster.subscribe()
+    with pytest.raises(inbox.TooManySubscribers):
+        broadcaster.subscribe()
+
+
+def test_accepted_messages_are_published(monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+    with TestClient(server.app, headers={"Authorization": "Bearer secret"}) as client:
+        subscription = server.inbox_broadcaster.subscribe()
+        try:
+            accepted = client.post("/api/portfolio/contact", json={
+                "name": "Ada", "email": "ada@example.com", "subject": "Inbox", "message": "Live",
+            }).json()
+            event = subscription.buffer.popleft()
+            assert event.id == accepted["id"]
+            assert json.loads(event.frame.split(b"data: ")[1])["subject"] == "Inbox"
+        finally:
+            server.inbox_broadcaster.unsubscribe(subscription)
+        response = client.get("/api/portfolio/contact/messages/stream", headers={"Last-Event-ID": "garbage"})
+        assert response.status_code == 400
+
+
+def test_stream_requires_the_admin_token(monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+    with TestClient(server.app) as client:
+        assert client.get("/api/portfolio/contact/messages/stream").status_code == 401
+        assert client.get("/api/portfolio/contact/messages/stream",
+                          headers={"Authorization": "Bearer wrong"}).status_code == 401
+        assert not server.inbox_broadcaster.subscribers
+        monkeypatch.setattr(server, "ADMIN_TOKEN", "")
+        assert client.get("/api/portfolio/contact/messages/stream").status_code == 403
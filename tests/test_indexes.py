@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+import indexes
+import server
+from indexes import IndexRegistry
+from memory_db import MemoryDatabase
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_ensure_creates_declared_indexes_and_is_idempotent():
+    db = MemoryDatabase()
+    assert run(indexes.registry.ensure(db)) == []
+    assert run(indexes.registry.ensure(db)) == []
+    info = run(db.contact_messages.index_information())
+    assert info["timestamp_desc"]["key"] == [("timestamp", -1), ("id", -1)]
+    assert info["id_unique"]["unique"] is True
+    assert info["email_timestamp"]["key"] == [("email", 1), ("timestamp", -1)]
+
+
+def test_unique_id_index_rejects_duplicates():
+    db = MemoryDatabase()
+    run(indexes.registry.ensure(db))
+    run(db.contact_messages.insert_one({"id": "a"}))
+    with pytest.raises(DuplicateKeyError):
+        run(db.contact_messages.insert_one({"id": "a"}))
+
+
+def test_check_reports_missing_mismatched_and_undeclared():
+    db = MemoryDatabase()
+    registry = IndexRegistry()
+    registry.add("things", [("a", 1)], "a_asc")
+    registry.add("things", [("b", 1)], "b_unique", unique=True)
+    registry.add("things", [("c", 1)], "c_asc")
+    run(db.things.create_index([("b", 1)], name="b_unique"))
+    run(db.things.create_index([("d", 1)], name="d_asc"))
+    run(registry.ensure(db))  # a_asc is created; b_unique conflicts
+    run(db.things.drop_index("c_asc"))
+
+    report = run(registry.check(db))["collections"]["things"]
+    assert report["missing"] == ["c_asc"]
+    assert report["mismatched"] == [{"name": "b_unique", "keys": (("b", 1),), "options": {"unique": None}}]
+    assert report["undeclared"] == ["d_asc"]
+    # The stand-in has no $indexStats; the report says so instead of guessing
+    assert report["unused"] is None and "unused_error" in report
+
+
+def test_check_summarizes_query_plans():
+    report = run(indexes.registry.check(MemoryDatabase()))
+    assert [query["name"] for query in report["queries"]] == [
+        "latest messages", "next page", "messages from sender"
+    ]
+    assert all("error" in query for query in report["queries"])
+
+
+def test_plan_summary_of_explain_output():
+    plan = {"stage": "LIMIT", "inputStage": {"stage": "FETCH", "inputStage": {
+        "stage": "IXSCAN", "indexName": "timestamp_desc"}}}
+    assert indexes._plan_stages(plan) == ["LIMIT", "FETCH", "IXSCAN(timestamp_desc)"]
+
+
+def test_app_startup_creates_indexes():
+    from fastapi.testclient import TestClient
+
+    with TestClient(server.app) as client:
+        info = client.portal.call(server.db.contact_messages.index_information)
+    assert {"timestamp_desc", "id_unique", "email_timestamp"} <= set(info)
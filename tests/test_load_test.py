@@ -0,0 +1,45 @@
+import asyncio
+import importlib.util
+from argparse import Namespace
+from pathlib import Path
+
+import server
+
+_spec = importlib.util.spec_from_file_location(
+    "load_test", Path(__file__).resolve().parent.parent / "backend" / "benchmarks" / "load_test.py"
+)
+load_test = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(load_test)
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+    assert load_test.percentile(values, 0.50) == 50
+    assert load_test.percentile(values, 0.95) == 95
+    assert load_test.percentile(values, 0.99) == 99
+    assert load_test.percentile([7], 0.99) == 7
+    assert load_test.percentile([], 0.5) == 0.0
+
+
+def test_asgi_run_reports_every_selected_endpoint():
+    endpoints = [e for e in load_test.ENDPOINTS if e.name in ("root", "portfolio", "contact_submit")]
+    args = Namespace(requests=20, concurrency=4, warmup=2, alloc_requests=3)
+    results = asyncio.run(load_test.run_asgi(server.app, endpoints, args))
+    assert list(results) == ["root", "portfolio", "contact_submit"]
+    for result in results.values():
+        assert result["requests"] == 20
+        assert result["errors"] == 0
+        assert result["rps"] > 0
+        assert 0 < result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+        assert result["alloc_peak_kib"] > 0
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    def report(rps, p95):
+        return {"results": {"asgi": {"root": {"rps": rps, "p95_ms": p95}}}}
+
+    assert load_test.compare(report(1000, 1.0), report(950, 1.05), threshold=10) == []
+    regressions = load_test.compare(report(1000, 1.0), report(800, 1.5), threshold=10)
+    assert regressions == ["asgi root: throughput -20.0%", "asgi root: p95 latency +50.0%"]
+    # Endpoints missing from the baseline are not compared
+    assert load_test.compare({"results": {}}, report(1, 100), threshold=10) == []
@@ -0,0 +1,94 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import metrics
+import server
+
+
+@pytest.fixture
+def client():
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+def test_render_uses_prometheus_text_format():
+    registry = metrics.Registry()
+    requests = registry.counter("requests_total", "Requests", ("route",))
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    registry.gauge("depth", "Queue depth", function=lambda: 3)
+    requests.inc('/a"b')
+    requests.inc('/a"b', amount=2)
+    for value in (0.05, 0.1, 0.5, 5):
+        latency.observe(value)
+    lines = registry.render().decode().splitlines()
+    assert lines[:3] == ["# HELP requests_total Requests", "# TYPE requests_total counter",
+                         'requests_total{route="/a\\"b"} 3']
+    assert 'latency_seconds_bucket{le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{le="1"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_sum 5.65" in lines
+    assert "latency_seconds_count 4" in lines
+    assert "# TYPE depth gauge" in lines and "depth 3" in lines
+
+
+def test_duplicate_metric_names_are_rejected():
+    registry = metrics.Registry()
+    registry.counter("requests_total", "Requests")
+    with pytest.raises(ValueError):
+        registry.gauge("requests_total", "Requests")
+
+
+def test_requests_are_counted_per_route_template(client):
+    requests = server.http_metrics.requests
+    latency = server.http_metrics.latency
+    route = "/api/portfolio/skills"
+    before = requests.value("GET", route, "200")
+    etag = client.get(route).headers["etag"]
+    assert client.get(route, headers={"If-None-Match": etag}).status_code == 304
+    assert requests.value("GET", route, "200") == before + 1
+    # Answered by ConditionalGetMiddleware, before routing, but still labelled
+    assert requests.value("GET", route, "304") >= 1
+    assert latency.count("GET", route) >= 2
+    client.get("/api/no-such-route")
+    assert requests.value("GET", "unmatched", "404") >= 1
+    assert server.http_metrics.in_flight.value() == 0
+
+
+def test_metrics_endpoint_exposes_requests_and_queue_depth(client):
+    client.get("/api/portfolio/about")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == metrics.CONTENT_TYPE
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/api/portfolio/about",status="200"}' in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/portfolio/about",le="+Inf"}' in body
+    assert "contact_queue_depth 0" in body
+    assert "# TYPE mongodb_command_duration_seconds histogram" in body
+
+
+def test_command_listener_times_commands_and_counts_failures():
+    listener = metrics.CommandMetrics(metrics.Registry())
+    listener.succeeded(SimpleNamespace(command_name="find", duration_micros=1500))
+    listener.failed(SimpleNamespace(command_name="insert", duration_micros=200))
+    assert listener.duration.count("find") == 1
+    assert listener.duration.count("insert") == 1
+    assert listener.failures.value("insert") == 1
+    assert listener.failures.value("find") == 0
+
+
+def test_preflights_to_parameterised_paths_are_not_cached(client):
+    middleware = server.app.middleware_stack
+    while not isinstance(middleware, metrics.MetricsMiddleware):
+        middleware = middleware.app
+    requests = server.http_metrics.requests
+    route = "/api/admin/content/{section}/{item_id}"
+    before = requests.value("OPTIONS", route, "200")
+    cached = len(middleware._route_labels)
+    headers = {"Origin": "https://example.com", "Access-Control-Request-Method": "PUT"}
+    for n in range(300):
+        assert client.options(f"/api/admin/content/projects/{uuid.uuid4()}", headers=headers).status_code == 200
+    assert requests.value("OPTIONS", route, "200") == before + 300
+    assert len(middleware._route_labels) == cached
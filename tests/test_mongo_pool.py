@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from pymongo import MongoClient
+from pymongo.errors import ServerSelectionTimeoutError
+
+import metrics
+import mongo_pool
+import server
+from memory_db import MemoryDatabase
+
+
+class SlowDatabase:
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.pings = 0
+
+    async def command(self, name):
+        self.pings += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {"ok": 1.0}
+
+
+def test_settings_from_env(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "20")
+    monkeypatch.setenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "500")
+    monkeypatch.setenv("MONGO_RETRY_WRITES", "0")
+    settings = mongo_pool.PoolSettings.from_env()
+    assert settings.max_pool_size == 20
+    assert settings.wait_queue_timeout_ms == 500
+    assert settings.retry_writes is False
+    assert settings.min_pool_size == mongo_pool.PoolSettings().min_pool_size
+    # The options are valid client options
+    client = MongoClient("mongodb://localhost", connect=False, **settings.client_options())
+    assert client.options.pool_options.max_pool_size == 20
+    assert client.options.retry_writes is False
+    client.close()
+
+
+def test_monitor_counts_connections():
+    registry = metrics.Registry()
+    monitor = mongo_pool.PoolMonitor(4, registry)
+    event = SimpleNamespace(address=("localhost", 27017))
+    for _ in range(3):
+        monitor.connection_created(event)
+        monitor.connection_check_out_started(event)
+        monitor.connection_checked_out(event)
+    monitor.connection_check_out_started(event)
+    monitor.connection_checked_in(event)
+    monitor.connection_check_out_started(event)
+    monitor.connection_check_out_failed(SimpleNamespace(address=event.address, reason="timeout"))
+    assert monitor.snapshot() == {
+        "open": 3, "in_use": 2, "waiting": 1, "max": 4, "saturation": 0.5, "checkout_failures": 1,
+    }
+    assert b"mongodb_pool_in_use 2" in registry.render()
+
+
+def test_readiness_reports_unreachable_and_saturated():
+    monitor = mongo_pool.PoolMonitor(2)
+    ready, details = asyncio.run(mongo_pool.readiness(SlowDatabase(), monitor))
+    assert ready and details["status"] == "ready" and details["database"]["ping_ms"] is not None
+
+    ready, details = asyncio.run(mongo_pool.readiness(SlowDatabase(error=ServerSelectionTimeoutError("down")), monitor))
+    assert not ready and details["reasons"] == ["database unreachable: ServerSelectionTimeoutError"]
+
+    ready, details = asyncio.run(mongo_pool.readiness(SlowDatabase(delay=1.0), monitor, timeout=0.05))
+    assert not ready and details["reasons"] == ["database unreachable: TimeoutError"]
+
+    monitor.in_use = 2
+    ready, details = asyncio.run(mongo_pool.readiness(SlowDatabase(), monitor))
+    assert not ready and details["reasons"] == ["connection pool saturated (2/2 in use)"]
+
+
+def test_warm_up_pings_concurrently_and_tolerates_failures():
+    db = SlowDatabase(delay=0.05)
+    started = asyncio.run(asyncio.wait_for(mongo_pool.warm_up(db, 10), 0.4))
+    assert (started, db.pings) == (10, 10)
+    assert asyncio.run(mongo_pool.warm_up(SlowDatabase(error=ServerSelectionTimeoutError("down")), 3)) == 0
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "db", MemoryDatabase())
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+def test_ready_endpoint(client, monkeypatch):
+    response = client.get("/api/health/ready")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-store"
+    assert response.json()["status"] == "ready"
+
+    monkeypatch.setattr(server, "db", SlowDatabase(error=ServerSelectionTimeoutError("down")))
+    response = client.get("/api/health/ready")
+    assert response.status_code == 503
+    assert response.json()["reasons"] == ["database unreachable: ServerSelectionTimeoutError"]
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_starts_with_the_built_in_content_when_mongodb_is_unreachable(tmp_path):
+    port = free_port()
+    env = dict(os.environ, MONGO_URL=f"mongodb://127.0.0.1:{free_port()}", DB_NAME="unreachable",
+               MONGO_SERVER_SELECTION_TIMEOUT_MS="200", MONGO_MIN_POOL_SIZE="1", METRICS_ENABLED="0",
+               CONTACT_SPILL_PATH=str(tmp_path / "spill.jsonl"))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=Path(server.__file__).parent, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            assert process.poll() is None and time.monotonic() < deadline
+            try:
+                status, portfolio = get(f"http://127.0.0.1:{port}/api/portfolio")
+                break
+            except OSError:
+                time.sleep(0.2)
+        assert status == 200
+        assert portfolio["personal_info"] == server.default_personal_info().dict()
+        status, details = get(f"http://127.0.0.1:{port}/api/health/ready")
+        assert status == 503
+        assert details["reasons"] == [
+            "startup incomplete: database setup not finished",
+            "database unreachable: ServerSelectionTimeoutError",
+        ]
+    finally:
+        process.terminate()
+        assert process.wait(30) == 0
+
+
+def test_lazy_client_builds_on_first_use():
+    built = []
+
+    def factory():
+        built.append(True)
+        return {"portfolio": MemoryDatabase()}
+
+    client = mongo_pool.LazyClient(factory)
+    db = client["portfolio"]
+    messages = db.contact_messages
+    client.close()
+    assert not built and not client.built
+
+    assert asyncio.run(db.command("ping")) == {"ok": 1.0}
+    asyncio.run(messages.insert_one({"id": "a"}))
+    assert asyncio.run(db["contact_messages"].count_documents({})) == 1
+    assert messages.name == "contact_messages"
+    assert built == [True] and client.built
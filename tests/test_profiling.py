@@ -0,0 +1,98 @@
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+import profiling
+import server
+
+
+def make_app(profiler):
+    router = APIRouter(route_class=profiling.ProfiledRoute)
+
+    @router.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        with profiling.stage("db"):
+            pass
+        return {"id": item_id}
+
+    @router.get("/sync")
+    def get_sync():
+        return {"sync": True}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(profiling.ProfilingMiddleware, profiler=profiler)
+    return app
+
+
+def stacks(path):
+    return {line.rsplit(" ", 1)[0]: int(line.rsplit(" ", 1)[1]) for line in path.read_text().splitlines()}
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    return profiling.Profiler(tmp_path / "profiles", max_files=3, token="secret")
+
+
+def test_unprofiled_requests_write_nothing(profiler):
+    with TestClient(make_app(profiler)) as client:
+        response = client.get("/items/1")
+    assert response.json() == {"id": 1}
+    assert "x-profile-id" not in response.headers
+    assert not profiler.directory.exists()
+
+
+def test_header_profiles_request_stages(profiler):
+    with TestClient(make_app(profiler)) as client:
+        response = client.get("/items/1", headers={"X-Profile": "secret"})
+    assert response.json() == {"id": 1}
+    name = response.headers["x-profile-id"]
+    wall = stacks(profiler.directory / f"{name}.wall.folded")
+    assert (profiler.directory / f"{name}.cpu.folded").exists()
+    assert {"GET /items/{item_id};routing", "GET /items/{item_id};validation",
+            "GET /items/{item_id};serialization"} <= set(wall)
+    assert "GET /items/{item_id};handler;db" in wall or "GET /items/{item_id};handler" in wall
+    assert all(micros > 0 for micros in wall.values())
+
+
+def test_sync_endpoints_are_profiled(profiler):
+    with TestClient(make_app(profiler)) as client:
+        response = client.get("/sync", headers={"X-Profile": "secret"})
+    assert response.json() == {"sync": True}
+    assert "GET /sync;routing" in stacks(profiler.directory / f"{response.headers['x-profile-id']}.wall.folded")
+
+
+def test_token_and_sample_rate_select_requests(tmp_path):
+    profiler = profiling.Profiler(tmp_path, token="secret")
+    assert not profiler.wants([(b"x-profile", b"1")])
+    assert profiler.wants([(b"x-profile", b"secret")])
+    # Without a token, nobody can ask for a profile
+    assert not profiling.Profiler(tmp_path).wants([(b"x-profile", b"1")])
+    assert profiling.Profiler(tmp_path, sample_rate=1.0).wants([])
+    assert not profiling.Profiler(tmp_path, sample_rate=0.0).wants([])
+
+
+def test_only_newest_profiles_are_kept(profiler):
+    with TestClient(make_app(profiler)) as client:
+        names = [client.get("/items/1", headers={"X-Profile": "secret"}).headers["x-profile-id"] for _ in range(5)]
+    kept = sorted(path.name for path in profiler.directory.iterdir())
+    assert kept == sorted(f"{name}.{kind}.folded" for name in names[-3:] for kind in ("wall", "cpu"))
+
+
+def test_stage_is_a_no_op_without_a_profile():
+    assert profiling.current() is None
+    with profiling.stage("db"):
+        assert profiling.current() is None
+
+
+def test_server_handlers_mark_nested_stages(tmp_path):
+    profiler = profiling.Profiler(tmp_path, token="secret")
+    with TestClient(profiling.ProfilingMiddleware(server.app, profiler)) as client:
+        response = client.post(
+            "/api/portfolio/contact", headers={"X-Profile": "secret"},
+            json={"name": "Ada", "email": "ada@example.com", "subject": "Hi", "message": "Hello"},
+        )
+    assert response.status_code == 200
+    wall = stacks(tmp_path / f"{response.headers['x-profile-id']}.wall.folded")
+    assert "POST /api/portfolio/contact;handler;queue" in wall
+    assert "POST /api/portfolio/contact;handler;serialization" in wall
@@ -0,0 +1,147 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from pymongo.errors import ServerSelectionTimeoutError
+
+import ratelimit
+import server
+from memory_db import MemoryDatabase
+from ratelimit import MemoryBackend, MongoBackend, RateLimit, RateLimited, RateLimiter
+
+BURST = RateLimit(rate=1.0, burst=3)
+HOURLY = RateLimit(rate=0, burst=0, window=3600, window_limit=4)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def take(backend, limit, now, key="ip:1.2.3.4"):
+    return run(backend.take(key, limit, now))
+
+
+@pytest.mark.parametrize("backend_factory", [MemoryBackend, lambda: MongoBackend(MemoryDatabase().rate_limits)])
+def test_token_bucket_allows_burst_then_refills(backend_factory):
+    backend = backend_factory()
+    assert [take(backend, BURST, 1000.0).allowed for _ in range(3)] == [True, True, True]
+    denied = take(backend, BURST, 1000.0)
+    assert not denied.allowed
+    assert denied.retry_after == pytest.approx(1.0)
+    assert take(backend, BURST, 1001.0).allowed
+    assert not take(backend, BURST, 1001.0).allowed
+
+
+@pytest.mark.parametrize("backend_factory", [MemoryBackend, lambda: MongoBackend(MemoryDatabase().rate_limits)])
+def test_sliding_window_weights_the_previous_window(backend_factory):
+    backend = backend_factory()
+    start = 3600.0 * 10
+    assert all(take(backend, HOURLY, start + 60).allowed for _ in range(4))
+    full = take(backend, HOURLY, start + 120)
+    assert not full.allowed
+    assert full.retry_after == pytest.approx(3600 - 120)
+    # A quarter into the next window, 3 of the previous 4 still count
+    assert take(backend, HOURLY, start + 3600 + 900).allowed
+    late = take(backend, HOURLY, start + 3600 + 900)
+    assert not late.allowed
+    assert late.retry_after == pytest.approx(900)
+    # Two windows later the history is gone
+    assert take(backend, HOURLY, start + 3 * 3600).allowed
+
+
+def test_memory_backend_is_a_bounded_lru():
+    backend = MemoryBackend(max_keys=2)
+    take(backend, BURST, 0.0, "ip:a")
+    take(backend, BURST, 0.0, "ip:b")
+    take(backend, BURST, 0.0, "ip:a")
+    take(backend, BURST, 0.0, "ip:c")
+    assert len(backend) == 2
+    assert list(backend._buckets) == ["ip:a", "ip:c"]
+
+
+def test_mongo_backend_shares_buckets_between_workers():
+    collection = MemoryDatabase().rate_limits
+    workers = [MongoBackend(collection), MongoBackend(collection)]
+    results = [take(workers[n % 2], BURST, 50.0).allowed for n in range(4)]
+    assert results == [True, True, True, False]
+    doc = run(collection.find_one({"_id": "ip:1.2.3.4"}))
+    assert doc["version"] == 3
+    assert doc["expires_at"] is not None
+
+
+def test_mongo_backend_retries_lost_updates():
+    collection = MemoryDatabase().rate_limits
+    backend = MongoBackend(collection)
+    take(backend, BURST, 0.0)
+    original_find_one = collection.find_one
+    calls = []
+
+    async def racing_find_one(filter, *args, **kwargs):
+        doc = await original_find_one(filter, *args, **kwargs)
+        if not calls:
+            # Another worker updates the bucket between our read and write
+            await collection.update_one(filter, {"$inc": {"version": 1, "current": 1}})
+        calls.append(filter)
+        return doc
+
+    collection.find_one = racing_find_one
+    assert take(backend, BURST, 0.0).allowed
+    assert len(calls) == 2
+
+
+def test_limiter_checks_keys_in_order_and_fails_open():
+    limiter = RateLimiter(MemoryBackend(), {"ip": BURST, "email": RateLimit(rate=1.0, burst=1)}, clock=lambda: 0.0)
+    run(limiter.check(ip="1.2.3.4", email="a@example.com"))
+    with pytest.raises(RateLimited) as excinfo:
+        run(limiter.check(ip="1.2.3.4", email="a@example.com"))
+    assert excinfo.value.limit == "email"
+    run(limiter.check(ip="1.2.3.4", email=None))
+
+    class BrokenBackend:
+        async def take(self, key, limit, now):
+            raise ServerSelectionTimeoutError("no servers")
+
+    run(RateLimiter(BrokenBackend(), {"ip": BURST}).check(ip="1.2.3.4"))
+
+
+@pytest.mark.parametrize("backend_factory", [MemoryBackend, lambda: MongoBackend(MemoryDatabase().rate_limits)])
+def test_rejected_requests_consume_no_earlier_key(backend_factory):
+    limits = {"ip": RateLimit(rate=1.0, burst=2, window=3600, window_limit=2), "email": RateLimit(rate=1.0, burst=1)}
+    limiter = RateLimiter(backend_factory(), limits, clock=lambda: 0.0)
+    run(limiter.check(ip="1.2.3.4", email="a@example.com"))
+    for _ in range(3):
+        with pytest.raises(RateLimited) as excinfo:
+            run(limiter.check(ip="1.2.3.4", email="a@example.com"))
+        assert excinfo.value.limit == "email"
+    # The rejections left the IP's second token, and its window, alone
+    run(limiter.check(ip="1.2.3.4", email="b@example.com"))
+    with pytest.raises(RateLimited) as excinfo:
+        run(limiter.check(ip="1.2.3.4", email="c@example.com"))
+    assert excinfo.value.limit == "ip"
+
+
+def test_client_ip_only_trusts_forwarded_for_entries_added_by_proxies():
+    scope = {"client": ("10.0.0.2", 5000), "headers": [(b"x-forwarded-for", b"198.51.100.9, 203.0.113.7, 10.0.0.1")]}
+    assert ratelimit.client_ip(scope) == "10.0.0.2"
+    # The leftmost entry is whatever the client sent; each proxy appends one
+    assert ratelimit.client_ip(scope, trusted_hops=1) == "10.0.0.1"
+    assert ratelimit.client_ip(scope, trusted_hops=2) == "203.0.113.7"
+    assert ratelimit.client_ip(scope, trusted_hops=5) == "198.51.100.9"
+    split = {"client": ("10.0.0.2", 5000), "headers": [(b"x-forwarded-for", b"198.51.100.9"),
+                                                        (b"x-forwarded-for", b"203.0.113.7")]}
+    assert ratelimit.client_ip(split, trusted_hops=1) == "203.0.113.7"
+    assert ratelimit.client_ip({"client": ("10.0.0.2", 5000), "headers": []}, trusted_hops=1) == "10.0.0.2"
+    assert ratelimit.client_ip({"headers": []}) is None
+
+
+def test_contact_endpoint_returns_429_with_retry_after(monkeypatch):
+    limiter = RateLimiter(MemoryBackend(), {"ip": RateLimit(rate=1 / 60, burst=2), "email": BURST})
+    monkeypatch.setattr(server, "contact_limiter", limiter)
+    message = {"name": "Ada", "email": "ada@example.com", "subject": "Hi", "message": "Hello"}
+    with TestClient(server.app) as client:
+        before = server.rate_limited.value("ip")
+        assert [client.post("/api/portfolio/contact", json=message).status_code for _ in range(2)] == [200, 200]
+        response = client.post("/api/portfolio/contact", json=message)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "60"
+    assert server.rate_limited.value("ip") == before + 1
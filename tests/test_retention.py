@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import retention
+import server
+from memory_db import MemoryDatabase
+
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+
+
+def test_archiver_moves_old_messages_in_compressed_batches(make_messages):
+    async def scenario():
+        db = MemoryDatabase()
+        await db.contact_messages.insert_many(make_messages(30, NOW - timedelta(days=100)))
+        await db.contact_messages.insert_one(dict(make_messages(1, NOW - timedelta(days=1))[0], id="recent"))
+        archiver = retention.Archiver(db.contact_messages, db.contact_messages_archive,
+                                      archive_after=timedelta(days=90), batch_size=12)
+        moved = await archiver.run_once(NOW)
+        again = await archiver.run_once(NOW)
+        live = await db.contact_messages.find({}, {"_id": 0}).to_list(None)
+        batches = await db.contact_messages_archive.find({}).sort("oldest", 1).to_list(None)
+        return moved, again, live, batches
+
+    moved, again, live, batches = asyncio.run(scenario())
+    assert (moved, again) == (30, 0)
+    assert [msg["id"] for msg in live] == ["recent"]
+    assert [batch["count"] for batch in batches] == [12, 12, 6]
+    rows = [row for batch in batches for row in retention.decompress_rows(batch["rows"])]
+    assert rows == make_messages(30, NOW - timedelta(days=100))
+    assert batches[0]["oldest"] == rows[0]["timestamp"] and batches[0]["newest"] == rows[11]["timestamp"]
+
+
+def test_interrupted_batch_is_not_archived_twice(make_messages):
+    async def scenario():
+        db = MemoryDatabase()
+        messages = make_messages(5, NOW - timedelta(days=100))
+        await db.contact_messages.insert_many(messages)
+        # A previous run stored the batch but died before deleting the rows
+        await db.contact_messages_archive.insert_one({"_id": retention.batch_id(messages), "count": 5})
+        archiver = retention.Archiver(db.contact_messages, db.contact_messages_archive,
+                                      archive_after=timedelta(days=90))
+        moved = await archiver.run_once(NOW)
+        return moved, await db.contact_messages.count_documents({}), await db.contact_messages_archive.count_documents({})
+
+    assert asyncio.run(scenario()) == (5, 0, 1)
+
+
+def test_ensure_ttl_creates_updates_and_drops():
+    async def scenario():
+        collection = MemoryDatabase().contact_messages
+        seen = []
+        for seconds in (3600, 3600, 7200, 0):
+            await retention.ensure_ttl(collection, "timestamp", "timestamp_ttl", seconds)
+            seen.append((await collection.index_information()).get("timestamp_ttl"))
+        return seen
+
+    created, unchanged, updated, dropped = asyncio.run(scenario())
+    assert created == {"key": [("timestamp", 1)], "expireAfterSeconds": 3600}
+    assert unchanged == created
+    assert updated["expireAfterSeconds"] == 7200
+    assert dropped is None
+
+
+def test_archived_page_follows_keyset_order(make_messages):
+    async def scenario():
+        db = MemoryDatabase()
+        await db.contact_messages.insert_many(make_messages(25, NOW - timedelta(days=100)))
+        await retention.Archiver(db.contact_messages, db.contact_messages_archive,
+                                 archive_after=timedelta(days=90), batch_size=4).run_once(NOW)
+        rows = retention.ArchivedRows(db.contact_messages_archive)
+        pages, after = [], None
+        while True:
+            page = await rows.page(after, 7)
+            if not page:
+                return pages
+            pages.append([row["id"] for row in page])
+            after = (page[-1]["timestamp"], page[-1]["id"])
+
+    pages = asyncio.run(scenario())
+    assert [len(page) for page in pages] == [7, 7, 7, 4]
+    assert [id for page in pages for id in page] == [f"msg-{n:04d}" for n in reversed(range(25))]
+
+
+@pytest.fixture
+def client(db, make_client, make_messages, monkeypatch):
+    monkeypatch.setattr(server, "archived_rows", retention.ArchivedRows(db.contact_messages_archive))
+    archiver = retention.Archiver(db.contact_messages, db.contact_messages_archive,
+                                  archive_after=timedelta(days=90), batch_size=5)
+    test_client = make_client(make_messages(20, NOW - timedelta(days=100)) + [
+        dict(msg, id=f"new-{n}") for n, msg in enumerate(make_messages(3, NOW - timedelta(days=1)))
+    ])
+    test_client.portal.call(archiver.run_once, NOW)
+    return test_client
+
+
+def test_listing_includes_archived_messages_on_request(client):
+    live = client.get("/api/portfolio/contact/messages").json()
+    assert [msg["id"] for msg in live] == ["new-2", "new-1", "new-0"]
+
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 6, "include_archived": "true", "fields": "id,subject"}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/portfolio/contact/messages", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert all(set(msg) == {"id", "subject"} for msg in page)
+        ids += [msg["id"] for msg in page]
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert ids == ["new-2", "new-1", "new-0"] + [f"msg-{n:04d}" for n in reversed(range(20))]
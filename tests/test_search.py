@@ -0,0 +1,147 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import indexes
+import text_search
+from memory_db import MemoryDatabase
+
+BASE = datetime(2025, 1, 1, 12, 0, 0)
+
+MESSAGES = [
+    ("Ana", "Payment question", "Hi, I sent the payment for the invoice last week."),
+    ("Ben", "Portfolio feedback", "Loved the portfolio. The payments page was confusing though."),
+    ("Cleo", "Hiring", "We are hiring a backend engineer, would you be interested?"),
+    ("Dan", "Invoice", "Could you resend the invoice? The first one had the wrong address."),
+    ("Payment Team", "Reminder", "This is a reminder about your subscription."),
+]
+
+
+@pytest.fixture
+def messages(make_messages):
+    docs = make_messages(len(MESSAGES), start=BASE, step=timedelta(minutes=1), id="msg-{n}")
+    return [
+        dict(doc, name=name, subject=subject, message=message)
+        for doc, (name, subject, message) in zip(docs, MESSAGES)
+    ]
+
+
+def test_tokenize_stems_and_drops_stop_words():
+    assert text_search.tokenize("The Payments were designed, designing") == ["payment", "design", "design"]
+    assert text_search.stem("messages") == text_search.stem("message")
+    assert text_search.stem("replies") == "reply"
+    assert text_search.stem("class") == "class"
+
+
+def test_parse_phrases_and_negation():
+    query = text_search.parse('invoice "wrong address" -payments')
+    assert query.terms == ("invoic", "wrong", "address")
+    assert query.phrases == ("wrong address",)
+    assert query.excluded == ("payment",)
+
+
+def test_text_index_ranks_weighted_fields_first(messages):
+    index = text_search.TextIndex(text_search.WEIGHTS)
+    for doc in messages:
+        index.add(doc["id"], doc)
+    scores = index.search(text_search.parse("payment"))
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    assert ranked == ["msg-0", "msg-4", "msg-1"]
+    assert index.search(text_search.parse("payment -invoice")).keys() == {"msg-1", "msg-4"}
+    assert index.search(text_search.parse('"wrong address"')).keys() == {"msg-3"}
+    index.remove("msg-3")
+    assert index.search(text_search.parse("address")) == {}
+    assert len(index) == 4
+
+
+def test_highlight_escapes_and_marks_matches():
+    query = text_search.parse("payment")
+    assert text_search.highlight("<b>Payment</b> due", query) == "&lt;b&gt;<mark>Payment</mark>&lt;/b&gt; due"
+    assert text_search.highlight("nothing here", query) is None
+    long_text = "word " * 100 + "the payment is late " + "word " * 100
+    snippet = text_search.highlight(long_text, query, width=60)
+    assert snippet.startswith("…") and snippet.endswith("…")
+    assert "<mark>payment</mark>" in snippet
+    assert len(snippet) < 100
+
+
+def test_memory_text_queries_need_an_index_and_follow_updates(messages):
+    async def scenario():
+        collection = MemoryDatabase().contact_messages
+        await collection.insert_many(messages)
+        with pytest.raises(Exception, match="text index required"):
+            await text_search.search(collection, "payment", 0, 10)
+        await collection.create_index([("subject", "text"), ("message", "text")], name="message_text")
+        before = await text_search.search(collection, "invoice", 0, 10)
+        await collection.update_one({"id": "msg-0"}, {"$set": {"message": "Thanks!"}})
+        await collection.delete_one({"id": "msg-3"})
+        after = await text_search.search(collection, "invoice", 0, 10)
+        info = (await collection.index_information())["message_text"]
+        return before, after, info
+
+    before, after, info = asyncio.run(scenario())
+    assert [msg["id"] for msg in before] == ["msg-3", "msg-0"]
+    assert after == []
+    assert before[0]["score"] > before[1]["score"]
+    assert "_id" not in before[0]
+    assert info["key"] == [("_fts", "text"), ("_ftsx", 1)]
+    assert info["weights"] == {"subject": 1, "message": 1}
+
+
+def test_registry_check_accepts_the_text_index():
+    async def scenario():
+        db = MemoryDatabase()
+        await indexes.registry.ensure(db)
+        return await indexes.registry.check(db)
+
+    report = asyncio.run(scenario())["collections"]["contact_messages"]
+    assert report["missing"] == [] and report["mismatched"] == []
+
+
+@pytest.fixture
+def client(db, make_client, messages):
+    test_client = make_client()
+    test_client.portal.call(indexes.registry.ensure, db)
+    test_client.portal.call(db.contact_messages.insert_many, messages)
+    return test_client
+
+
+def test_search_endpoint_ranks_and_highlights(client):
+    response = client.get("/api/portfolio/contact/messages/search", params={"q": "payment"})
+    assert response.status_code == 200
+    results = response.json()
+    assert [msg["id"] for msg in results] == ["msg-0", "msg-4", "msg-1"]
+    assert results[0]["highlights"] == {
+        "subject": "<mark>Payment</mark> question",
+        "message": "Hi, I sent the <mark>payment</mark> for the invoice last week.",
+    }
+    assert results[2]["highlights"] == {"message": "Loved the portfolio. The <mark>payments</mark> page was confusing though."}
+    assert results[0]["score"] >= results[1]["score"] >= results[2]["score"]
+    assert set(results[0]) == {"id", "name", "email", "subject", "message", "timestamp", "score", "highlights"}
+
+
+def test_search_endpoint_pages(client):
+    ids, cursor = [], None
+    while True:
+        params = {"q": "payment invoice hiring", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/portfolio/contact/messages/search", params=params)
+        assert response.status_code == 200
+        ids += [msg["id"] for msg in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert sorted(ids) == ["msg-0", "msg-1", "msg-2", "msg-3", "msg-4"]
+    assert len(ids) == 5
+
+
+def test_search_endpoint_rejects_bad_input(client):
+    assert client.get("/api/portfolio/contact/messages/search", params={"q": ""}).status_code == 422
+    response = client.get("/api/portfolio/contact/messages/search", params={"q": "payment", "cursor": "!!"})
+    assert response.status_code == 400
+    too_deep = text_search.encode_cursor(text_search.MAX_OFFSET + 1)
+    response = client.get("/api/portfolio/contact/messages/search", params={"q": "payment", "cursor": too_deep})
+    assert response.status_code == 400
+    assert client.get("/api/portfolio/contact/messages/search", params={"q": "the -payment"}).json() == []
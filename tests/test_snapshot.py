@@ -0,0 +1,80 @@
+import asyncio
+import gzip
+import json
+import os
+import zlib
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import compression
+import server
+import snapshot
+from memory_db import MemoryClient
+
+
+@pytest.fixture
+def client():
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+def test_snapshot_matches_the_live_api(client, tmp_path):
+    manifest = client.portal.call(snapshot.render, server.cached_routes, tmp_path)
+    assert set(manifest["routes"]) == set(server.cached_routes.paths)
+    assert json.loads((tmp_path / "manifest.json").read_text()) == manifest
+    for path, info in manifest["routes"].items():
+        live = client.get(path, headers={"Accept-Encoding": "identity"})
+        body = (tmp_path / info["file"]).read_bytes()
+        assert body == live.content
+        assert info["etag"] == live.headers["etag"]
+        assert info["cache_control"] == live.headers["cache-control"]
+        assert info["size"] == len(body)
+        if "gzip" in info["encodings"]:
+            assert gzip.decompress((tmp_path / info["encodings"]["gzip"]["file"]).read_bytes()) == body
+            gzipped = client.get(path, headers={"Accept-Encoding": "gzip"})
+            assert info["encodings"]["gzip"]["etag"] == gzipped.headers["etag"]
+    assert manifest["routes"]["/api/portfolio"]["file"] == "api/portfolio/index.json"
+    assert "gzip" in manifest["routes"]["/api/portfolio"]["encodings"]
+
+
+def test_snapshot_adds_brotli_when_available(client, tmp_path, monkeypatch):
+    # Stand-in codec with the brotli module's interface
+    fake = SimpleNamespace(compress=lambda body, quality: zlib.compress(body, 9))
+    monkeypatch.setattr(compression, "brotli", fake)
+    # Variants are computed when entries are built; rebuild them with the codec
+    server.content_cache.invalidate()
+    manifest = client.portal.call(snapshot.render, server.cached_routes, tmp_path)
+    assert manifest["encodings"] == ["br", "gzip"]
+    info = manifest["routes"]["/api/portfolio"]["encodings"]["br"]
+    assert info["file"] == "api/portfolio/index.json.br"
+    assert zlib.decompress((tmp_path / info["file"]).read_bytes()) == (tmp_path / "api/portfolio/index.json").read_bytes()
+
+
+def test_main_only_reads_the_content(tmp_path, monkeypatch):
+    mongo = MemoryClient()
+    closed = []
+    monkeypatch.setattr(mongo, "close", lambda: closed.append(True))
+    monkeypatch.setattr(server, "build_client", lambda: mongo)
+    monkeypatch.setattr(server.content_store, "db", server.content_store.db)
+    db = mongo[os.environ["DB_NAME"]]
+    collection = server.content_store.specs["personal_info"].collection
+    info = server.content_store.specs["personal_info"].default().dict()
+    asyncio.run(db[collection].insert_one(dict(info, name="Snapshot")))
+    server.content_cache.invalidate()
+    try:
+        manifest = asyncio.run(snapshot.main(tmp_path))
+    finally:
+        server.content_cache.invalidate()
+    body = json.loads((tmp_path / manifest["routes"]["/api/portfolio/personal-info"]["file"]).read_text())
+    assert body["name"] == "Snapshot"
+    # Nothing was seeded or written
+    assert asyncio.run(db.list_collection_names()) == [collection]
+    assert closed == [True]
+
+
+def test_gzip_output_is_deterministic():
+    body = b'{"hello": "world"}' * 20
+    assert compression.gzip_compress(body) == compression.gzip_compress(body)
+    assert gzip.decompress(compression.gzip_compress(body)) == body
@@ -0,0 +1,192 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+import tenants
+from memory_db import MemoryDatabase
+
+PERSONAL_INFO = {
+    "id": "ada",
+    "name": "Ada",
+    "surname": "Lovelace",
+    "title": "Analyst",
+    "subtitle": "Notes on the Analytical Engine",
+    "location": "London",
+    "email": "ada@example.com",
+    "phone": "+44 20 0000 0000",
+    "availability_status": "Available",
+}
+PROJECTS = [
+    {
+        "id": "note-g",
+        "title": "Note G",
+        "category": "Algorithms",
+        "description": "Bernoulli numbers on the Analytical Engine.",
+        "technologies": ["Punched cards"],
+        "key_results": ["First published algorithm"],
+        "status": "Completed",
+    }
+]
+
+
+def test_store_fills_missing_sections():
+    async def scenario():
+        store = tenants.TenantStore(MemoryDatabase(), server.content_store.specs)
+        assert await store.load("ada") is None
+        await store.put("ada", "personal_info", PERSONAL_INFO)
+        await store.put("ada", "projects", PROJECTS)
+        values = await store.load("ada")
+        assert values["personal_info"].name == "Ada"
+        assert [project.title for project in values["projects"]] == ["Note G"]
+        assert values["about"] is None
+        assert values["skills"] == []
+        with pytest.raises(ValueError):
+            await store.put("Not A Slug", "projects", PROJECTS)
+        with pytest.raises(KeyError):
+            await store.put("ada", "hobbies", [])
+
+    asyncio.run(scenario())
+
+
+def make_loader(calls):
+    async def load(tenant):
+        calls.append(tenant)
+        await asyncio.sleep(0)
+        if tenant.startswith("missing"):
+            return None
+        return {"personal_info": {"name": tenant}, "projects": [{"title": "x" * 200}] * 5}
+    return load
+
+
+def test_cache_is_lru_bounded_by_entries():
+    async def scenario():
+        calls = []
+        cache = tenants.TenantCache(make_loader(calls), max_entries=2)
+        await cache.get("a")
+        await cache.get("b")
+        await cache.get("a")
+        await cache.get("c")  # evicts b, the least recently used
+        assert "a" in cache and "c" in cache and "b" not in cache
+        assert cache.stats()["evictions"] == 1
+        assert (cache.hits, cache.misses) == (1, 3)
+
+    asyncio.run(scenario())
+
+
+def test_cache_is_bounded_by_bytes():
+    async def scenario():
+        cache = tenants.TenantCache(make_loader([]))
+        size = (await cache.get("a")).size
+        cache.invalidate()
+        cache.max_bytes = size * 3
+        for tenant in "abcdef":
+            await cache.get(tenant)
+        assert len(cache) == 3
+        assert cache.bytes <= cache.max_bytes
+        assert cache.bytes == sum([(await cache.get(tenant)).size for tenant in "def"])
+
+    asyncio.run(scenario())
+
+
+def test_aggregates_are_accounted():
+    async def scenario():
+        cache = tenants.TenantCache(make_loader([]))
+        content = await cache.get("a")
+        before = cache.bytes
+        entry = content.aggregate(["projects"])
+        assert cache.bytes == before + entry.size
+        assert content.aggregate(["projects"]) is entry
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_misses_share_one_load_and_unknown_tenants_are_cached():
+    async def scenario():
+        calls = []
+        cache = tenants.TenantCache(make_loader(calls))
+        first, second = await asyncio.gather(cache.get("a"), cache.get("a"))
+        assert first is second
+        assert not (await cache.get("missing-1")).found
+        assert not (await cache.get("missing-1")).found
+        assert calls == ["a", "missing-1"]
+
+    asyncio.run(scenario())
+
+
+def test_unknown_tenants_never_evict_found_ones():
+    async def scenario():
+        calls = []
+        cache = tenants.TenantCache(make_loader(calls), max_entries=2, max_missing=8)
+        await cache.get("a")
+        await cache.get("b")
+        before = cache.bytes
+        for n in range(100):
+            assert not (await cache.get(f"missing-{n}")).found
+        assert "a" in cache and "b" in cache and len(cache) == 2
+        assert cache.bytes == before
+        assert cache.stats()["missing"] == 8
+        # The most recent misses are still remembered; older ones are loaded again
+        await cache.get("missing-99")
+        await cache.get("missing-0")
+        assert calls[-1] == "missing-0" and calls.count("missing-99") == 1
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def client():
+    with TestClient(server.app) as test_client:
+        test_client.portal.call(server.tenant_store.put, "ada", "personal_info", PERSONAL_INFO)
+        test_client.portal.call(server.tenant_store.put, "ada", "projects", PROJECTS)
+        server.tenant_cache.invalidate()
+        yield test_client
+
+
+def test_path_prefix_serves_the_tenant(client):
+    portfolio = client.get("/t/ada/api/portfolio").json()
+    assert portfolio["personal_info"]["name"] == "Ada"
+    assert portfolio["projects"][0]["title"] == "Note G"
+    assert portfolio["skills"] == [] and portfolio["about"] is None
+    assert client.get("/t/ada/api/portfolio/projects").json() == portfolio["projects"]
+    assert client.get("/t/ada/api/portfolio", params={"sections": "projects"}).json() == {
+        "projects": portfolio["projects"]
+    }
+    # The default tenant is unchanged
+    assert client.get("/api/portfolio/personal-info").json()["name"] == "Varshank"
+
+
+def test_tenant_responses_revalidate(client):
+    etag = client.get("/t/ada/api/portfolio/personal-info").headers["etag"]
+    response = client.get("/t/ada/api/portfolio/personal-info", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert client.get("/api/portfolio/personal-info", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_unknown_tenants_and_other_routes_are_not_found(client):
+    assert client.get("/t/nobody/api/portfolio").status_code == 404
+    assert client.get("/t/Bad_Slug/api/portfolio").status_code == 404
+    assert client.get("/t/ada/api/portfolio/contact/messages").status_code == 404
+    assert client.get("/t/ada/api/portfolio", params={"sections": "hobbies"}).status_code == 400
+
+
+def test_tenant_cache_metrics(client):
+    client.get("/t/ada/api/portfolio")
+    client.get("/t/ada/api/portfolio")
+    body = client.get("/metrics").text
+    assert "tenant_cache_hits_total" in body
+    assert "tenant_cache_entries 1" in body
+
+
+def test_subdomain_resolution():
+    middleware = tenants.TenantMiddleware(None, None, (), domain="folio.example.com")
+
+    def host(value):
+        return middleware._from_host({"headers": [(b"host", value.encode())]})
+
+    assert host("ada.folio.example.com") == "ada"
+    assert host("ADA.folio.example.com:8443") == "ada"
+    assert host("folio.example.com") is None
+    assert host("www.folio.example.com") is None
+    assert host("ada.example.org") is None